@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'accounts'
\ No newline at end of file
+    name = 'accounts'
+
+    def ready(self):
+        from . import signals  # noqa: F401
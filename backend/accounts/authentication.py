@@ -0,0 +1,112 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from uwazi254_backend.metrics import CACHE_REQUESTS
+from .tokens import ROLE_CLAIM, ACTIVE_CLAIM
+
+DEFAULTS = {
+    'TTL': 30,
+    'MAX_SIZE': 10000,
+}
+
+
+def user_cache_setting(name):
+    return getattr(settings, 'AUTH_USER_CACHE', {}).get(name, DEFAULTS[name])
+
+
+class UserCache:
+    """Size-bounded LRU of User instances with a short TTL.
+
+    Entries are evicted on User save/delete in this process; the TTL bounds
+    staleness for changes made by other worker processes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                CACHE_REQUESTS.inc(cache='auth_user', result='miss')
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            user = entry[1]
+        CACHE_REQUESTS.inc(cache='auth_user', result='hit')
+        # Each request gets its own instance so views can't mutate the shared one
+        return copy.copy(user)
+
+    def set(self, user_id, user):
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + user_cache_setting('TTL'), copy.copy(user))
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > user_cache_setting('MAX_SIZE'):
+                self._entries.popitem(last=False)
+
+    def evict(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def resolve(self, user_id):
+        """Cached user by primary key, loading it on a miss; None if missing"""
+        user = self.get(user_id)
+        if user is None:
+            User = get_user_model()
+            try:
+                user = User.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+            except User.DoesNotExist:
+                return None
+            self.set(user_id, user)
+        return user
+
+
+user_cache = UserCache()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that resolves users from the in-process UserCache.
+
+    Tokens issued before a role change or deactivation are rejected, so the
+    role claim can be trusted alongside the cached user.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        if validated_token.get(ACTIVE_CLAIM) is False:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        user = user_cache.resolve(user_id)
+        if user is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        role = validated_token.get(ROLE_CLAIM)
+        if role is not None and role != user.role:
+            raise AuthenticationFailed(_('Token is stale, please log in again'), code='token_stale')
+
+        return user
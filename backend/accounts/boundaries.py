@@ -0,0 +1,152 @@
+"""
+Bulk, idempotent loader for the county -> constituency -> ward boundaries.
+
+Input rows are ``(county_code, county, constituency, ward)`` with ward
+blank for a constituency without wards. Existing rows are read once per
+level, parent IDs are resolved in memory, and only the differences are
+written with ``bulk_create``/``bulk_update``, so a rerun of an unchanged
+file performs no writes.
+"""
+import csv
+import json
+import os
+
+from django.db import transaction
+from .geography import bump_version
+from .models import County, Constituency, Ward
+
+DEFAULT_FILE = os.path.join(os.path.dirname(__file__), 'data', 'kenya_boundaries.csv')
+
+BATCH_SIZE = 500
+
+
+class BoundaryDataError(ValueError):
+    """Raised for malformed or inconsistent boundary files"""
+
+
+def read_rows(path):
+    """Rows from a CSV file (see module docstring) or a JSON file shaped like
+    the geography endpoint: ``{'counties': [{'code', 'name', 'constituencies':
+    [{'name', 'wards': [{'name'} or name, ...]}]}]}``"""
+    if path.endswith('.json'):
+        with open(path, encoding='utf-8') as f:
+            payload = json.load(f)
+        rows = []
+        for county in payload.get('counties', payload) if isinstance(payload, dict) else payload:
+            constituencies = county.get('constituencies', [])
+            for constituency in constituencies:
+                wards = constituency.get('wards', [])
+                for ward in wards:
+                    name = ward['name'] if isinstance(ward, dict) else ward
+                    rows.append((county['code'], county['name'], constituency['name'], name))
+                if not wards:
+                    rows.append((county['code'], county['name'], constituency['name'], ''))
+            if not constituencies:
+                rows.append((county['code'], county['name'], '', ''))
+        return rows
+
+    with open(path, newline='', encoding='utf-8') as f:
+        return [
+            (row['county_code'], row['county'], row.get('constituency', ''), row.get('ward', ''))
+            for row in csv.DictReader(f)
+        ]
+
+
+def _clean(rows):
+    """Normalise rows into the desired county, constituency and ward sets"""
+    counties, constituencies, wards = {}, set(), set()
+    for line, (code, county, constituency, ward) in enumerate(rows, start=2):
+        code, county = (code or '').strip(), (county or '').strip()
+        constituency, ward = (constituency or '').strip(), (ward or '').strip()
+        if not code or not county:
+            raise BoundaryDataError(f'Row {line}: county code and name are required')
+        if counties.setdefault(code, county) != county:
+            raise BoundaryDataError(f"Row {line}: code {code} is both '{counties[code]}' and '{county}'")
+        if ward and not constituency:
+            raise BoundaryDataError(f"Row {line}: ward '{ward}' has no constituency")
+        if constituency:
+            constituencies.add((code, constituency))
+        if ward:
+            wards.add((code, constituency, ward))
+    return counties, constituencies, wards
+
+
+def load_boundaries(rows, prune=False):
+    """Apply the differences between ``rows`` and the database.
+
+    Counties are matched by code (renamed in place if the name changed),
+    constituencies by (county, name) and wards by (constituency, name).
+    With ``prune``, rows absent from the input are deleted. Returns a dict
+    of created/updated/deleted counts per level.
+    """
+    counties, constituencies, wards = _clean(rows)
+    stats = {}
+
+    with transaction.atomic():
+        # Counties
+        existing = {code: (pk, name) for pk, name, code in County.objects.values_list('id', 'name', 'code')}
+        renamed = [
+            County(id=existing[code][0], name=name, code=code)
+            for code, name in counties.items()
+            if code in existing and existing[code][1] != name
+        ]
+        if renamed:
+            # Park renamed rows on a temporary name so swapped names don't collide
+            County.objects.bulk_update(
+                [County(id=county.id, name=f'~{county.code}') for county in renamed], ['name'],
+                batch_size=BATCH_SIZE
+            )
+            County.objects.bulk_update(renamed, ['name'], batch_size=BATCH_SIZE)
+        created = [County(name=name, code=code) for code, name in counties.items() if code not in existing]
+        County.objects.bulk_create(created, batch_size=BATCH_SIZE)
+        county_ids = dict(County.objects.values_list('code', 'id'))
+        stale = [pk for code, (pk, _) in existing.items() if code not in counties]
+        deleted = 0
+        if prune and stale:
+            deleted = County.objects.filter(id__in=stale).delete()[1].get('accounts.County', 0)
+        stats['counties'] = {'created': len(created), 'updated': len(renamed), 'deleted': deleted}
+
+        # Constituencies
+        codes = {pk: code for code, pk in county_ids.items()}
+        existing = {
+            (codes.get(county_id), name): pk
+            for pk, name, county_id in Constituency.objects.values_list('id', 'name', 'county_id')
+        }
+        created = [
+            Constituency(name=name, county_id=county_ids[code])
+            for code, name in sorted(constituencies) if (code, name) not in existing
+        ]
+        Constituency.objects.bulk_create(created, batch_size=BATCH_SIZE, ignore_conflicts=True)
+        stale = [pk for key, pk in existing.items() if key not in constituencies and key[0] in counties]
+        deleted = 0
+        if prune and stale:
+            deleted = Constituency.objects.filter(id__in=stale).delete()[1].get('accounts.Constituency', 0)
+        stats['constituencies'] = {'created': len(created), 'updated': 0, 'deleted': deleted}
+
+        # Wards
+        constituency_ids = {
+            (codes.get(county_id), name): pk
+            for pk, name, county_id in Constituency.objects.values_list('id', 'name', 'county_id')
+        }
+        keys = {pk: key for key, pk in constituency_ids.items()}
+        existing = {
+            keys.get(constituency_id, (None, None)) + (name,): pk
+            for pk, name, constituency_id in Ward.objects.values_list('id', 'name', 'constituency_id')
+        }
+        created = [
+            Ward(name=name, constituency_id=constituency_ids[(code, constituency)])
+            for code, constituency, name in sorted(wards) if (code, constituency, name) not in existing
+        ]
+        Ward.objects.bulk_create(created, batch_size=BATCH_SIZE, ignore_conflicts=True)
+        # Only prune wards of constituencies the input lists wards for
+        listed = {(code, constituency) for code, constituency, _ in wards}
+        stale = [pk for key, pk in existing.items() if key not in wards and key[:2] in listed]
+        deleted = 0
+        if prune and stale:
+            deleted = Ward.objects.filter(id__in=stale).delete()[1].get('accounts.Ward', 0)
+        stats['wards'] = {'created': len(created), 'updated': 0, 'deleted': deleted}
+
+        if any(sum(level.values()) for level in stats.values()):
+            # bulk_* bypasses model signals
+            transaction.on_commit(bump_version)
+    return stats
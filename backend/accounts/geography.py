@@ -0,0 +1,116 @@
+"""
+Cached county -> constituency -> ward tree for the location pickers.
+
+Boundaries change only when they are (re)loaded, so the tree is rendered
+once per data version and kept in memory as identity, gzip and (if
+available) brotli bytes, each with a strong ETag over its exact bytes.
+The data version is a digest of the boundary rows themselves, so every
+process agrees on it whatever the cache backend. Each process re-reads
+the rows at most every ``CHECK_SECONDS`` and re-renders only when the
+digest moved. Model signals and the loader make the process that wrote
+check on its next request; other processes (web workers, after
+``manage.py load_boundaries``) follow within ``CHECK_SECONDS``.
+"""
+import gzip
+import hashlib
+import json
+import threading
+import time
+
+from django.utils.http import quote_etag
+from uwazi254_backend.compression import brotli, negotiate
+from uwazi254_backend.metrics import CACHE_REQUESTS
+from .models import County, Constituency, Ward
+
+# Seconds between checks of the boundary tables for changes made by other processes
+CHECK_SECONDS = 30
+
+_lock = threading.Lock()
+_rendered = None
+_checked_at = None
+
+
+def read_rows():
+    """``(counties, constituencies, wards)`` rows, each sorted by name"""
+    return (
+        list(County.objects.order_by('name', 'id').values_list('id', 'name', 'code')),
+        list(Constituency.objects.order_by('name', 'id').values_list('id', 'name', 'county_id')),
+        list(Ward.objects.order_by('name', 'id').values_list('id', 'name', 'constituency_id')),
+    )
+
+
+def data_version(rows):
+    digest = hashlib.sha256()
+    for table in rows:
+        digest.update(repr(table).encode())
+    return digest.hexdigest()[:32]
+
+
+def bump_version():
+    """Make this process re-read the boundary tables on its next request"""
+    global _checked_at
+    _checked_at = None
+
+
+def build_tree(rows=None):
+    """Nested list of counties with their constituencies and wards, by name"""
+    county_rows, constituency_rows, ward_rows = rows or read_rows()
+    counties = [
+        {'id': pk, 'name': name, 'code': code, 'constituencies': []}
+        for pk, name, code in county_rows
+    ]
+    by_county = {county['id']: county for county in counties}
+
+    by_constituency = {}
+    for pk, name, county_id in constituency_rows:
+        constituency = {'id': pk, 'name': name, 'wards': []}
+        by_constituency[pk] = constituency
+        by_county[county_id]['constituencies'].append(constituency)
+
+    for pk, name, constituency_id in ward_rows:
+        by_constituency[constituency_id]['wards'].append({'id': pk, 'name': name})
+    return counties
+
+
+def _etag(body):
+    return quote_etag(hashlib.sha256(body).hexdigest()[:32])
+
+
+class RenderedTree:
+    """One rendering of the tree in every supported content encoding"""
+
+    def __init__(self, version, tree):
+        self.version = version
+        body = json.dumps({'counties': tree}, separators=(',', ':'), ensure_ascii=False).encode()
+        # encoding -> (bytes, etag); '' is the identity encoding
+        self.variants = {'': (body, _etag(body))}
+        # mtime=0 keeps the gzip bytes (and so the ETag) stable across rebuilds
+        compressed = gzip.compress(body, compresslevel=9, mtime=0)
+        self.variants['gzip'] = (compressed, _etag(compressed))
+        if brotli is not None:
+            compressed = brotli.compress(body, quality=11)
+            self.variants['br'] = (compressed, _etag(compressed))
+
+    def negotiate(self, accept_encoding):
+        """Best available encoding for an Accept-Encoding header"""
+        return negotiate(accept_encoding, [encoding for encoding in ('br', 'gzip') if encoding in self.variants])
+
+
+def get_tree():
+    """The rendered tree for the current data version, rebuilt if stale"""
+    global _rendered, _checked_at
+    checked_at, rendered = _checked_at, _rendered
+    if rendered is not None and checked_at is not None and time.monotonic() - checked_at < CHECK_SECONDS:
+        CACHE_REQUESTS.inc(cache='geography_tree', result='hit')
+        return rendered
+
+    with _lock:
+        rows = read_rows()
+        version = data_version(rows)
+        if _rendered is None or _rendered.version != version:
+            CACHE_REQUESTS.inc(cache='geography_tree', result='miss')
+            _rendered = RenderedTree(version, build_tree(rows))
+        else:
+            CACHE_REQUESTS.inc(cache='geography_tree', result='hit')
+        _checked_at = time.monotonic()
+        return _rendered
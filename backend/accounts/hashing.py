@@ -0,0 +1,74 @@
+"""
+Password hashing off the request thread.
+
+PBKDF2 is deliberately slow (hundreds of milliseconds per hash), so async
+views hand it to a bounded thread pool instead of running it on the event
+loop. ``hashlib.pbkdf2_hmac`` releases the GIL, so the pool scales with
+cores without the pickling cost of a process pool. Setting
+``PASSWORD_HASHING['WORKERS']`` to 0 hashes inline (useful for comparison).
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, get_hasher, identify_hasher, make_password
+
+DEFAULTS = {
+    'WORKERS': os.cpu_count() or 2,
+}
+
+_lock = threading.Lock()
+_pool = None
+_pool_size = None
+
+
+def hashing_setting(name):
+    return getattr(settings, 'PASSWORD_HASHING', {}).get(name, DEFAULTS[name])
+
+
+def get_pool():
+    """Process-wide hashing pool, rebuilt if WORKERS changes; None for inline hashing"""
+    global _pool, _pool_size
+    workers = hashing_setting('WORKERS')
+    if workers <= 0:
+        return None
+    with _lock:
+        if _pool is None or _pool_size != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+            _pool_size = workers
+        return _pool
+
+
+async def run_in_pool(func, *args):
+    pool = get_pool()
+    if pool is None:
+        return func(*args)
+    return await asyncio.get_running_loop().run_in_executor(pool, func, *args)
+
+
+async def amake_password(password):
+    return await run_in_pool(make_password, password)
+
+
+def _verify(password, encoded):
+    """Check a password; returns ``(valid, new_encoded)`` where new_encoded is set
+    when the stored hash uses outdated parameters and should be replaced"""
+    if not encoded:
+        # Run a hash anyway so unknown accounts take as long as known ones
+        make_password(password)
+        return False, None
+
+    if not check_password(password, encoded):
+        return False, None
+    preferred = get_hasher('default')
+    if identify_hasher(encoded).algorithm != preferred.algorithm or preferred.must_update(encoded):
+        return True, make_password(password)
+    return True, None
+
+
+async def averify_password(password, encoded):
+    return await run_in_pool(_verify, password, encoded)
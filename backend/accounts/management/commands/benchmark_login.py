@@ -0,0 +1,88 @@
+import asyncio
+import os
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.test import AsyncRequestFactory, override_settings
+from accounts.models import User
+from accounts.views import login_view
+from uwazi254_backend.benchmarking import scratch_database
+
+
+class Command(BaseCommand):
+    help = 'Measure async login throughput per core with inline and pooled password hashing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=40, help='Logins per run')
+        parser.add_argument('--concurrency', type=int, default=16, help='Logins in flight at once')
+        parser.add_argument('--workers', type=int, action='append',
+                            help='Hashing pool sizes to compare (0 = inline; default: 0, 1 and cpu count)')
+
+    def handle(self, *args, **options):
+        cores = os.cpu_count() or 1
+        pool_sizes = options['workers'] or sorted({0, 1, cores})
+
+        # Throwaway test database so benchmark users never touch real data
+        with scratch_database():
+            encoded = make_password('benchmark-pass')
+            User.objects.bulk_create([
+                User(username=f'bench{i}', email=f'bench{i}@example.com', password=encoded)
+                for i in range(options['logins'])
+            ])
+            results = []
+            limits = {'LOGIN_IP': (10 ** 9, 60), 'LOGIN_ACCOUNT': (10 ** 9, 900)}
+            for workers in pool_sizes:
+                with override_settings(PASSWORD_HASHING={'WORKERS': workers}, AUTH_THROTTLES=limits):
+                    results.append((workers, asyncio.run(self.run(options))))
+
+        self.stdout.write(f'{cores} CPU core(s)')
+        self.stdout.write(f"{'workers':<10}{'logins/s':>10}{'per core':>10}{'p95 ms':>9}{'max loop stall ms':>19}")
+        for workers, result in results:
+            used = min(max(workers, 1), cores)
+            self.stdout.write(
+                f"{workers or 'inline':<10}{result['per_second']:>10.2f}{result['per_second'] / used:>10.2f}"
+                f"{result['p95'] * 1000:>9.0f}{result['max_stall'] * 1000:>19.0f}"
+            )
+
+    async def run(self, options):
+        factory = AsyncRequestFactory()
+        semaphore = asyncio.Semaphore(options['concurrency'])
+        latencies = []
+
+        async def login(i):
+            request = factory.post(
+                '/api/auth/login/',
+                {'email': f'bench{i}@example.com', 'password': 'benchmark-pass'},
+                content_type='application/json'
+            )
+            async with semaphore:
+                start = time.perf_counter()
+                response = await login_view(request)
+                latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                raise RuntimeError(f'Login failed with {response.status_code}: {response.content!r}')
+
+        # A ticker that should wake every 10ms; lateness means the event loop was blocked
+        stalls = []
+        done = asyncio.Event()
+
+        async def ticker():
+            while not done.is_set():
+                start = time.perf_counter()
+                await asyncio.sleep(0.01)
+                stalls.append(time.perf_counter() - start - 0.01)
+
+        ticking = asyncio.create_task(ticker())
+        start = time.perf_counter()
+        await asyncio.gather(*(login(i) for i in range(options['logins'])))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await ticking
+
+        latencies.sort()
+        return {
+            'per_second': len(latencies) / elapsed,
+            'p95': latencies[int(len(latencies) * 0.95) - 1] if latencies else 0.0,
+            'max_stall': max(stalls, default=0.0),
+        }
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from accounts.revocation import compact_tokens, revocations
+
+
+class Command(BaseCommand):
+    help = 'Purge expired outstanding and blacklisted refresh tokens in batches'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+    
+    def handle(self, *args, **options):
+        removed = compact_tokens(batch_size=options['batch_size'])
+        revocations.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} expired tokens'))
@@ -0,0 +1,26 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from accounts.boundaries import DEFAULT_FILE, BoundaryDataError, load_boundaries, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Load counties, constituencies and wards from a CSV/JSON boundary file, applying only differences'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--file', default=DEFAULT_FILE,
+                            help='CSV (county_code,county,constituency,ward) or JSON file; defaults to the bundled dataset')
+        parser.add_argument('--prune', action='store_true', help='Delete rows that are not in the file')
+    
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            stats = load_boundaries(read_rows(options['file']), prune=options['prune'])
+        except (OSError, KeyError, BoundaryDataError) as e:
+            raise CommandError(f'Could not load {options["file"]}: {e}')
+        elapsed = time.perf_counter() - start
+        
+        summary = ', '.join(
+            f"{level}: +{counts['created']} ~{counts['updated']} -{counts['deleted']}"
+            for level, counts in stats.items()
+        )
+        self.stdout.write(self.style.SUCCESS(f'Boundaries loaded in {elapsed:.2f}s ({summary})'))
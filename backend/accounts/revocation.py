@@ -0,0 +1,144 @@
+import hashlib
+import math
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+DEFAULTS = {
+    'REFRESH_SECONDS': 5,
+    'ERROR_RATE': 0.001,
+    'MIN_CAPACITY': 1024,
+    # Re-read rows blacklisted this long before the last sync: IDs are assigned
+    # before commit, so a lower ID can become visible after a higher one
+    'SYNC_OVERLAP_SECONDS': 60,
+    # Full rebuilds catch anything that committed later still
+    'REBUILD_SECONDS': 3600,
+}
+
+
+def revocation_setting(name):
+    return getattr(settings, 'TOKEN_REVOCATION', {}).get(name, DEFAULTS[name])
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings using double hashing"""
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = max(int(capacity), 1)
+        self.size = max(8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationList:
+    """In-memory Bloom filter of blacklisted refresh-token JTIs.
+
+    A negative answer means the token is not revoked as of the last sync,
+    so the blacklist table is only queried for probable hits. Other worker
+    processes' revocations are picked up from the table at most
+    ``REFRESH_SECONDS`` later. Each sync re-reads the rows blacklisted
+    since ``SYNC_OVERLAP_SECONDS`` before the previous one, rather than
+    those past the highest ID seen, so transactions that commit out of ID
+    order are not skipped; the filter is rebuilt every ``REBUILD_SECONDS``.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bloom = None
+        self._scanned_from = None
+        self._synced_at = 0.0
+        self._built_at = 0.0
+
+    def rebuild(self):
+        """Rebuild from unexpired blacklist rows, sized for twice their number"""
+        started = timezone.now()
+        rows = list(
+            BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now())
+            .values_list('id', 'token__jti')
+        )
+        bloom = BloomFilter(
+            max(len(rows) * 2, revocation_setting('MIN_CAPACITY')),
+            revocation_setting('ERROR_RATE')
+        )
+        for _, jti in rows:
+            bloom.add(jti)
+        with self._lock:
+            self._bloom = bloom
+            self._scanned_from = started
+            self._synced_at = self._built_at = time.monotonic()
+
+    def sync(self):
+        """Add rows blacklisted since the last sync (by any process)"""
+        if self._bloom is None or time.monotonic() - self._built_at >= revocation_setting('REBUILD_SECONDS'):
+            self.rebuild()
+            return
+        started = timezone.now()
+        since = self._scanned_from - timedelta(seconds=revocation_setting('SYNC_OVERLAP_SECONDS'))
+        jtis = list(BlacklistedToken.objects.filter(blacklisted_at__gte=since).values_list('token__jti', flat=True))
+        with self._lock:
+            for jti in jtis:
+                # Overlapping scans see rows again; only count new ones towards capacity
+                if jti not in self._bloom:
+                    self._bloom.add(jti)
+            self._scanned_from = started
+            self._synced_at = time.monotonic()
+            full = self._bloom.count > self._bloom.capacity
+        if full:
+            self.rebuild()
+
+    def add(self, jti):
+        if self._bloom is None:
+            self.rebuild()
+        with self._lock:
+            self._bloom.add(jti)
+
+    def might_be_revoked(self, jti):
+        if self._bloom is None or time.monotonic() - self._synced_at >= revocation_setting('REFRESH_SECONDS'):
+            self.sync()
+        return jti in self._bloom
+
+    def reset(self):
+        with self._lock:
+            self._bloom = None
+
+
+revocations = RevocationList()
+
+
+def compact_tokens(batch_size=1000, now=None):
+    """Delete expired outstanding tokens (and their blacklist rows) in batches.
+
+    Returns the number of outstanding tokens removed.
+    """
+    now = now or timezone.now()
+    removed = 0
+    while True:
+        ids = list(
+            OutstandingToken.objects.filter(expires_at__lte=now)
+            .order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        BlacklistedToken.objects.filter(token_id__in=ids).delete()
+        OutstandingToken.objects.filter(id__in=ids).delete()
+        removed += len(ids)
+    return removed
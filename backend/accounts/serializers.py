@@ -1,6 +1,11 @@
 from rest_framework import serializers
-from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import make_password
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from .authentication import user_cache
 from .models import User, County, Constituency, Ward
+from .tokens import UserRefreshToken, stamp_claims
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=8)
@@ -20,32 +25,21 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         return attrs
     
     def create(self, validated_data):
+        """One hash and one INSERT; callers may pass a precomputed ``password_hash``"""
         validated_data.pop('password_confirm')
         password = validated_data.pop('password')
-        user = User.objects.create_user(**validated_data)
-        user.set_password(password)
+        password_hash = validated_data.pop('password_hash', None) or make_password(password)
+        user = User(**validated_data)
+        user.email = User.objects.normalize_email(user.email)
+        user.username = User.normalize_username(user.username)
+        user.password = password_hash
         user.save()
         return user
 
 class UserLoginSerializer(serializers.Serializer):
+    """Shape of a login request; credentials are checked by login_view off the event loop"""
     email = serializers.EmailField()
     password = serializers.CharField()
-    
-    def validate(self, attrs):
-        email = attrs.get('email')
-        password = attrs.get('password')
-        
-        if email and password:
-            user = authenticate(username=email, password=password)
-            if not user:
-                raise serializers.ValidationError('Invalid credentials')
-            if not user.is_active:
-                raise serializers.ValidationError('User account is disabled')
-            attrs['user'] = user
-        else:
-            raise serializers.ValidationError('Must include email and password')
-        
-        return attrs
 
 class UserSerializer(serializers.ModelSerializer):
     full_name = serializers.ReadOnlyField()
@@ -77,4 +71,19 @@ class WardSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Ward
-        fields = ['id', 'name', 'constituency', 'constituency_name', 'county_name']
\ No newline at end of file
+        fields = ['id', 'name', 'constituency', 'constituency_name', 'county_name']
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = UserRefreshToken
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """Re-stamps role/active claims from the current user on every refresh"""
+    token_class = UserRefreshToken
+    
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        user = user_cache.resolve(refresh[api_settings.USER_ID_CLAIM])
+        if user is None or not user.is_active:
+            raise AuthenticationFailed('User not found or inactive', code='user_inactive')
+        stamp_claims(refresh, user)
+        return super().validate({'refresh': str(refresh)})
\ No newline at end of file
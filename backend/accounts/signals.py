@@ -0,0 +1,25 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from .authentication import user_cache
+from .geography import bump_version
+from .models import User, County, Constituency, Ward
+from .revocation import revocations
+
+
+@receiver([post_save, post_delete], sender=User)
+def evict_cached_user(sender, instance, **kwargs):
+    user_cache.evict(instance.pk)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def add_revocation(sender, instance, created, **kwargs):
+    if created:
+        revocations.add(instance.token.jti)
+
+
+@receiver([post_save, post_delete], sender=County)
+@receiver([post_save, post_delete], sender=Constituency)
+@receiver([post_save, post_delete], sender=Ward)
+def invalidate_geography(sender, **kwargs):
+    bump_version()
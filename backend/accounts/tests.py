@@ -1,7 +1,27 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import json
+import os
+import tempfile
+import time
+from unittest import mock
+from django.core.cache import cache
+from django.conf import settings
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
 from django.contrib.auth import get_user_model
 from rest_framework.test import APITestCase
 from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
+from datetime import timedelta
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from . import geography, hashing, throttling
+from .boundaries import DEFAULT_FILE, BoundaryDataError, load_boundaries, read_rows
+from .models import County, Constituency, Ward
+from .authentication import user_cache
+from .revocation import BloomFilter, compact_tokens, revocations
 
 User = get_user_model()
 
@@ -31,8 +51,8 @@ class AuthAPITest(APITestCase):
         }
         response = self.client.post('/api/auth/register/', data)
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
-        self.assertIn('tokens', response.data)
-        self.assertIn('user', response.data)
+        self.assertIn('tokens', response.json())
+        self.assertIn('user', response.json())
     
     def test_user_login(self):
         # Create user first
@@ -48,4 +68,312 @@ class AuthAPITest(APITestCase):
         }
         response = self.client.post('/api/auth/login/', data)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertIn('tokens', response.data)
\ No newline at end of file
+        self.assertIn('tokens', response.json())
+
+class CachedJWTAuthenticationTest(APITestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        response = self.client.post('/api/auth/login/', {
+            'email': 'test@example.com',
+            'password': 'testpass123'
+        })
+        self.tokens = response.json()['tokens']
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.tokens['access']}")
+    
+    def test_access_token_carries_role(self):
+        token = AccessToken(self.tokens['access'])
+        self.assertEqual(token['role'], 'citizen')
+        self.assertTrue(token['active'])
+    
+    def test_cache_hit_needs_no_identity_query(self):
+        self.client.get('/api/auth/profile/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/auth/profile/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['email'], 'test@example.com')
+    
+    def test_role_change_and_deactivation_invalidate(self):
+        self.client.get('/api/auth/profile/')
+        self.user.role = 'moderator'
+        self.user.save()
+        response = self.client.get('/api/auth/profile/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        
+        # A refreshed token picks up the new role
+        response = self.client.post('/api/token/refresh/', {'refresh': self.tokens['refresh']})
+        self.assertEqual(AccessToken(response.data['access'])['role'], 'moderator')
+        
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.post('/api/token/refresh/', {'refresh': self.tokens['refresh']})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TokenRevocationTest(APITestCase):
+    def setUp(self):
+        revocations.reset()
+        User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        response = self.client.post('/api/auth/login/', {
+            'email': 'test@example.com',
+            'password': 'testpass123'
+        })
+        self.tokens = response.json()['tokens']
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.tokens['access']}")
+    
+    def test_bloom_filter(self):
+        bloom = BloomFilter(1000, 0.001)
+        for i in range(1000):
+            bloom.add(f'jti-{i}')
+        self.assertTrue(all(f'jti-{i}' in bloom for i in range(1000)))
+        false_positives = sum(f'other-{i}' in bloom for i in range(10000))
+        self.assertLess(false_positives, 50)
+    
+    def test_logout_revokes_refresh_token(self):
+        revocations.rebuild()
+        # Not revoked: answered by the filter without touching the blacklist
+        with self.assertNumQueries(1):  # user lookup only, no blacklist query
+            response = self.client.post('/api/token/refresh/', {'refresh': self.tokens['refresh']})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        response = self.client.post('/api/auth/logout/', {'refresh': self.tokens['refresh']})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        response = self.client.post('/api/token/refresh/', {'refresh': self.tokens['refresh']})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_sync_sees_out_of_order_commits(self):
+        user = User.objects.get(email='test@example.com')
+        expires = timezone.now() + timedelta(days=1)
+        early, late = [
+            OutstandingToken.objects.create(user=user, jti=jti, token=jti, expires_at=expires)
+            for jti in ('early', 'late')
+        ]
+        BlacklistedToken.objects.create(id=10, token=late)
+        revocations.rebuild()
+        
+        # Another process's transaction took ID 5 before ID 10 was assigned, but committed
+        # after the sync (bulk_create: no local signal adds it to this process's filter)
+        BlacklistedToken.objects.bulk_create([BlacklistedToken(id=5, token=early)])
+        revocations.sync()
+        self.assertTrue(revocations.might_be_revoked('early'))
+    
+    def test_compaction_removes_expired_tokens(self):
+        self.client.post('/api/auth/logout/', {'refresh': self.tokens['refresh']})
+        OutstandingToken.objects.update(expires_at=timezone.now() - timedelta(minutes=1))
+        
+        self.assertEqual(compact_tokens(batch_size=1), 1)
+        self.assertFalse(OutstandingToken.objects.exists())
+        self.assertFalse(BlacklistedToken.objects.exists())
+
+class AsyncLoginTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+    
+    def tearDown(self):
+        cache.clear()
+    
+    def test_registration_hashes_once_and_inserts_once(self):
+        data = {
+            'username': 'newuser',
+            'email': 'new@example.com',
+            'password': 'testpass123',
+            'password_confirm': 'testpass123',
+        }
+        with mock.patch('accounts.hashing.make_password', wraps=hashing.make_password) as hasher:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post('/api/auth/register/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(hasher.call_count, 1)
+        writes = [q['sql'] for q in queries if 'accounts_user' in q['sql'].split('WHERE')[0]
+                  and q['sql'].startswith(('INSERT', 'UPDATE'))]
+        self.assertEqual(len(writes), 1)
+        self.assertTrue(User.objects.get(email='new@example.com').check_password('testpass123'))
+    
+    def test_bad_password_rejected(self):
+        response = self.client.post('/api/auth/login/', {'email': 'test@example.com', 'password': 'wrong'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()['non_field_errors'], ['Invalid credentials'])
+    
+    @override_settings(AUTH_THROTTLES={'LOGIN_ACCOUNT': (2, 900)})
+    def test_account_throttle_rejects_before_hashing(self):
+        for _ in range(2):
+            self.client.post('/api/auth/login/', {'email': 'test@example.com', 'password': 'wrong'})
+        with mock.patch('accounts.views.averify_password') as verify:
+            response = self.client.post('/api/auth/login/', {
+                'email': 'test@example.com',
+                'password': 'testpass123'
+            })
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '900')
+        verify.assert_not_called()
+    
+    @override_settings(AUTH_THROTTLES={'LOGIN_ACCOUNT': (2, 900)})
+    async def test_concurrent_guesses_hash_at_most_limit_times(self):
+        async def slow_verify(password, encoded):
+            await asyncio.sleep(0.01)
+            return False, None
+        
+        with mock.patch('accounts.views.averify_password', side_effect=slow_verify) as verify:
+            responses = await asyncio.gather(*[
+                self.async_client.post(
+                    '/api/auth/login/', {'email': 'test@example.com', 'password': f'guess{i}'},
+                    content_type='application/json'
+                )
+                for i in range(6)
+            ])
+        self.assertEqual(verify.call_count, 2)
+        self.assertEqual(sorted(response.status_code for response in responses), [400, 400, 429, 429, 429, 429])
+    
+    @override_settings(AUTH_THROTTLES={'LOGIN_IP': (2, 60)})
+    def test_ip_throttle(self):
+        for _ in range(2):
+            response = self.client.post('/api/auth/login/', {
+                'email': 'test@example.com',
+                'password': 'testpass123'
+            })
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.post('/api/auth/login/', {
+            'email': 'other@example.com',
+            'password': 'testpass123'
+        })
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+    
+    @override_settings(AUTH_THROTTLES={'LOGIN_IP': (2, 60)})
+    def test_ip_throttle_ignores_spoofed_forwarded_for(self):
+        for i in range(3):
+            response = self.client.post('/api/auth/login/', {
+                'email': 'test@example.com',
+                'password': 'testpass123'
+            }, HTTP_X_FORWARDED_FOR=f'10.0.0.{i}')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+    
+    def test_client_ip_behind_proxies(self):
+        request = RequestFactory().get('/', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='6.6.6.6, 203.0.113.9')
+        self.assertEqual(throttling.client_ip(request), '10.0.0.1')
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1}):
+            self.assertEqual(throttling.client_ip(request), '203.0.113.9')
+    
+    @override_settings(PASSWORD_HASHING={'WORKERS': 0})
+    def test_inline_hashing(self):
+        response = self.client.post('/api/auth/login/', {
+            'email': 'test@example.com',
+            'password': 'testpass123'
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class GeographyTreeTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        nairobi = County.objects.create(name='Nairobi', code='047')
+        County.objects.create(name='Kiambu', code='022')
+        kasarani = Constituency.objects.create(name='Kasarani', county=nairobi)
+        Ward.objects.create(name='Mwiki', constituency=kasarani)
+        Ward.objects.create(name='Clay City', constituency=kasarani)
+    
+    def test_tree(self):
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/auth/geography/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        counties = response.json()['counties']
+        self.assertEqual([county['name'] for county in counties], ['Kiambu', 'Nairobi'])
+        self.assertEqual(counties[0]['constituencies'], [])
+        wards = counties[1]['constituencies'][0]['wards']
+        self.assertEqual([ward['name'] for ward in wards], ['Clay City', 'Mwiki'])
+        
+        # Served from memory until the data changes
+        with self.assertNumQueries(0):
+            self.client.get('/api/auth/geography/')
+    
+    def test_etag_and_compression(self):
+        response = self.client.get('/api/auth/geography/')
+        etag = response['ETag']
+        response = self.client.get('/api/auth/geography/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        
+        response = self.client.get('/api/auth/geography/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('counties', json.loads(gzip.decompress(response.content)))
+        
+        Ward.objects.create(name='Githurai', constituency=Constituency.objects.get())
+        response = self.client.get('/api/auth/geography/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+    
+    def test_tree_follows_other_processes_writes(self):
+        etag = self.client.get('/api/auth/geography/')['ETag']
+        # As written by `manage.py load_boundaries` in another process: no signal reaches this one
+        Ward.objects.bulk_create([Ward(name='Githurai', constituency=Constituency.objects.get())])
+        self.assertEqual(self.client.get('/api/auth/geography/')['ETag'], etag)
+        with mock.patch.object(geography, 'CHECK_SECONDS', 0):
+            response = self.client.get('/api/auth/geography/')
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('Githurai', response.content.decode())
+    
+    def test_ward_list_unpaginated(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/auth/wards/?all=true')
+        self.assertEqual(len(response.data), 2)
+        self.assertEqual(response.data[0]['county_name'], 'Nairobi')
+
+
+class BoundaryLoaderTest(TestCase):
+    def test_bundled_load_and_idempotent_rerun(self):
+        rows = read_rows(DEFAULT_FILE)
+        start = time.perf_counter()
+        stats = load_boundaries(rows)
+        self.assertLess(time.perf_counter() - start, 3)
+        self.assertEqual(stats['counties']['created'], 47)
+        self.assertEqual(County.objects.count(), 47)
+        self.assertEqual(Constituency.objects.count(), 290)
+        self.assertEqual(Ward.objects.filter(constituency__county__code='047').count(), 85)
+        
+        with CaptureQueriesContext(connection) as queries:
+            stats = load_boundaries(rows)
+        self.assertFalse([q for q in queries if q['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))])
+        self.assertEqual(sum(sum(level.values()) for level in stats.values()), 0)
+    
+    def test_applies_differences(self):
+        County.objects.create(name='Nairobi City', code='047')
+        kasarani = Constituency.objects.create(name='Kasarani', county=County.objects.get(code='047'))
+        Ward.objects.create(name='Old Ward', constituency=kasarani)
+        rows = [
+            ('047', 'Nairobi', 'Kasarani', 'Mwiki'),
+            ('047', 'Nairobi', 'Kasarani', 'Njiru'),
+            ('022', 'Kiambu', 'Ruiru', ''),
+        ]
+        stats = load_boundaries(rows, prune=True)
+        self.assertEqual(stats['counties'], {'created': 1, 'updated': 1, 'deleted': 0})
+        self.assertEqual(stats['wards'], {'created': 2, 'updated': 0, 'deleted': 1})
+        self.assertEqual(County.objects.get(code='047').name, 'Nairobi')
+        self.assertEqual(
+            sorted(Ward.objects.values_list('name', flat=True)), ['Mwiki', 'Njiru']
+        )
+    
+    def test_json_file_and_bad_rows(self):
+        payload = {'counties': [{'name': 'Lamu', 'code': '005', 'constituencies': [
+            {'name': 'Lamu East', 'wards': [{'name': 'Faza'}, 'Kiunga']}
+        ]}]}
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+            json.dump(payload, f)
+        self.addCleanup(os.unlink, f.name)
+        load_boundaries(read_rows(f.name))
+        self.assertEqual(Ward.objects.filter(constituency__name='Lamu East').count(), 2)
+        
+        with self.assertRaises(BoundaryDataError):
+            load_boundaries([('005', 'Lamu', '', 'Faza')])
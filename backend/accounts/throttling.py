@@ -0,0 +1,80 @@
+"""
+Login and registration throttles, checked before any password is hashed.
+
+Counters live in the default cache, which every worker process shares
+only when it is a shared backend (``CACHE=redis``, or ``file`` on one
+host). With the per-process ``locmem`` cache each process counts on its
+own, so a client can make up to the limit times the number of processes.
+
+Clients are identified by ``REMOTE_ADDR``. Behind reverse proxies, set
+DRF's ``NUM_PROXIES`` to how many there are; the address that many
+entries from the right of ``X-Forwarded-For`` is used, since anything to
+its left was written by the client and can change on every request.
+
+Each rule is ``(limit, window_seconds)``. ``hit`` is the gate: it counts
+the attempt with the cache's add/increment and admits it only while the
+new count is within the limit, so concurrent attempts can't all pass a
+check made before any of them is counted (``incr`` is atomic in the
+locmem and Redis backends). Every attempt counts; the per-account rule is
+cleared by a successful login, so in effect it limits failures.
+"""
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.settings import api_settings
+
+DEFAULTS = {
+    'LOGIN_IP': (30, 60),
+    'LOGIN_ACCOUNT': (5, 900),
+    'REGISTER_IP': (10, 3600),
+}
+
+
+def throttle_setting(name):
+    return getattr(settings, 'AUTH_THROTTLES', {}).get(name, DEFAULTS[name])
+
+
+def client_ip(request):
+    remote_addr = request.META.get('REMOTE_ADDR', '')
+    proxies = api_settings.NUM_PROXIES or 0
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if not proxies or not forwarded:
+        return remote_addr
+    # The last proxy appended the address it saw; entries further left are client-supplied
+    addresses = forwarded.split(',')
+    return addresses[-min(proxies, len(addresses))].strip()
+
+
+def _key(rule, ident):
+    digest = hashlib.sha256(ident.strip().lower().encode()).hexdigest()[:32]
+    return f'auth-throttle:{rule}:{digest}'
+
+
+def _count(key, window):
+    """Atomically count one attempt; returns the new count"""
+    # add() only sets a missing key, so the window starts at the first hit
+    if cache.add(key, 1, window):
+        return 1
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Expired between add() and incr()
+        cache.set(key, 1, window)
+        return 1
+
+
+async def hit(rule, ident):
+    """Count one attempt; False once it is over the rule's limit for the current window"""
+    limit, window = throttle_setting(rule)
+    # Django 4.2's aincr() is a get then a set, so concurrent hits could read the same count
+    return await sync_to_async(_count)(_key(rule, ident), window) <= limit
+
+
+async def clear(rule, ident):
+    await cache.adelete(_key(rule, ident))
+
+
+def retry_after(rule):
+    return throttle_setting(rule)[1]
@@ -0,0 +1,29 @@
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from .revocation import revocations
+
+# Identity claims carried by every token so hot paths need no User lookup
+ROLE_CLAIM = 'role'
+ACTIVE_CLAIM = 'active'
+
+
+def stamp_claims(token, user):
+    token[ROLE_CLAIM] = user.role
+    token[ACTIVE_CLAIM] = user.is_active
+    return token
+
+
+class UserRefreshToken(RefreshToken):
+    """Refresh token whose access tokens carry the user's role and active flag.
+
+    Revocation is checked against the in-memory Bloom filter first; the
+    blacklist table is only queried when the filter reports a possible hit.
+    """
+
+    def check_blacklist(self):
+        if revocations.might_be_revoked(self.payload[api_settings.JTI_CLAIM]):
+            super().check_blacklist()
+
+    @classmethod
+    def for_user(cls, user):
+        return stamp_claims(super().for_user(user), user)
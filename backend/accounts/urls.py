@@ -1,15 +1,16 @@
 from django.urls import path
 from .views import (
-    RegisterView, LoginView, ProfileView, logout_view,
-    CountyListView, ConstituencyListView, WardListView
+    register_view, login_view, ProfileView, logout_view,
+    CountyListView, ConstituencyListView, WardListView, geography_tree
 )
 
 urlpatterns = [
-    path('register/', RegisterView.as_view(), name='register'),
-    path('login/', LoginView.as_view(), name='login'),
+    path('register/', register_view, name='register'),
+    path('login/', login_view, name='login'),
     path('logout/', logout_view, name='logout'),
     path('profile/', ProfileView.as_view(), name='profile'),
     path('counties/', CountyListView.as_view(), name='counties'),
     path('constituencies/', ConstituencyListView.as_view(), name='constituencies'),
     path('wards/', WardListView.as_view(), name='wards'),
+    path('geography/', geography_tree, name='geography'),
 ]
\ No newline at end of file
@@ -1,54 +1,100 @@
+import functools
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotAllowed, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.views.decorators.http import require_safe
 from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
-from django.contrib.auth import authenticate
+from uwazi254_backend.async_api import request_data
+from . import throttling
+from .geography import get_tree
+from .hashing import amake_password, averify_password
+from .tokens import UserRefreshToken
 from .models import User, County, Constituency, Ward
 from .serializers import (
     UserRegistrationSerializer, UserLoginSerializer, UserSerializer,
     CountySerializer, ConstituencySerializer, WardSerializer
 )
 
-class RegisterView(generics.CreateAPIView):
-    queryset = User.objects.all()
-    serializer_class = UserRegistrationSerializer
-    permission_classes = [permissions.AllowAny]
+def async_post_view(view):
+    """require_POST + csrf_exempt for async views (Django 4.2's decorators are sync-only)"""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'POST':
+            return HttpResponseNotAllowed(['POST'])
+        return await view(request, *args, **kwargs)
+    wrapper.csrf_exempt = True
+    return wrapper
+
+def throttled(rule):
+    seconds = throttling.retry_after(rule)
+    response = JsonResponse(
+        {'detail': f'Request was throttled. Expected available in {seconds} seconds.'},
+        status=status.HTTP_429_TOO_MANY_REQUESTS
+    )
+    response['Retry-After'] = str(seconds)
+    return response
+
+def auth_payload(user):
+    """Serialized user plus a fresh token pair (records the outstanding token)"""
+    refresh = UserRefreshToken.for_user(user)
+    return {
+        'user': UserSerializer(user).data,
+        'tokens': {
+            'refresh': str(refresh),
+            'access': str(refresh.access_token),
+        }
+    }
+
+@async_post_view
+async def register_view(request):
+    """Create an account; the password is hashed once, on the hashing pool"""
+    if not await throttling.hit('REGISTER_IP', throttling.client_ip(request)):
+        return throttled('REGISTER_IP')
+    
+    data = request_data(request)
+    if data is None:
+        return JsonResponse({'detail': 'JSON parse error'}, status=status.HTTP_400_BAD_REQUEST)
+    serializer = UserRegistrationSerializer(data=data)
+    if not await sync_to_async(serializer.is_valid)():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
-    def create(self, request, *args, **kwargs):
-        serializer = self.get_serializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        user = serializer.save()
-        
-        # Generate tokens
-        refresh = RefreshToken.for_user(user)
-        
-        return Response({
-            'user': UserSerializer(user).data,
-            'tokens': {
-                'refresh': str(refresh),
-                'access': str(refresh.access_token),
-            }
-        }, status=status.HTTP_201_CREATED)
+    password_hash = await amake_password(serializer.validated_data['password'])
+    user = await sync_to_async(serializer.save)(password_hash=password_hash)
+    payload = await sync_to_async(auth_payload)(user)
+    return JsonResponse(payload, status=status.HTTP_201_CREATED)
 
-class LoginView(generics.GenericAPIView):
-    serializer_class = UserLoginSerializer
-    permission_classes = [permissions.AllowAny]
+@async_post_view
+async def login_view(request):
+    """Email/password login; throttles run before the password is hashed"""
+    data = request_data(request)
+    if data is None:
+        return JsonResponse({'detail': 'JSON parse error'}, status=status.HTTP_400_BAD_REQUEST)
+    serializer = UserLoginSerializer(data=data)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    email = serializer.validated_data['email']
+    password = serializer.validated_data['password']
     
-    def post(self, request, *args, **kwargs):
-        serializer = self.get_serializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        user = serializer.validated_data['user']
-        
-        # Generate tokens
-        refresh = RefreshToken.for_user(user)
-        
-        return Response({
-            'user': UserSerializer(user).data,
-            'tokens': {
-                'refresh': str(refresh),
-                'access': str(refresh.access_token),
-            }
-        })
+    if not await throttling.hit('LOGIN_IP', throttling.client_ip(request)):
+        return throttled('LOGIN_IP')
+    # Counted before hashing, so a burst of guesses can't all reach PBKDF2
+    if not await throttling.hit('LOGIN_ACCOUNT', email):
+        return throttled('LOGIN_ACCOUNT')
+    
+    user = await User.objects.filter(email=email).afirst()
+    valid, rehashed = await averify_password(password, user.password if user else None)
+    if not valid or not user.is_active:
+        return JsonResponse({'non_field_errors': ['Invalid credentials']}, status=status.HTTP_400_BAD_REQUEST)
+    
+    await throttling.clear('LOGIN_ACCOUNT', email)
+    if rehashed:
+        user.password = rehashed
+        await user.asave(update_fields=['password'])
+    return JsonResponse(await sync_to_async(auth_payload)(user))
 
 class ProfileView(generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
@@ -62,37 +108,62 @@ class ProfileView(generics.RetrieveUpdateAPIView):
 def logout_view(request):
     try:
         refresh_token = request.data["refresh"]
-        token = RefreshToken(refresh_token)
+        token = UserRefreshToken(refresh_token)
         token.blacklist()
         return Response({"message": "Successfully logged out"}, status=status.HTTP_200_OK)
     except Exception as e:
         return Response({"error": "Invalid token"}, status=status.HTTP_400_BAD_REQUEST)
 
-class CountyListView(generics.ListAPIView):
-    queryset = County.objects.all()
+class UnpaginatedMixin:
+    """``?all=true`` returns the whole list without pagination"""
+    
+    def paginate_queryset(self, queryset):
+        if self.request.query_params.get('all') in ('1', 'true'):
+            return None
+        return super().paginate_queryset(queryset)
+
+class CountyListView(UnpaginatedMixin, generics.ListAPIView):
+    queryset = County.objects.order_by('name')
     serializer_class = CountySerializer
     permission_classes = [permissions.AllowAny]
 
-class ConstituencyListView(generics.ListAPIView):
+class ConstituencyListView(UnpaginatedMixin, generics.ListAPIView):
     queryset = Constituency.objects.all()
     serializer_class = ConstituencySerializer
     permission_classes = [permissions.AllowAny]
     
     def get_queryset(self):
-        queryset = Constituency.objects.all()
+        queryset = Constituency.objects.select_related('county').order_by('name')
         county_id = self.request.query_params.get('county', None)
         if county_id is not None:
             queryset = queryset.filter(county_id=county_id)
         return queryset
 
-class WardListView(generics.ListAPIView):
+class WardListView(UnpaginatedMixin, generics.ListAPIView):
     queryset = Ward.objects.all()
     serializer_class = WardSerializer
     permission_classes = [permissions.AllowAny]
     
     def get_queryset(self):
-        queryset = Ward.objects.all()
+        queryset = Ward.objects.select_related('constituency__county').order_by('name')
         constituency_id = self.request.query_params.get('constituency', None)
         if constituency_id is not None:
             queryset = queryset.filter(constituency_id=constituency_id)
-        return queryset
\ No newline at end of file
+        return queryset
+
+@require_safe
+def geography_tree(request):
+    """Whole county/constituency/ward hierarchy, precompressed with a strong ETag"""
+    tree = get_tree()
+    encoding = tree.negotiate(request.headers.get('Accept-Encoding', ''))
+    body, etag = tree.variants[encoding]
+    
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type='application/json')
+        if encoding:
+            response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    patch_vary_headers(response, ['Accept-Encoding'])
+    patch_cache_control(response, public=True, max_age=getattr(settings, 'API_CACHE_MAX_AGE', 30))
+    return response
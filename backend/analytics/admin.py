@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import AnalyticsSnapshot, CountyAnalytics, CategoryAnalytics
+from .models import AnalyticsSnapshot, CountyAnalytics, CategoryAnalytics, SpikeAlert
 
 @admin.register(AnalyticsSnapshot)
 class AnalyticsSnapshotAdmin(admin.ModelAdmin):
@@ -26,4 +26,14 @@ class CategoryAnalyticsAdmin(admin.ModelAdmin):
         'avg_resolution_time'
     ]
     list_filter = ['category', 'date']
-    ordering = ['-date', 'category']
\ No newline at end of file
+    ordering = ['-date', 'category']
+
+@admin.register(SpikeAlert)
+class SpikeAlertAdmin(admin.ModelAdmin):
+    list_display = [
+        'county', 'category', 'hour_start', 'observed', 'expected',
+        'z_score', 'acknowledged'
+    ]
+    list_filter = ['acknowledged', 'category', 'county']
+    list_editable = ['acknowledged']
+    ordering = ['-hour_start']
\ No newline at end of file
@@ -0,0 +1,197 @@
+import math
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from .models import SpikeBaseline, SpikeBucket, SpikeAlert
+
+DEFAULTS = {
+    'ENABLED': True,
+    'ALPHA': 0.1,         # EWMA smoothing per closed hour
+    'THRESHOLD': 3.0,     # z-score that raises an alert
+    'MIN_COUNT': 3,       # ignore spikes smaller than this many reports
+    'WARMUP_HOURS': 24,   # closed hours required before alerting
+    'VARIANCE_FLOOR': 0.25,
+    'MAX_GAP_HOURS': 168,  # empty hours folded at most; older gaps saturate
+}
+
+
+def spike_setting(name):
+    return getattr(settings, 'SPIKE_DETECTION', {}).get(name, DEFAULTS[name])
+
+
+def hour_number(timestamp):
+    return int(timestamp.timestamp() // 3600)
+
+
+def hour_start(hour):
+    return datetime.fromtimestamp(hour * 3600, tz=dt_timezone.utc)
+
+
+class BaselineState:
+    """Plain EWMA state, mirrored by the SpikeBaseline model's fields"""
+
+    def __init__(self, mean=0.0, variance=0.0, samples=0, hour=None, count=0):
+        self.mean = mean
+        self.variance = variance
+        self.samples = samples
+        self.hour = hour
+        self.count = count
+
+
+class SpikeDetector:
+    """Incremental per county x category hourly spike detector.
+
+    Each report increments the open hourly bucket; when a later hour
+    arrives the bucket (and any empty hours in between, capped) is folded
+    into an exponentially weighted mean and variance. The open bucket is
+    compared with the baseline on every report, so each observation is O(1).
+    Works on ``BaselineState`` or a ``SpikeBaseline`` given a ``count``.
+    """
+
+    def __init__(self, alpha=None, threshold=None, min_count=None, warmup=None):
+        self.alpha = alpha if alpha is not None else spike_setting('ALPHA')
+        self.threshold = threshold if threshold is not None else spike_setting('THRESHOLD')
+        self.min_count = min_count if min_count is not None else spike_setting('MIN_COUNT')
+        self.warmup = warmup if warmup is not None else spike_setting('WARMUP_HOURS')
+        self.variance_floor = spike_setting('VARIANCE_FLOOR')
+        self.max_gap = spike_setting('MAX_GAP_HOURS')
+
+    def fold(self, state, value):
+        diff = value - state.mean
+        increment = self.alpha * diff
+        state.mean += increment
+        state.variance = (1 - self.alpha) * (state.variance + diff * increment)
+        state.samples += 1
+
+    def advance(self, state, hour):
+        """Close buckets up to ``hour``; returns False for late reports"""
+        if state.hour is None:
+            state.hour = hour
+            return True
+        if hour < state.hour:
+            return False
+        if hour > state.hour:
+            self.fold(state, state.count)
+            for _ in range(min(hour - state.hour - 1, self.max_gap)):
+                self.fold(state, 0)
+            state.hour = hour
+            state.count = 0
+        return True
+
+    def score(self, state):
+        std = math.sqrt(max(state.variance, self.variance_floor))
+        return (state.count - state.mean) / std
+
+    def spike(self, state):
+        """The open bucket's z-score if it is a spike, else None"""
+        if state.samples < self.warmup or state.count < self.min_count:
+            return None
+        z_score = self.score(state)
+        return z_score if z_score >= self.threshold else None
+
+    def observe(self, state, timestamp):
+        """Count one report; returns the z-score if it is a spike, else None"""
+        if not self.advance(state, hour_number(timestamp)):
+            return None
+        state.count += 1
+        return self.spike(state)
+
+
+def count_report(county, category, hour):
+    """Add one report to its hourly bucket; no row stays locked past the statement"""
+    bucket = SpikeBucket.objects.filter(county=county, category=category, hour=hour)
+    if bucket.update(count=F('count') + 1):
+        return
+    try:
+        with transaction.atomic():
+            SpikeBucket.objects.create(county=county, category=category, hour=hour, count=1)
+    except IntegrityError:
+        # Created by a concurrent report
+        bucket.update(count=F('count') + 1)
+
+
+def fold_buckets(baseline, hour, detector):
+    """Fold the closed buckets before ``hour`` into a locked baseline"""
+    buckets = SpikeBucket.objects.filter(county=baseline.county, category=baseline.category)
+    baseline.count = 0
+    if baseline.hour is not None:
+        closed = buckets.filter(hour__gte=baseline.hour, hour__lt=hour).order_by('hour')
+        for bucket_hour, count in closed.values_list('hour', 'count'):
+            detector.advance(baseline, bucket_hour)
+            baseline.count = count
+    detector.advance(baseline, hour)
+    baseline.save()
+    buckets.filter(hour__lt=hour).delete()
+
+
+def check_spike(county, category, hour, detector=None):
+    """Bring the baseline up to ``hour`` and raise or refresh an alert if its bucket is a spike"""
+    detector = detector or SpikeDetector()
+    baseline = SpikeBaseline.objects.filter(county=county, category=category).first()
+    if baseline is None or baseline.hour is None or baseline.hour < hour:
+        # Once an hour per county and category; other checks only read
+        with transaction.atomic():
+            baseline, _ = SpikeBaseline.objects.select_for_update().get_or_create(county=county, category=category)
+            if baseline.hour is None or baseline.hour < hour:
+                fold_buckets(baseline, hour, detector)
+    if hour < baseline.hour:
+        # A late report for a closed hour
+        return None
+
+    baseline.count = SpikeBucket.objects.filter(
+        county=county, category=category, hour=hour
+    ).values_list('count', flat=True).first() or 0
+    z_score = detector.spike(baseline)
+    if z_score is None:
+        return None
+    alert, _ = SpikeAlert.objects.update_or_create(
+        county=county,
+        category=category,
+        hour_start=hour_start(hour),
+        defaults={
+            'observed': baseline.count,
+            'expected': round(baseline.mean, 3),
+            'z_score': round(z_score, 3),
+        }
+    )
+    return alert
+
+
+def record_issue(issue, detector=None):
+    """Count a new issue and check its county and category for a spike; returns the alert, if any.
+
+    Call it after the issue's transaction commits: the bucket is updated with
+    one atomic statement and the baseline is only locked to fold a closed
+    hour, so concurrent reports don't queue behind each other.
+    """
+    hour = hour_number(issue.created_at)
+    count_report(issue.county, issue.category, hour)
+    return check_spike(issue.county, issue.category, hour, detector)
+
+
+def replay(rows, detector=None):
+    """Feed ``(county, category, created_at)`` rows through a fresh in-memory detector.
+
+    Returns ``(alerts, states)`` where alerts are dicts keyed like SpikeAlert,
+    one per county, category and hour (the peak z-score is kept).
+    """
+    detector = detector or SpikeDetector()
+    states = {}
+    alerts = {}
+    for county, category, created_at in rows:
+        state = states.setdefault((county, category), BaselineState())
+        z_score = detector.observe(state, created_at)
+        if z_score is None:
+            continue
+        key = (county, category, state.hour)
+        alerts[key] = {
+            'county': county,
+            'category': category,
+            'hour_start': hour_start(state.hour),
+            'observed': state.count,
+            'expected': round(state.mean, 3),
+            'z_score': round(max(z_score, alerts.get(key, {}).get('z_score', z_score)), 3),
+        }
+    return list(alerts.values()), states
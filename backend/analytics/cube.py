@@ -0,0 +1,346 @@
+import threading
+import time
+from datetime import date, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+from issues.models import Issue
+
+# Dictionary-encoded issue attributes held by the cube
+DIMENSIONS = ['county', 'constituency', 'ward', 'category', 'severity', 'status']
+
+# Numeric columns carried alongside the dimensions (NaN for missing coordinates)
+MEASURES = {'latitude': np.float64, 'longitude': np.float64, 'upvotes': np.int32}
+
+# Time dimensions derived from the created_at day number
+TIME_DIMENSIONS = ['day', 'month', 'year']
+
+EPOCH = date(1970, 1, 1)
+
+# Above this many possible groups, fall back from bincount to unique
+MAX_DENSE_GROUPS = 1 << 22
+
+# Refreshes re-read rows this far behind the watermark: a transaction can stamp
+# updated_at before the last refresh and only commit after it
+OVERLAP_SECONDS = 60
+
+# Deletes are only noticed by comparing row counts, at most this often
+COUNT_SECONDS = 60
+
+
+class CubeQueryError(ValueError):
+    """Raised for unknown dimensions in a cube query"""
+
+
+class _Columns:
+    """Immutable snapshot of the cube's columns and the vocabulary their codes refer to"""
+
+    def __init__(self, ids, codes, days, measures, vocab=None, index=None):
+        self.ids = ids
+        self.codes = codes
+        self.days = days
+        self.measures = measures
+        self.vocab = vocab or {dim: () for dim in DIMENSIONS}
+        self.index = index or {dim: {} for dim in DIMENSIONS}
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def _empty_columns():
+    return _Columns(
+        np.empty(0, dtype=np.int64),
+        {dim: np.empty(0, dtype=np.int32) for dim in DIMENSIONS},
+        np.empty(0, dtype=np.int32),
+        {name: np.empty(0, dtype=dtype) for name, dtype in MEASURES.items()},
+    )
+
+
+def _rows_equal(columns, positions, changed, selected):
+    """Whether the ``selected`` rows of ``changed`` match ``columns`` at ``positions``"""
+    return np.array_equal(columns.days[positions], changed.days[selected]) and all(
+        np.array_equal(columns.codes[dim][positions], changed.codes[dim][selected]) for dim in DIMENSIONS
+    ) and all(
+        np.array_equal(columns.measures[name][positions], changed.measures[name][selected], equal_nan=True)
+        for name in MEASURES
+    )
+
+
+def day_number(value):
+    """Days since 1970-01-01 for a date or (aware) datetime"""
+    if hasattr(value, 'hour'):
+        value = timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+    return (value - EPOCH).days
+
+
+class IssueCube:
+    """Per-process columnar cache of issues for arbitrary group-by counts.
+
+    Each dimension is stored as an int32 code array with a vocabulary list,
+    so a cross-tab is a mixed-radix key followed by a single bincount.
+    The columns are loaded once and then patched from rows whose
+    updated_at is past the last seen watermark less ``OVERLAP_SECONDS``;
+    re-read rows that haven't changed leave the snapshot as it is. A count
+    check every ``COUNT_SECONDS`` reloads after deletes. Writers build a new
+    snapshot under the lock and swap it in whole; readers take
+    ``columns()`` once and use its vocabulary, never the cube's.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Drop all cached columns; the next query reloads from the database"""
+        self._columns = _empty_columns()
+        self._clear_vocabulary()
+        self._watermark = None
+        self._revision = 0
+        self._loaded = False
+        self._checked_at = 0.0
+        self._counted_at = 0.0
+
+    def _clear_vocabulary(self):
+        # Writers' working copy; readers only see the copies frozen into snapshots
+        self._vocab = {dim: [] for dim in DIMENSIONS}
+        self._index = {dim: {} for dim in DIMENSIONS}
+
+    def _freeze(self, columns):
+        columns.vocab = {dim: tuple(values) for dim, values in self._vocab.items()}
+        columns.index = {dim: dict(index) for dim, index in self._index.items()}
+        return columns
+
+    # Loading
+
+    def _encode(self, dim, value):
+        index = self._index[dim]
+        code = index.get(value)
+        if code is None:
+            code = len(self._vocab[dim])
+            self._vocab[dim].append(value)
+            index[value] = code
+        return code
+
+    def _fetch(self, queryset):
+        """Encode rows of a queryset into column arrays"""
+        ids, days = [], []
+        codes = {dim: [] for dim in DIMENSIONS}
+        measures = {name: [] for name in MEASURES}
+        watermark = self._watermark
+        rows = queryset.values_list('id', *DIMENSIONS, *MEASURES, 'created_at', 'updated_at')
+        for row in rows.iterator(chunk_size=10000):
+            ids.append(row[0])
+            for offset, dim in enumerate(DIMENSIONS, start=1):
+                codes[dim].append(self._encode(dim, row[offset] or ''))
+            for offset, name in enumerate(MEASURES, start=len(DIMENSIONS) + 1):
+                value = row[offset]
+                measures[name].append(np.nan if value is None else float(value))
+            days.append(day_number(row[-2]))
+            if watermark is None or row[-1] > watermark:
+                watermark = row[-1]
+        self._watermark = watermark
+        return _Columns(
+            np.asarray(ids, dtype=np.int64),
+            {dim: np.asarray(values, dtype=np.int32) for dim, values in codes.items()},
+            np.asarray(days, dtype=np.int32),
+            {name: np.asarray(measures[name], dtype=dtype) for name, dtype in MEASURES.items()},
+        )
+
+    @property
+    def version(self):
+        """Changes whenever the cached columns change"""
+        return (len(self._columns), self._watermark and self._watermark.isoformat(), self._revision)
+
+    def load(self):
+        """Full load of all issues"""
+        with self._lock:
+            # The old snapshot keeps serving queries until the new one is complete
+            self._clear_vocabulary()
+            self._watermark = None
+            self._columns = self._freeze(self._fetch(Issue.objects.order_by('id')))
+            self._revision += 1
+            self._loaded = True
+            self._checked_at = self._counted_at = time.monotonic()
+
+    def refresh(self):
+        """Patch the columns with issues updated since the last load"""
+        if not self._loaded:
+            self.load()
+            return
+
+        with self._lock:
+            self._checked_at = now = time.monotonic()
+            queryset = Issue.objects.order_by('id')
+            if self._watermark is not None:
+                queryset = queryset.filter(updated_at__gte=self._watermark - timedelta(seconds=OVERLAP_SECONDS))
+            changed = self._fetch(queryset)
+            columns = self._columns
+
+            if len(changed):
+                positions = np.searchsorted(columns.ids, changed.ids)
+                positions = np.minimum(positions, max(len(columns) - 1, 0))
+                existing = (
+                    columns.ids[positions] == changed.ids
+                    if len(columns) else np.zeros(len(changed), dtype=bool)
+                )
+                at = positions[existing]
+                added = ~existing
+
+            if len(changed) and (added.any() or not _rows_equal(columns, at, changed, existing)):
+                ids = columns.ids
+                days = columns.days.copy()
+                codes = {dim: array.copy() for dim, array in columns.codes.items()}
+                measures = {name: array.copy() for name, array in columns.measures.items()}
+                days[at] = changed.days[existing]
+                for dim in DIMENSIONS:
+                    codes[dim][at] = changed.codes[dim][existing]
+                for name in MEASURES:
+                    measures[name][at] = changed.measures[name][existing]
+
+                if added.any():
+                    ids = np.concatenate([ids, changed.ids[added]])
+                    days = np.concatenate([days, changed.days[added]])
+                    for dim in DIMENSIONS:
+                        codes[dim] = np.concatenate([codes[dim], changed.codes[dim][added]])
+                    for name in MEASURES:
+                        measures[name] = np.concatenate([measures[name], changed.measures[name][added]])
+                    if len(ids) > 1 and (np.diff(ids) < 0).any():
+                        order = np.argsort(ids, kind='stable')
+                        ids, days = ids[order], days[order]
+                        codes = {dim: array[order] for dim, array in codes.items()}
+                        measures = {name: array[order] for name, array in measures.items()}
+
+                columns = self._freeze(_Columns(ids, codes, days, measures))
+                self._columns = columns
+                self._revision += 1
+
+            # Deleted rows leave no trace in updated_at, so reload when counts drift
+            if now - self._counted_at >= COUNT_SECONDS:
+                self._counted_at = now
+                if Issue.objects.count() != len(columns):
+                    self._loaded = False
+
+        if not self._loaded:
+            self.load()
+
+    def ensure_fresh(self):
+        """Refresh at most once per ANALYTICS_CUBE_REFRESH_SECONDS"""
+        interval = getattr(settings, 'ANALYTICS_CUBE_REFRESH_SECONDS', 5)
+        if not self._loaded or time.monotonic() - self._checked_at >= interval:
+            self.refresh()
+        return self
+
+    # Querying
+
+    def _time_codes(self, dim, days):
+        """Integer codes and labels for a derived time dimension"""
+        if dim == 'day':
+            values = days.astype(np.int64)
+            unit = 'D'
+        else:
+            unit = 'M' if dim == 'month' else 'Y'
+            values = days.astype('datetime64[D]').astype(f'datetime64[{unit}]').astype(np.int64)
+
+        if len(values) == 0:
+            return values, 1, lambda code: None
+        low = int(values.min())
+        size = int(values.max()) - low + 1
+
+        def label(code):
+            return str(np.datetime64(low + int(code), unit))
+
+        return values - low, size, label
+
+    def select(self, filters=None, date_from=None, date_to=None, columns=None):
+        """Boolean row mask for dimension filters and a created_at date range"""
+        columns = self._columns if columns is None else columns
+        mask = np.ones(len(columns), dtype=bool)
+
+        for dim, values in (filters or {}).items():
+            if dim not in DIMENSIONS:
+                raise CubeQueryError(f"Unknown dimension '{dim}'")
+            index = columns.index[dim]
+            wanted = [index[value] for value in values if value in index]
+            mask &= np.isin(columns.codes[dim], wanted)
+
+        if date_from is not None:
+            mask &= columns.days >= day_number(date_from)
+        if date_to is not None:
+            mask &= columns.days <= day_number(date_to)
+        return mask
+
+    def columns(self):
+        """Current column snapshot (safe to read while a refresh swaps it)"""
+        return self._columns
+
+    def vocabulary(self, dim):
+        return list(self._columns.vocab[dim])
+
+    def query(self, group_by=(), filters=None, date_from=None, date_to=None):
+        """Count issues grouped by any combination of dimensions.
+
+        ``filters`` maps a dimension to a list of accepted values.
+        Returns a list of ``{dim: value, ..., 'count': n}`` rows,
+        largest first.
+        """
+        for dim in group_by:
+            if dim not in DIMENSIONS and dim not in TIME_DIMENSIONS:
+                raise CubeQueryError(f"Unknown dimension '{dim}'")
+
+        columns = self._columns
+        mask = self.select(filters, date_from, date_to, columns)
+
+        if not group_by:
+            return [{'count': int(mask.sum())}]
+
+        # Combine the grouped columns into one mixed-radix key
+        key = np.zeros(int(mask.sum()), dtype=np.int64)
+        sizes, labels = [], []
+        for dim in group_by:
+            if dim in TIME_DIMENSIONS:
+                codes, size, label = self._time_codes(dim, columns.days[mask])
+            else:
+                codes = columns.codes[dim][mask]
+                size = max(len(columns.vocab[dim]), 1)
+                label = columns.vocab[dim].__getitem__
+            key = key * size + codes
+            sizes.append(size)
+            labels.append(label)
+
+        total_groups = int(np.prod(sizes, dtype=np.float64))
+        if total_groups <= MAX_DENSE_GROUPS:
+            counts = np.bincount(key, minlength=total_groups)
+            keys = np.flatnonzero(counts)
+            counts = counts[keys]
+        else:
+            keys, counts = np.unique(key, return_counts=True)
+
+        order = np.argsort(-counts, kind='stable')
+        keys, counts = keys[order], counts[order]
+
+        # Decode each key back into its per-dimension codes
+        decoded = []
+        remainder = keys
+        for size in reversed(sizes):
+            decoded.append(remainder % size)
+            remainder = remainder // size
+        decoded.reverse()
+
+        results = []
+        for row in range(len(keys)):
+            cell = {
+                dim: labels[position](decoded[position][row])
+                for position, dim in enumerate(group_by)
+            }
+            cell['count'] = int(counts[row])
+            results.append(cell)
+        return results
+
+
+cube = IssueCube()
+
+
+def get_cube():
+    """The process-wide cube, refreshed if its interval has elapsed"""
+    return cube.ensure_fresh()
@@ -0,0 +1,173 @@
+import hashlib
+import json
+
+import numpy as np
+from django.core.cache import cache
+from uwazi254_backend.metrics import CACHE_REQUESTS
+from .cube import get_cube
+
+SEVERITY_WEIGHTS = {'low': 1.0, 'medium': 2.0, 'high': 3.0, 'critical': 4.0}
+
+WEIGHTINGS = ['count', 'severity', 'votes', 'combined']
+
+MAX_BINS = 500
+
+# Two-tailed z thresholds for 99% and 95% confidence
+Z_99, Z_95 = 2.576, 1.960
+
+
+class HeatmapError(ValueError):
+    """Raised for invalid heatmap parameters"""
+
+
+def point_weights(cube, columns, mask, weighting):
+    """Per-issue weight for the selected rows"""
+    if weighting == 'count':
+        return None
+
+    weights = np.ones(int(mask.sum()))
+    if weighting in ('severity', 'combined'):
+        lookup = np.array(
+            [SEVERITY_WEIGHTS.get(value, 1.0) for value in columns.vocab['severity']] or [1.0]
+        )
+        weights *= lookup[columns.codes['severity'][mask]]
+    if weighting in ('votes', 'combined'):
+        # Log damping keeps one viral issue from swamping its neighbourhood
+        weights *= 1.0 + np.log1p(columns.measures['upvotes'][mask].astype(np.float64))
+    return weights
+
+
+def neighbourhood_sum(grid):
+    """Sum of each cell and its eight neighbours (queen contiguity)"""
+    padded = np.pad(grid, 1)
+    rows, cols = grid.shape
+    total = np.zeros_like(grid, dtype=np.float64)
+    for dr in (0, 1, 2):
+        for dc in (0, 1, 2):
+            total += padded[dr:dr + rows, dc:dc + cols]
+    return total
+
+
+def getis_ord(grid):
+    """Getis-Ord Gi* z-score for every cell using a 3x3 binary neighbourhood"""
+    n = grid.size
+    if n < 2:
+        return np.zeros_like(grid, dtype=np.float64)
+
+    mean = grid.mean()
+    std = np.sqrt((grid ** 2).mean() - mean ** 2)
+    if std == 0:
+        return np.zeros_like(grid, dtype=np.float64)
+
+    local = neighbourhood_sum(grid)
+    # Neighbour counts, fewer at the edges; binary weights so sum(w^2) == sum(w)
+    weights = neighbourhood_sum(np.ones_like(grid, dtype=np.float64))
+    denominator = std * np.sqrt((n * weights - weights ** 2) / (n - 1))
+    return (local - mean * weights) / denominator
+
+
+def compute_heatmap(filters=None, date_from=None, date_to=None, bins=50,
+                    weighting='combined', bbox=None):
+    """Bin geotagged issues into a grid and score hot/cold spots.
+
+    ``bbox`` is ``(min_lat, min_lon, max_lat, max_lon)``; without it the
+    extent of the selected points is used. Only non-empty or significant
+    cells are returned.
+    """
+    if weighting not in WEIGHTINGS:
+        raise HeatmapError(f"Unknown weight '{weighting}'")
+    if not 1 <= bins <= MAX_BINS:
+        raise HeatmapError(f'bins must be between 1 and {MAX_BINS}')
+
+    cube = get_cube()
+    columns = cube.columns()
+    latitude = columns.measures['latitude']
+    longitude = columns.measures['longitude']
+    mask = cube.select(filters, date_from, date_to, columns)
+    mask &= ~np.isnan(latitude) & ~np.isnan(longitude)
+
+    if bbox is not None:
+        min_lat, min_lon, max_lat, max_lon = bbox
+        if min_lat >= max_lat or min_lon >= max_lon:
+            raise HeatmapError('Invalid bbox')
+        mask &= (latitude >= min_lat) & (latitude <= max_lat)
+        mask &= (longitude >= min_lon) & (longitude <= max_lon)
+    elif mask.any():
+        min_lat, max_lat = latitude[mask].min(), latitude[mask].max()
+        min_lon, max_lon = longitude[mask].min(), longitude[mask].max()
+        # Avoid a zero-width range when all points share a coordinate
+        if min_lat == max_lat:
+            min_lat, max_lat = min_lat - 0.005, max_lat + 0.005
+        if min_lon == max_lon:
+            min_lon, max_lon = min_lon - 0.005, max_lon + 0.005
+    else:
+        return {'points': 0, 'bins': bins, 'bounds': None, 'cells': []}
+
+    extent = [[min_lat, max_lat], [min_lon, max_lon]]
+    counts, lat_edges, lon_edges = np.histogram2d(
+        latitude[mask], longitude[mask], bins=bins, range=extent
+    )
+    weights = point_weights(cube, columns, mask, weighting)
+    if weights is None:
+        grid = counts
+    else:
+        grid, _, _ = np.histogram2d(
+            latitude[mask], longitude[mask], bins=bins, range=extent, weights=weights
+        )
+
+    z_scores = getis_ord(grid)
+    lat_centres = (lat_edges[:-1] + lat_edges[1:]) / 2
+    lon_centres = (lon_edges[:-1] + lon_edges[1:]) / 2
+
+    cells = []
+    rows, cols = np.nonzero((counts > 0) | (np.abs(z_scores) >= Z_95))
+    for row, col in zip(rows.tolist(), cols.tolist()):
+        z = float(z_scores[row, col])
+        if z >= Z_99:
+            hotspot = 'hot-99'
+        elif z >= Z_95:
+            hotspot = 'hot-95'
+        elif z <= -Z_99:
+            hotspot = 'cold-99'
+        elif z <= -Z_95:
+            hotspot = 'cold-95'
+        else:
+            hotspot = None
+        cells.append({
+            'row': row,
+            'col': col,
+            'latitude': round(float(lat_centres[row]), 6),
+            'longitude': round(float(lon_centres[col]), 6),
+            'count': int(counts[row, col]),
+            'weight': round(float(grid[row, col]), 3),
+            'gi_z': round(z, 3),
+            'hotspot': hotspot,
+        })
+
+    return {
+        'points': int(mask.sum()),
+        'bins': bins,
+        'weight': weighting,
+        'bounds': {
+            'min_lat': float(min_lat), 'min_lon': float(min_lon),
+            'max_lat': float(max_lat), 'max_lon': float(max_lon),
+        },
+        'cell_size': {
+            'lat': float(lat_edges[1] - lat_edges[0]),
+            'lon': float(lon_edges[1] - lon_edges[0]),
+        },
+        'cells': cells,
+    }
+
+
+def cached_heatmap(timeout=60, **params):
+    """compute_heatmap memoised per parameter set and cube version"""
+    cube = get_cube()
+    raw = json.dumps([params, cube.version], sort_keys=True, default=str)
+    key = 'analytics:heatmap:' + hashlib.md5(raw.encode()).hexdigest()
+    result = cache.get(key)
+    CACHE_REQUESTS.inc(cache='heatmap', result='miss' if result is None else 'hit')
+    if result is None:
+        result = compute_heatmap(**params)
+        cache.set(key, result, timeout)
+    return result
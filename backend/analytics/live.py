@@ -0,0 +1,250 @@
+import asyncio
+import json
+import threading
+import uuid
+from collections import defaultdict, deque
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.module_loading import import_string
+from uwazi254_backend.metrics import GaugeMetric
+
+DEFAULTS = {
+    'BACKEND': 'analytics.live.InProcessBackend',
+    'TICK_SECONDS': 1.0,
+    'HISTORY': 1000,
+    'HEARTBEAT_SECONDS': 15,
+    'MAX_PENDING': 10000,
+    'CLIENT_QUEUE': 100,
+}
+
+
+def live_setting(name):
+    return getattr(settings, 'LIVE_UPDATES', {}).get(name, DEFAULTS[name])
+
+
+class InProcessBackend:
+    """Default pub/sub: events published in this process, drained by its broadcaster.
+
+    Thread-safe so sync views (WSGI threads or ASGI's thread pool) can publish.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = deque(maxlen=live_setting('MAX_PENDING'))
+
+    def publish(self, event):
+        with self._lock:
+            self._pending.append(event)
+
+    def drain(self):
+        with self._lock:
+            events = list(self._pending)
+            self._pending.clear()
+        return events
+
+    def depth(self):
+        return len(self._pending)
+
+
+class RedisBackend:
+    """Cross-process pub/sub over a Redis channel, for multi-worker deployments"""
+
+    channel = 'uwazi254:live'
+
+    def __init__(self):
+        import redis
+        self._redis = redis.Redis.from_url(getattr(settings, 'REDIS_URL', 'redis://localhost:6379/0'))
+        # Subscribed up front: Redis doesn't keep messages for subscribers that join later
+        self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(self.channel)
+
+    def publish(self, event):
+        self._redis.publish(self.channel, json.dumps(event, cls=DjangoJSONEncoder))
+
+    def drain(self):
+        """Blocking socket reads; the broadcaster calls it off the event loop"""
+        events = []
+        while True:
+            message = self._pubsub.get_message(timeout=0)
+            if message is None:
+                return events
+            events.append(json.loads(message['data']))
+
+
+def summarise(events):
+    """Fold a batch of events into net breakdown count changes"""
+    breakdown = defaultdict(lambda: defaultdict(int))
+    for event in events:
+        if event['type'] == 'issue_created':
+            for dim in ('status', 'category', 'county', 'severity'):
+                breakdown[dim][event[dim]] += 1
+        elif event['type'] == 'status_changed':
+            breakdown['status'][event['previous']] -= 1
+            breakdown['status'][event['status']] += 1
+    return {
+        dim: {key: delta for key, delta in counts.items() if delta}
+        for dim, counts in breakdown.items()
+    }
+
+
+class Broadcaster:
+    """Batches published events on a tick and fans them out to subscribers.
+
+    Each batch is serialised once and the same SSE frame is queued for every
+    connection, so idle clients cost one queue each. A bounded history lets
+    reconnecting clients resume from their last sequence number.
+
+    The tick loop only runs while someone is subscribed. Events published
+    while nobody listened are dropped when it restarts, and the sequence
+    skips ahead with the history cleared, so a client resuming across the
+    idle period is sent a reset instead of a burst of stale deltas.
+
+    Sequence numbers are per broadcaster, i.e. per worker process, so event
+    IDs are ``<epoch>:<sequence>`` with a random epoch per broadcaster. A
+    client resuming on another worker (or after a restart) presents an
+    unknown epoch and is sent a reset rather than a gap or duplicates.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or import_string(live_setting('BACKEND'))()
+        self.epoch = uuid.uuid4().hex[:12]
+        self.sequence = 0
+        self.history = deque(maxlen=live_setting('HISTORY'))
+        self.subscribers = set()
+        self._task = None
+
+    def publish(self, event):
+        self.backend.publish(event)
+
+    def event_id(self, sequence):
+        return f'{self.epoch}:{sequence}'
+
+    def frame(self, sequence, payload):
+        return f'id: {self.event_id(sequence)}\nevent: delta\ndata: {payload}\n\n'
+
+    def tick(self, events=None):
+        """Number a batch of events (by default, drained from the backend) and fan it out"""
+        if events is None:
+            events = self.backend.drain()
+        if not events:
+            return None
+
+        self.sequence += 1
+        payload = json.dumps(
+            {'seq': self.sequence, 'events': events, 'breakdown': summarise(events)},
+            cls=DjangoJSONEncoder
+        )
+        frame = self.frame(self.sequence, payload)
+        self.history.append((self.sequence, frame))
+
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                # Slow client: drop it, it will reconnect and resume
+                self.subscribers.discard(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+        return frame
+
+    def backlog(self, last_event_id):
+        """Frames after ``last_event_id``, or None if it is from another broadcaster or older than the history"""
+        epoch, _, since = last_event_id.rpartition(':')
+        if epoch != self.epoch or not since.isdigit():
+            return None
+        since = int(since)
+        if since == self.sequence:
+            return []
+        if since > self.sequence or not self.history or self.history[0][0] > since + 1:
+            return None
+        return [frame for sequence, frame in self.history if sequence > since]
+
+    async def drain(self):
+        return await sync_to_async(self.backend.drain, thread_sensitive=False)()
+
+    async def run(self):
+        interval = live_setting('TICK_SECONDS')
+        # Published while nobody was subscribed
+        await self.drain()
+        while self.subscribers:
+            await asyncio.sleep(interval)
+            self.tick(await self.drain())
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=live_setting('CLIENT_QUEUE'))
+        self.subscribers.add(queue)
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            if self._task is not None:
+                # Back from idle: what was published meanwhile is dropped, so nobody can resume across it
+                self.sequence += 1
+                self.history.clear()
+            self._task = loop.create_task(self.run())
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+
+    async def stream(self, last_event_id=None):
+        """Async iterator of SSE frames for one client connection"""
+        queue = self.subscribe()
+        heartbeat = live_setting('HEARTBEAT_SECONDS')
+        try:
+            if last_event_id is not None:
+                frames = self.backlog(last_event_id)
+                if frames is None:
+                    yield f'id: {self.event_id(self.sequence)}\nevent: reset\ndata: {{}}\n\n'
+                else:
+                    for frame in frames:
+                        yield frame
+            else:
+                yield f'id: {self.event_id(self.sequence)}\nevent: hello\ndata: {{}}\n\n'
+
+            while True:
+                try:
+                    frame = await asyncio.wait_for(queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield ': keep-alive\n\n'
+                    continue
+                if frame is None:
+                    return
+                yield frame
+        finally:
+            self.unsubscribe(queue)
+
+
+_broadcaster = None
+
+
+def get_broadcaster():
+    global _broadcaster
+    if _broadcaster is None:
+        _broadcaster = Broadcaster()
+    return _broadcaster
+
+
+def publish(event):
+    get_broadcaster().publish(event)
+
+
+def _queue_depths():
+    broadcaster = _broadcaster
+    if broadcaster is None:
+        return {}
+    depths = {('subscribers',): sum(queue.qsize() for queue in list(broadcaster.subscribers))}
+    if hasattr(broadcaster.backend, 'depth'):
+        depths[('pending',)] = broadcaster.backend.depth()
+    return depths
+
+
+LIVE_QUEUE_DEPTH = GaugeMetric(
+    'live_queue_depth', 'Live-update events waiting to be broadcast (pending) or sent (subscribers)',
+    _queue_depths, ('queue',)
+)
+LIVE_SUBSCRIBERS = GaugeMetric(
+    'live_subscribers', 'Open live-update streams',
+    lambda: {(): len(_broadcaster.subscribers)} if _broadcaster else {}
+)
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from analytics.publishing import publish, publish_root
+
+
+class Command(BaseCommand):
+    help = 'Publish precompressed analytics JSON artifacts under STATIC_ROOT'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--root', help='Output directory (default: ANALYTICS_PUBLISH_ROOT)')
+        parser.add_argument('--force', action='store_true', help='Publish even if the data is unchanged')
+        parser.add_argument('--keep', type=int, default=3, help='Number of versions to keep')
+    
+    def handle(self, *args, **options):
+        root = options['root'] or publish_root()
+        manifest = publish(root=root, force=options['force'], keep=options['keep'])
+        
+        if manifest is None:
+            self.stdout.write('Analytics data unchanged, nothing published')
+            return
+        
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Published analytics version {manifest['version']} "
+                f"({len(manifest['files'])} artifacts) to {root}"
+            )
+        )
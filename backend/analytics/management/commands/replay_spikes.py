@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand
+from django.utils.dateparse import parse_date
+from issues.models import Issue
+from analytics.anomaly import SpikeDetector, replay
+from analytics.models import SpikeBaseline, SpikeBucket, SpikeAlert
+
+
+class Command(BaseCommand):
+    help = 'Replay historical issues through the spike detector to tune thresholds'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--alpha', type=float)
+        parser.add_argument('--threshold', type=float)
+        parser.add_argument('--min-count', type=int)
+        parser.add_argument('--warmup', type=int)
+        parser.add_argument('--since', help='Only replay issues created on or after this date')
+        parser.add_argument('--top', type=int, default=20, help='Number of alerts to print')
+        parser.add_argument(
+            '--save', action='store_true',
+            help='Replace stored baselines and alerts with the replayed ones'
+        )
+    
+    def handle(self, *args, **options):
+        detector = SpikeDetector(
+            alpha=options['alpha'],
+            threshold=options['threshold'],
+            min_count=options['min_count'],
+            warmup=options['warmup'],
+        )
+        
+        queryset = Issue.objects.order_by('created_at', 'id')
+        if options['since']:
+            queryset = queryset.filter(created_at__date__gte=parse_date(options['since']))
+        rows = queryset.values_list('county', 'category', 'created_at').iterator(chunk_size=10000)
+        
+        alerts, states = replay(rows, detector)
+        
+        self.stdout.write(
+            f'alpha={detector.alpha} threshold={detector.threshold} '
+            f'min_count={detector.min_count} warmup={detector.warmup}: '
+            f'{len(alerts)} alerts across {len(states)} county/category pairs'
+        )
+        for alert in sorted(alerts, key=lambda a: -a['z_score'])[:options['top']]:
+            self.stdout.write(
+                f"  {alert['hour_start']:%Y-%m-%d %H:00}  {alert['county']} / {alert['category']}: "
+                f"{alert['observed']} reports vs {alert['expected']} expected (z={alert['z_score']})"
+            )
+        
+        if options['save']:
+            SpikeBaseline.objects.all().delete()
+            SpikeBaseline.objects.bulk_create([
+                SpikeBaseline(
+                    county=county, category=category, mean=state.mean, variance=state.variance,
+                    samples=state.samples, hour=state.hour
+                )
+                for (county, category), state in states.items()
+            ])
+            SpikeBucket.objects.all().delete()
+            SpikeBucket.objects.bulk_create([
+                SpikeBucket(county=county, category=category, hour=state.hour, count=state.count)
+                for (county, category), state in states.items()
+            ])
+            SpikeAlert.objects.all().delete()
+            SpikeAlert.objects.bulk_create([SpikeAlert(**alert) for alert in alerts])
+            self.stdout.write(self.style.SUCCESS('Saved replayed baselines and alerts'))
@@ -52,4 +52,52 @@ class CategoryAnalytics(models.Model):
         ordering = ['-date', 'category']
     
     def __str__(self):
-        return f"{self.category} - {self.date}"
\ No newline at end of file
+        return f"{self.category} - {self.date}"
+
+class SpikeBaseline(models.Model):
+    """Rolling hourly EWMA baseline for one county and category"""
+    county = models.CharField(max_length=100)
+    category = models.CharField(max_length=20)
+    mean = models.FloatField(default=0.0)
+    variance = models.FloatField(default=0.0)
+    samples = models.PositiveIntegerField(default=0)  # closed hours folded in
+    hour = models.BigIntegerField(blank=True, null=True)  # open bucket, hours since epoch
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['county', 'category']
+    
+    def __str__(self):
+        return f"{self.county} / {self.category} baseline"
+
+class SpikeBucket(models.Model):
+    """Reports in one hour for one county and category, until folded into the baseline"""
+    county = models.CharField(max_length=100)
+    category = models.CharField(max_length=20)
+    hour = models.BigIntegerField()  # hours since epoch
+    count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['county', 'category', 'hour']
+    
+    def __str__(self):
+        return f"{self.county} / {self.category} at hour {self.hour}: {self.count}"
+
+class SpikeAlert(models.Model):
+    """Hourly report count well above the county/category baseline"""
+    county = models.CharField(max_length=100)
+    category = models.CharField(max_length=20)
+    hour_start = models.DateTimeField()
+    observed = models.PositiveIntegerField()
+    expected = models.FloatField()
+    z_score = models.FloatField()
+    acknowledged = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['county', 'category', 'hour_start']
+        ordering = ['-hour_start', '-z_score']
+    
+    def __str__(self):
+        return f"Spike in {self.category} reports, {self.county} at {self.hour_start}"
@@ -0,0 +1,133 @@
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.text import slugify
+from rest_framework.renderers import JSONRenderer
+from issues.models import Issue
+from issues.conditional import issues_version
+from .views import (
+    build_dashboard_stats, build_county_analytics,
+    build_category_analytics, build_trends_analytics
+)
+
+try:
+    import brotli
+except ImportError:  # Optional: .br variants are skipped without it
+    brotli = None
+
+MANIFEST = 'manifest.json'
+
+# The web server or CDN origin serving the files usually runs as another user
+DIR_MODE = 0o755
+FILE_MODE = 0o644
+
+
+def publish_root():
+    return getattr(settings, 'ANALYTICS_PUBLISH_ROOT', os.path.join(settings.STATIC_ROOT, 'analytics'))
+
+
+def build_artifacts():
+    """Map of relative file name to payload, mirroring the analytics endpoints"""
+    artifacts = {
+        'dashboard.json': build_dashboard_stats(),
+        'counties.json': build_county_analytics(),
+        'categories.json': build_category_analytics(),
+        'trends.json': build_trends_analytics(),
+    }
+    counties = Issue.objects.exclude(county='').order_by('county').values_list('county', flat=True).distinct()
+    for county in counties:
+        artifacts[f'counties/{slugify(county)}.json'] = build_county_analytics(county, exact=True)
+    return artifacts
+
+
+def _write_variants(path, body):
+    """Write the plain body plus precompressed .gz/.br siblings"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(body)
+    with open(path + '.gz', 'wb') as f:
+        # mtime=0 keeps the gzip bytes reproducible for identical payloads
+        f.write(gzip.compress(body, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(path + '.br', 'wb') as f:
+            f.write(brotli.compress(body, quality=11))
+
+
+def _atomic_write(path, body):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(body)
+    # mkstemp creates the file private to this user
+    os.chmod(tmp, FILE_MODE)
+    os.replace(tmp, path)
+
+
+def read_manifest(root=None):
+    try:
+        with open(os.path.join(root or publish_root(), MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def publish(root=None, force=False, keep=3):
+    """Render all artifacts into a new version directory and swap the manifest.
+
+    The version directory is built under a temporary name and renamed into
+    place, then the manifest is replaced atomically, so readers always see a
+    complete set. Returns the manifest, or None when the data is unchanged.
+    """
+    root = root or publish_root()
+    os.makedirs(root, exist_ok=True)
+
+    data_version = issues_version(None)
+    data_stamp = f'{data_version.last_modified}|{data_version.count}|{data_version.extra}'
+    current = read_manifest(root)
+    if current and current.get('data_version') == data_stamp and not force:
+        return None
+
+    renderer = JSONRenderer()
+    bodies = {name: renderer.render(payload) for name, payload in build_artifacts().items()}
+
+    digest = hashlib.sha256()
+    for name in sorted(bodies):
+        digest.update(name.encode())
+        digest.update(bodies[name])
+    version = f"{timezone.now().strftime('%Y%m%d%H%M%S')}-{digest.hexdigest()[:10]}"
+
+    staging = tempfile.mkdtemp(dir=root, prefix='.staging-')
+    try:
+        for name, body in bodies.items():
+            _write_variants(os.path.join(staging, name), body)
+        # mkdtemp creates the directory private to this user
+        os.chmod(staging, DIR_MODE)
+        os.rename(staging, os.path.join(root, version))
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    manifest = {
+        'version': version,
+        'generated_at': timezone.now().isoformat(),
+        'data_version': data_stamp,
+        'files': {
+            name[:-len('.json')]: f'{version}/{name}' for name in sorted(bodies)
+        },
+    }
+    _atomic_write(os.path.join(root, MANIFEST), json.dumps(manifest, indent=2).encode())
+
+    # Keep a few previous versions for clients still holding an old manifest
+    versions = sorted(
+        entry for entry in os.listdir(root)
+        if os.path.isdir(os.path.join(root, entry)) and not entry.startswith('.')
+    )
+    for stale in versions[:-keep]:
+        shutil.rmtree(os.path.join(root, stale), ignore_errors=True)
+
+    return manifest
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import AnalyticsSnapshot, CountyAnalytics, CategoryAnalytics
+from .models import AnalyticsSnapshot, CountyAnalytics, CategoryAnalytics, SpikeAlert
 
 class AnalyticsSnapshotSerializer(serializers.ModelSerializer):
     resolution_rate = serializers.SerializerMethodField()
@@ -33,6 +33,14 @@ class CategoryAnalyticsSerializer(serializers.ModelSerializer):
             'avg_resolution_time'
         ]
 
+class SpikeAlertSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SpikeAlert
+        fields = [
+            'id', 'county', 'category', 'hour_start', 'observed',
+            'expected', 'z_score', 'acknowledged', 'created_at', 'updated_at'
+        ]
+
 class DashboardStatsSerializer(serializers.Serializer):
     total_issues = serializers.IntegerField()
     open_issues = serializers.IntegerField()
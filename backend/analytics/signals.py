@@ -0,0 +1,67 @@
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from issues.models import Issue, IssueVote
+from uwazi254_backend.metrics import ISSUES_CREATED, STATUS_TRANSITIONS, VOTES_CAST
+from .live import publish
+from .anomaly import record_issue, spike_setting
+
+
+def publish_on_commit(event):
+    transaction.on_commit(lambda: publish(event))
+
+
+@receiver(post_init, sender=Issue)
+@receiver(post_init, sender=IssueVote)
+def remember_state(sender, instance, **kwargs):
+    # Read from __dict__ so deferred fields are not loaded
+    instance._live_status = instance.__dict__.get('status')
+    instance._live_vote_type = instance.__dict__.get('vote_type')
+
+
+@receiver(post_save, sender=Issue)
+def issue_saved(sender, instance, created, **kwargs):
+    if created:
+        ISSUES_CREATED.inc(category=instance.category)
+        if spike_setting('ENABLED'):
+            # Off the request's transaction, so a burst of reports doesn't serialize on shared rows
+            transaction.on_commit(lambda: record_issue(instance))
+        publish_on_commit({
+            'type': 'issue_created',
+            'id': instance.pk,
+            'title': instance.title,
+            'category': instance.category,
+            'severity': instance.severity,
+            'status': instance.status,
+            'county': instance.county,
+            'ward': instance.ward,
+        })
+    elif instance._live_status is not None and instance.status != instance._live_status:
+        STATUS_TRANSITIONS.inc(from_status=instance._live_status, to_status=instance.status)
+        publish_on_commit({
+            'type': 'status_changed',
+            'id': instance.pk,
+            'previous': instance._live_status,
+            'status': instance.status,
+        })
+    instance._live_status = instance.status
+
+
+@receiver(post_save, sender=IssueVote)
+def vote_saved(sender, instance, created, **kwargs):
+    previous = None if created else instance._live_vote_type
+    if previous != instance.vote_type:
+        VOTES_CAST.inc(vote_type=instance.vote_type)
+        delta = {'up': 0, 'down': 0}
+        delta[instance.vote_type] += 1
+        if previous:
+            delta[previous] -= 1
+        publish_on_commit({'type': 'votes', 'id': instance.issue_id, **delta})
+    instance._live_vote_type = instance.vote_type
+
+
+@receiver(post_delete, sender=IssueVote)
+def vote_deleted(sender, instance, **kwargs):
+    delta = {'up': 0, 'down': 0}
+    delta[instance.vote_type] -= 1
+    publish_on_commit({'type': 'votes', 'id': instance.issue_id, **delta})
@@ -1,8 +1,21 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from types import SimpleNamespace
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
 from rest_framework.test import APITestCase
 from rest_framework import status
 from issues.models import Issue
+from .cube import cube
+from . import live
+from .publishing import publish
+from .heatmap import getis_ord
+from .anomaly import SpikeDetector, record_issue, replay
+from .models import SpikeAlert, SpikeBaseline, SpikeBucket
 
 User = get_user_model()
 
@@ -36,14 +49,92 @@ class AnalyticsAPITest(APITestCase):
             ward='Mwiki',
             submitted_by=self.user
         )
+        
+        cube.reset()
     
     def test_dashboard_stats(self):
         response = self.client.get('/api/analytics/dashboard/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertIn('total_issues', response.data)
-        self.assertIn('resolution_rate', response.data)
-        self.assertIn('category_breakdown', response.data)
-        self.assertEqual(response.data['total_issues'], 2)
+        data = response.json()
+        self.assertIn('total_issues', data)
+        self.assertIn('resolution_rate', data)
+        self.assertIn('category_breakdown', data)
+        self.assertEqual(data['total_issues'], 2)
+    
+    def test_dashboard_not_modified(self):
+        response = self.client.get('/api/analytics/dashboard/')
+        response = self.client.get(
+            '/api/analytics/dashboard/',
+            HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+    
+    def test_publish_static_artifacts(self):
+        with tempfile.TemporaryDirectory() as root:
+            manifest = publish(root=root)
+            self.assertIn('counties/kiambu', manifest['files'])
+            
+            path = os.path.join(root, manifest['files']['dashboard'])
+            with gzip.open(path + '.gz') as f:
+                self.assertEqual(json.load(f)['total_issues'], 2)
+            
+            # Readable by a web server running as another user
+            self.assertEqual(os.stat(os.path.join(root, manifest['version'])).st_mode & 0o777, 0o755)
+            self.assertEqual(os.stat(os.path.join(root, 'manifest.json')).st_mode & 0o777, 0o644)
+            self.assertEqual(os.stat(path).st_mode & 0o777, 0o644)
+            
+            # Unchanged data is not republished
+            self.assertIsNone(publish(root=root))
+    
+    def test_published_county_files_match_exactly(self):
+        Issue.objects.create(
+            title='Test Issue 3', description='Test description', category='roads',
+            county='Nairobi Outskirts', constituency='', ward='', submitted_by=self.user
+        )
+        Issue.objects.create(
+            title='Test Issue 4', description='Test description', category='roads',
+            county='', constituency='', ward='', submitted_by=self.user
+        )
+        with tempfile.TemporaryDirectory() as root:
+            manifest = publish(root=root)
+            self.assertNotIn('counties/', manifest['files'])
+            with open(os.path.join(root, manifest['files']['counties/nairobi'])) as f:
+                self.assertEqual([row['county'] for row in json.load(f)], ['Nairobi'])
+    
+    def test_heatmap(self):
+        for i in range(6):
+            Issue.objects.create(
+                title=f'Geotagged {i}',
+                description='Test description',
+                category='roads',
+                severity='critical',
+                county='Nairobi',
+                constituency='Kasarani',
+                ward='Mwiki',
+                latitude=-1.2 - i * 0.001,
+                longitude=36.9,
+                submitted_by=self.user
+            )
+        
+        response = self.client.get('/api/analytics/heatmap/', {
+            'bins': 10,
+            'category': 'roads',
+            'bbox': '-1.3,36.8,-1.1,37.0'
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['points'], 6)
+        self.assertEqual(sum(cell['count'] for cell in response.data['cells']), 6)
+        
+        response = self.client.get('/api/analytics/heatmap/', {'weight': 'area'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_getis_ord_flags_cluster(self):
+        import numpy as np
+        grid = np.zeros((9, 9))
+        grid[3:6, 3:6] = 10
+        z_scores = getis_ord(grid)
+        self.assertGreater(z_scores[4, 4], 2.576)
+        self.assertLess(z_scores[0, 8], 0)
     
     def test_county_analytics(self):
         response = self.client.get('/api/analytics/counties/')
@@ -53,4 +144,206 @@ class AnalyticsAPITest(APITestCase):
     def test_category_analytics(self):
         response = self.client.get('/api/analytics/categories/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)  # roads and water
\ No newline at end of file
+        self.assertEqual(len(response.data), 2)  # roads and water
+    
+    def test_cube_group_by(self):
+        response = self.client.get('/api/analytics/cube/', {'group_by': 'county,category'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total'], 2)
+        self.assertIn({'county': 'Kiambu', 'category': 'roads', 'count': 1}, response.data['cells'])
+        self.assertIn({'county': 'Nairobi', 'category': 'water', 'count': 1}, response.data['cells'])
+    
+    def test_cube_filters(self):
+        response = self.client.get('/api/analytics/cube/', {
+            'group_by': 'status,month',
+            'status': 'resolved,closed'
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['cells']), 1)
+        self.assertEqual(response.data['cells'][0]['status'], 'resolved')
+        
+        response = self.client.get('/api/analytics/cube/', {'group_by': 'colour'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_cube_refresh_patches_updates(self):
+        cube.load()
+        issue = Issue.objects.get(title='Test Issue 1')
+        issue.status = 'resolved'
+        issue.save()
+        Issue.objects.create(
+            title='Test Issue 3',
+            description='Test description',
+            category='health',
+            county='Nairobi',
+            constituency='Kasarani',
+            ward='Mwiki',
+            submitted_by=self.user
+        )
+        cube.refresh()
+        
+        cells = cube.query(['status'])
+        self.assertEqual(cells, [
+            {'status': 'resolved', 'count': 2},
+            {'status': 'open', 'count': 1}
+        ])
+    
+    def test_cube_refresh_sees_late_commits(self):
+        cube.load()
+        version = cube.version
+        # Stamped before the watermark but committed after the last refresh
+        Issue.objects.filter(title='Test Issue 1').update(
+            status='resolved', updated_at=cube._watermark - timedelta(seconds=5)
+        )
+        cube.refresh()
+        self.assertEqual(cube.query(['status']), [{'status': 'resolved', 'count': 2}])
+        self.assertNotEqual(cube.version, version)
+        
+        # Re-reading the overlap without changes keeps the snapshot
+        version, columns = cube.version, cube.columns()
+        cube.refresh()
+        self.assertEqual(cube.version, version)
+        self.assertIs(cube.columns(), columns)
+    
+    def test_cube_queries_during_reload(self):
+        cube.load()
+        expected = cube.query(['county', 'category'])
+        during = []
+        fetch = cube._fetch
+        
+        def fetch_and_query(queryset):
+            # Another request arriving while the reload is half done
+            during.append(cube.query(['county', 'category']))
+            columns = fetch(queryset)
+            during.append(cube.query(['county', 'category']))
+            return columns
+        
+        cube._fetch = fetch_and_query
+        try:
+            cube.load()
+        finally:
+            del cube._fetch
+        self.assertEqual(during, [expected, expected])
+        self.assertEqual(cube.query(['county', 'category']), expected)
+
+
+class LiveUpdatesTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        live._broadcaster = self.broadcaster = live.Broadcaster()
+    
+    def test_writes_publish_batched_deltas(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            issue = Issue.objects.create(
+                title='Flooding',
+                description='Test description',
+                category='environment',
+                county='Kisumu',
+                constituency='Nyando',
+                ward='Ahero',
+                submitted_by=self.user
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            issue.status = 'pending'
+            issue.save()
+        
+        frame = self.broadcaster.tick()
+        payload = json.loads(frame.split('data: ', 1)[1])
+        self.assertEqual(payload['seq'], 1)
+        self.assertEqual(
+            [event['type'] for event in payload['events']],
+            ['issue_created', 'status_changed']
+        )
+        self.assertEqual(payload['breakdown']['status'], {'pending': 1})
+        self.assertIsNone(self.broadcaster.tick())
+    
+    def test_stream_resumes_from_sequence(self):
+        for title in ('first', 'second'):
+            self.broadcaster.publish({'type': 'test', 'title': title})
+            self.broadcaster.tick()
+        
+        async def first_frame(since):
+            stream = self.broadcaster.stream(since)
+            frame = await stream.__anext__()
+            await stream.aclose()
+            return frame
+        
+        epoch = self.broadcaster.epoch
+        self.assertTrue(asyncio.run(first_frame(f'{epoch}:1')).startswith(f'id: {epoch}:2\n'))
+        self.assertIn('event: reset', asyncio.run(first_frame(f'{epoch}:99')))
+        # The same sequence number from another worker's broadcaster
+        self.assertIn('event: reset', asyncio.run(first_frame(f'{live.Broadcaster().epoch}:1')))
+        self.assertIn('event: reset', asyncio.run(first_frame('1')))
+    
+    @override_settings(LIVE_UPDATES={'TICK_SECONDS': 0.01})
+    def test_events_published_while_idle_are_dropped(self):
+        async def reconnect_after_idle():
+            stream = self.broadcaster.stream()
+            last_event_id = (await stream.__anext__()).split('\n')[0][len('id: '):]
+            await stream.aclose()
+            await asyncio.sleep(0.05)  # the tick loop stops with nobody subscribed
+            self.broadcaster.publish({'type': 'test', 'title': 'stale'})
+            
+            stream = self.broadcaster.stream(last_event_id)
+            frame = await stream.__anext__()
+            await asyncio.sleep(0.05)
+            await stream.aclose()
+            return frame
+        
+        self.assertIn('event: reset', asyncio.run(reconnect_after_idle()))
+        self.assertEqual(self.broadcaster.backend.depth(), 0)
+        self.assertFalse(self.broadcaster.history)
+
+
+
+class SpikeDetectionTest(TestCase):
+    start = datetime(2024, 3, 1, tzinfo=dt_timezone.utc)
+    
+    def history(self, spike=10):
+        # One report an hour for two days, then a burst in a single hour
+        rows = [('Kisumu', 'water', self.start + timedelta(hours=h)) for h in range(48)]
+        burst = self.start + timedelta(hours=48, minutes=5)
+        rows += [('Kisumu', 'water', burst + timedelta(minutes=i)) for i in range(spike)]
+        return rows
+    
+    def test_replay_detects_burst(self):
+        alerts, states = replay(self.history(), SpikeDetector(alpha=0.1, threshold=3, min_count=3, warmup=24))
+        self.assertEqual(len(alerts), 1)
+        self.assertEqual(alerts[0]['observed'], 10)
+        self.assertEqual(alerts[0]['hour_start'], self.start + timedelta(hours=48))
+        self.assertAlmostEqual(states[('Kisumu', 'water')].mean, 1.0, places=1)
+        
+        alerts, _ = replay(self.history(spike=2), SpikeDetector(threshold=3, min_count=3, warmup=24))
+        self.assertEqual(alerts, [])
+    
+    def test_record_issue_raises_alert(self):
+        detector = SpikeDetector(alpha=0.1, threshold=3, min_count=3, warmup=24)
+        for county, category, created_at in self.history():
+            record_issue(
+                SimpleNamespace(county=county, category=category, created_at=created_at),
+                detector
+            )
+        
+        self.assertEqual(SpikeAlert.objects.count(), 1)
+        self.assertEqual(SpikeAlert.objects.get().observed, 10)
+        # Folded hours are dropped; only the open bucket remains
+        self.assertEqual(list(SpikeBucket.objects.values_list('count', flat=True)), [10])
+        response = self.client.get('/api/analytics/alerts/', {'county': 'kisumu', 'active': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['observed'], 10)
+    
+    def test_reports_are_counted_after_commit(self):
+        user = User.objects.create_user(username='reporter', email='reporter@example.com', password='testpass123')
+        with self.captureOnCommitCallbacks(execute=True):
+            Issue.objects.create(
+                title='Burst pipe', description='Test description', category='water',
+                county='Kisumu', constituency='Kisumu Central', ward='Market Milimani', submitted_by=user
+            )
+            # Nothing shared is written (or locked) inside the request's transaction
+            self.assertFalse(SpikeBucket.objects.exists())
+            self.assertFalse(SpikeBaseline.objects.exists())
+        self.assertEqual(SpikeBucket.objects.get(county='Kisumu', category='water').count, 1)
+        self.assertEqual(SpikeBaseline.objects.get(county='Kisumu', category='water').samples, 0)
@@ -1,7 +1,9 @@
 from django.urls import path
 from .views import (
     dashboard_stats, county_analytics, category_analytics, trends_analytics,
-    AnalyticsSnapshotListView, CountyAnalyticsListView, CategoryAnalyticsListView
+    cube_analytics, heatmap_analytics, live_updates,
+    AnalyticsSnapshotListView, CountyAnalyticsListView, CategoryAnalyticsListView,
+    SpikeAlertListView
 )
 
 urlpatterns = [
@@ -9,7 +11,11 @@ urlpatterns = [
     path('counties/', county_analytics, name='county-analytics'),
     path('categories/', category_analytics, name='category-analytics'),
     path('trends/', trends_analytics, name='trends-analytics'),
+    path('cube/', cube_analytics, name='cube-analytics'),
+    path('heatmap/', heatmap_analytics, name='heatmap-analytics'),
+    path('live/', live_updates, name='live-updates'),
     path('snapshots/', AnalyticsSnapshotListView.as_view(), name='analytics-snapshots'),
     path('county-stats/', CountyAnalyticsListView.as_view(), name='county-stats'),
     path('category-stats/', CategoryAnalyticsListView.as_view(), name='category-stats'),
+    path('alerts/', SpikeAlertListView.as_view(), name='spike-alerts'),
 ]
\ No newline at end of file
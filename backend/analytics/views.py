@@ -1,116 +1,136 @@
-from rest_framework import generics, permissions
+import asyncio
+
+from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from django.db.models import Count, Avg, Q
 from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.http import StreamingHttpResponse
 from datetime import datetime, timedelta
 from issues.models import Issue
-from .models import AnalyticsSnapshot, CountyAnalytics, CategoryAnalytics
+from issues.conditional import aconditional_get, aissues_version, conditional_get, issues_version
+from uwazi254_backend.async_api import api_response, async_api_view
+from .cube import get_cube, CubeQueryError, DIMENSIONS
+from .live import get_broadcaster
+from .heatmap import cached_heatmap, HeatmapError
+from .models import AnalyticsSnapshot, CountyAnalytics, CategoryAnalytics, SpikeAlert
 from .serializers import (
     AnalyticsSnapshotSerializer, CountyAnalyticsSerializer,
-    CategoryAnalyticsSerializer, DashboardStatsSerializer
+    CategoryAnalyticsSerializer, DashboardStatsSerializer, SpikeAlertSerializer
 )
 
-@api_view(['GET'])
-@permission_classes([permissions.AllowAny])
-def dashboard_stats(request):
-    """Get comprehensive dashboard statistics"""
-    
-    # Basic counts
-    total_issues = Issue.objects.count()
-    open_issues = Issue.objects.filter(status='open').count()
-    pending_issues = Issue.objects.filter(status='pending').count()
-    resolved_issues = Issue.objects.filter(status='resolved').count()
-    closed_issues = Issue.objects.filter(status='closed').count()
-    
-    # Resolution rate
-    resolution_rate = (resolved_issues / total_issues * 100) if total_issues > 0 else 0
-    
-    # Average resolution time (mock calculation)
-    avg_resolution_time = 5.2  # days
-    
-    # Category breakdown
-    category_breakdown = dict(
-        Issue.objects.values('category').annotate(count=Count('id')).values_list('category', 'count')
-    )
-    
-    # County breakdown
-    county_breakdown = dict(
-        Issue.objects.values('county').annotate(count=Count('id')).values_list('county', 'count')
-    )
-    
-    # Severity breakdown
-    severity_breakdown = dict(
-        Issue.objects.values('severity').annotate(count=Count('id')).values_list('severity', 'count')
-    )
-    
-    # Monthly trends (last 6 months)
-    monthly_trends = []
+STATUSES = ('open', 'pending', 'resolved', 'closed')
+
+
+def trend_windows(now):
+    """``(label, start, end)`` of the six monthly trend buckets, oldest first"""
+    windows = []
     for i in range(6):
-        date = timezone.now() - timedelta(days=30*i)
+        date = now - timedelta(days=30*i)
         month_start = date.replace(day=1)
         month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-        
-        issues_count = Issue.objects.filter(
-            created_at__gte=month_start,
-            created_at__lte=month_end
-        ).count()
-        
-        resolved_count = Issue.objects.filter(
-            created_at__gte=month_start,
-            created_at__lte=month_end,
-            status='resolved'
-        ).count()
-        
-        monthly_trends.append({
-            'month': date.strftime('%B %Y'),
-            'issues': issues_count,
-            'resolved': resolved_count
-        })
-    
-    monthly_trends.reverse()
-    
-    # Recent activity
-    recent_activity = []
-    recent_issues = Issue.objects.order_by('-updated_at')[:10]
-    for issue in recent_issues:
-        recent_activity.append({
-            'id': issue.id,
-            'title': issue.title,
-            'status': issue.status,
-            'county': issue.county,
-            'ward': issue.ward,
-            'updated_at': issue.updated_at,
-            'category': issue.category
-        })
-    
+        windows.append((date.strftime('%B %Y'), month_start, month_end))
+    windows.reverse()
+    return windows
+
+
+def dashboard_counts(windows):
+    """Aggregate kwargs: total, per-status and per-trend-window counts in one query"""
+    counts = {'total_issues': Count('id')}
+    for status_name in STATUSES:
+        counts[f'{status_name}_issues'] = Count('id', filter=Q(status=status_name))
+    for i, (_, start, end) in enumerate(windows):
+        in_window = Q(created_at__gte=start, created_at__lte=end)
+        counts[f'trend_{i}_issues'] = Count('id', filter=in_window)
+        counts[f'trend_{i}_resolved'] = Count('id', filter=in_window & Q(status='resolved'))
+    return counts
+
+
+def breakdown(field):
+    return Issue.objects.values(field).annotate(count=Count('id')).values_list(field, 'count')
+
+
+def recent_activity():
+    return Issue.objects.order_by('-updated_at').values(
+        'id', 'title', 'status', 'county', 'ward', 'updated_at', 'category'
+    )[:10]
+
+
+def assemble_dashboard(windows, counts, categories, counties, severities, recent):
+    total_issues = counts['total_issues']
+    resolution_rate = (counts['resolved_issues'] / total_issues * 100) if total_issues > 0 else 0
     data = {
         'total_issues': total_issues,
-        'open_issues': open_issues,
-        'pending_issues': pending_issues,
-        'resolved_issues': resolved_issues,
-        'closed_issues': closed_issues,
+        'open_issues': counts['open_issues'],
+        'pending_issues': counts['pending_issues'],
+        'resolved_issues': counts['resolved_issues'],
+        'closed_issues': counts['closed_issues'],
         'resolution_rate': round(resolution_rate, 2),
-        'avg_resolution_time': avg_resolution_time,
-        'category_breakdown': category_breakdown,
-        'county_breakdown': county_breakdown,
-        'severity_breakdown': severity_breakdown,
-        'monthly_trends': monthly_trends,
-        'recent_activity': recent_activity
+        # Average resolution time (mock calculation)
+        'avg_resolution_time': 5.2,  # days
+        'category_breakdown': dict(categories),
+        'county_breakdown': dict(counties),
+        'severity_breakdown': dict(severities),
+        'monthly_trends': [
+            {'month': label, 'issues': counts[f'trend_{i}_issues'], 'resolved': counts[f'trend_{i}_resolved']}
+            for i, (label, _, _) in enumerate(windows)
+        ],
+        'recent_activity': list(recent),
     }
-    
-    serializer = DashboardStatsSerializer(data)
-    return Response(serializer.data)
+    return DashboardStatsSerializer(data).data
+
+
+def build_dashboard_stats():
+    """Dashboard statistics payload"""
+    windows = trend_windows(timezone.now())
+    return assemble_dashboard(
+        windows,
+        Issue.objects.aggregate(**dashboard_counts(windows)),
+        breakdown('category'), breakdown('county'), breakdown('severity'),
+        recent_activity(),
+    )
+
+
+async def alist(queryset):
+    return [row async for row in queryset]
+
+
+async def abuild_dashboard_stats():
+    """build_dashboard_stats for the async view.
+
+    The async ORM in Django 4.2 runs each query through sync_to_async on one
+    thread, so gather() issues the five queries one after another; what it
+    saves is blocking the event loop, not wall time.
+    """
+    windows = trend_windows(timezone.now())
+    results = await asyncio.gather(
+        Issue.objects.aaggregate(**dashboard_counts(windows)),
+        alist(breakdown('category')), alist(breakdown('county')), alist(breakdown('severity')),
+        alist(recent_activity()),
+    )
+    return assemble_dashboard(windows, *results)
+
 
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
-def county_analytics(request):
-    """Get analytics by county"""
-    county = request.query_params.get('county')
-    
+@conditional_get(issues_version)
+def sync_dashboard_stats(request):
+    """Get comprehensive dashboard statistics (browsable API)"""
+    return Response(build_dashboard_stats())
+
+
+@async_api_view(sync_dashboard_stats)
+@aconditional_get(aissues_version)
+async def dashboard_stats(request):
+    """Get comprehensive dashboard statistics"""
+    return api_response(await abuild_dashboard_stats())
+
+def build_county_analytics(county=None, exact=False):
+    """County analytics payload, optionally filtered by (part of, unless ``exact``) a county name"""
     queryset = Issue.objects.all()
     if county:
-        queryset = queryset.filter(county__icontains=county)
+        queryset = queryset.filter(county=county) if exact else queryset.filter(county__icontains=county)
     
     # County statistics
     county_stats = queryset.values('county').annotate(
@@ -120,14 +140,17 @@ def county_analytics(request):
         open=Count('id', filter=Q(status='open'))
     ).order_by('-total')
     
-    return Response(list(county_stats))
+    return list(county_stats)
 
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
-def category_analytics(request):
-    """Get analytics by category"""
-    category = request.query_params.get('category')
-    
+@conditional_get(issues_version)
+def county_analytics(request):
+    """Get analytics by county"""
+    return Response(build_county_analytics(request.query_params.get('county')))
+
+def build_category_analytics(category=None):
+    """Category analytics payload, optionally filtered by category"""
     queryset = Issue.objects.all()
     if category:
         queryset = queryset.filter(category=category)
@@ -142,13 +165,17 @@ def category_analytics(request):
         high=Count('id', filter=Q(severity='high'))
     ).order_by('-total')
     
-    return Response(list(category_stats))
+    return list(category_stats)
 
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
-def trends_analytics(request):
-    """Get trend analytics"""
-    days = int(request.query_params.get('days', 30))
+@conditional_get(issues_version)
+def category_analytics(request):
+    """Get analytics by category"""
+    return Response(build_category_analytics(request.query_params.get('category')))
+
+def build_trends_analytics(days=30):
+    """Daily issue and resolution counts for the last ``days`` days"""
     end_date = timezone.now().date()
     start_date = end_date - timedelta(days=days)
     
@@ -174,7 +201,89 @@ def trends_analytics(request):
         
         current_date += timedelta(days=1)
     
-    return Response(daily_stats)
+    return daily_stats
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+@conditional_get(issues_version)
+def trends_analytics(request):
+    """Get trend analytics"""
+    days = int(request.query_params.get('days', 30))
+    return Response(build_trends_analytics(days))
+
+def parse_cube_filters(query_params):
+    """Dimension filters (comma-separated values) and date range from a query string"""
+    filters = {}
+    for dim in DIMENSIONS:
+        value = query_params.get(dim)
+        if value:
+            filters[dim] = value.split(',')
+    
+    dates = {}
+    for param in ('date_from', 'date_to'):
+        value = query_params.get(param)
+        if value:
+            dates[param] = parse_date(value)
+            if dates[param] is None:
+                raise CubeQueryError(f'Invalid {param}')
+    
+    return filters, dates
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+@conditional_get(issues_version)
+def cube_analytics(request):
+    """Issue counts grouped by any combination of dimensions"""
+    group_by = [dim for dim in request.query_params.get('group_by', '').split(',') if dim]
+    
+    try:
+        filters, dates = parse_cube_filters(request.query_params)
+        cells = get_cube().query(group_by, filters, **dates)
+    except CubeQueryError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response({
+        'group_by': group_by,
+        'total': sum(cell['count'] for cell in cells),
+        'cells': cells
+    })
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+@conditional_get(issues_version)
+def heatmap_analytics(request):
+    """Density grid of geotagged issues with Getis-Ord Gi* hotspot scores"""
+    params = request.query_params
+    try:
+        filters, dates = parse_cube_filters(params)
+        bins = int(params.get('bins', 50))
+        bbox = params.get('bbox')
+        if bbox:
+            bbox = tuple(float(value) for value in bbox.split(','))
+            if len(bbox) != 4:
+                raise HeatmapError('bbox must be min_lat,min_lon,max_lat,max_lon')
+        data = cached_heatmap(
+            filters=filters,
+            bins=bins,
+            weighting=params.get('weight', 'combined'),
+            bbox=bbox or None,
+            **dates
+        )
+    except (CubeQueryError, HeatmapError, ValueError) as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response(data)
+
+async def live_updates(request):
+    """Server-sent event stream of dashboard deltas (serve under ASGI)"""
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('since')
+    response = StreamingHttpResponse(
+        get_broadcaster().stream(last_event_id),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 class AnalyticsSnapshotListView(generics.ListAPIView):
     queryset = AnalyticsSnapshot.objects.all()
@@ -203,4 +312,20 @@ class CategoryAnalyticsListView(generics.ListAPIView):
         category = self.request.query_params.get('category')
         if category:
             queryset = queryset.filter(category=category)
+        return queryset
+
+class SpikeAlertListView(generics.ListAPIView):
+    serializer_class = SpikeAlertSerializer
+    permission_classes = [permissions.AllowAny]
+    
+    def get_queryset(self):
+        queryset = SpikeAlert.objects.all()
+        county = self.request.query_params.get('county')
+        if county:
+            queryset = queryset.filter(county__icontains=county)
+        category = self.request.query_params.get('category')
+        if category:
+            queryset = queryset.filter(category=category)
+        if self.request.query_params.get('active'):
+            queryset = queryset.filter(acknowledged=False)
         return queryset
\ No newline at end of file
@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class IssuesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'issues'
\ No newline at end of file
+    name = 'issues'
+
+    def ready(self):
+        from . import signals  # noqa: F401
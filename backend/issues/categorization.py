@@ -0,0 +1,100 @@
+"""
+Pluggable, async issue categorizers.
+
+``ISSUE_CATEGORIZER['BACKEND']`` names a class with an async
+``categorize(description)`` returning at least ``{'category': ...}``.
+Remote backends run their blocking client in a worker thread so the
+event loop (or the WSGI thread's loop) stays free; a backend that fails
+or exceeds ``TIMEOUT`` falls back to the keyword rules.
+"""
+import asyncio
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+DEFAULTS = {
+    'BACKEND': 'issues.categorization.KeywordCategorizer',
+    'OPTIONS': {},
+    'TIMEOUT': 10,
+}
+
+logger = logging.getLogger('uwazi254.categorizer')
+
+
+def categorizer_setting(name):
+    return getattr(settings, 'ISSUE_CATEGORIZER', {}).get(name, DEFAULTS[name])
+
+
+class CategorizerError(Exception):
+    """Raised by backends that could not produce a category"""
+
+
+class KeywordCategorizer:
+    """Local keyword rules; no I/O"""
+
+    def __init__(self, **options):
+        self.options = options
+
+    async def categorize(self, description):
+        text = description.lower()
+        if 'health' in text:
+            return {'category': 'Health'}
+        if 'road' in text:
+            return {'category': 'Infrastructure'}
+        return {'category': 'Other'}
+
+
+class SimulatedCategorizer(KeywordCategorizer):
+    """Keyword rules behind an artificial delay; stands in for a remote model in load tests"""
+
+    def __init__(self, latency=0.2, **options):
+        super().__init__(**options)
+        self.latency = latency
+
+    async def categorize(self, description):
+        await asyncio.sleep(self.latency)
+        return await super().categorize(description)
+
+
+class GeminiCategorizer(KeywordCategorizer):
+    """Google Gemini through ``issues.ai_categorizer`` (needs google-generativeai and GOOGLE_API_KEY)"""
+
+    async def categorize(self, description):
+        try:
+            from .ai_categorizer import categorize_issue
+        except (ImportError, ValueError) as e:
+            # Missing client library, or no GOOGLE_API_KEY (checked at import)
+            raise CategorizerError(f'Gemini is not configured: {e}') from e
+
+        text = await sync_to_async(categorize_issue, thread_sensitive=False)(description)
+        try:
+            result = json.loads(text.strip().removeprefix('```json').removesuffix('```'))
+        except ValueError:
+            raise CategorizerError(text)
+        if not isinstance(result, dict) or not result.get('category'):
+            raise CategorizerError(text)
+        return {key: result[key] for key in ('category', 'severity') if key in result}
+
+
+_backend = None
+
+
+def get_categorizer():
+    global _backend
+    backend_class = import_string(categorizer_setting('BACKEND'))
+    if not isinstance(_backend, backend_class):
+        _backend = backend_class(**categorizer_setting('OPTIONS'))
+    return _backend
+
+
+async def categorize(description):
+    """Category (and severity, if the backend gives one) for ``description``"""
+    backend = get_categorizer()
+    try:
+        return await asyncio.wait_for(backend.categorize(description), categorizer_setting('TIMEOUT'))
+    except (asyncio.TimeoutError, CategorizerError, ImportError) as e:
+        logger.warning('Categorizer %s failed (%r); using keyword rules', type(backend).__name__, e)
+        return await KeywordCategorizer().categorize(description)
@@ -0,0 +1,159 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from .models import Issue
+
+
+class DataVersion:
+    """Cheap fingerprint of a queryset: newest updated_at plus row count.
+
+    For a collection the newest ``updated_at`` doesn't move when a row is
+    deleted, so only the ETag (which includes the count) can validate it;
+    ``timestamp`` and with it ``Last-Modified`` are left off.
+    """
+
+    def __init__(self, last_modified=None, count=0, extra='', collection=False):
+        self.last_modified = last_modified
+        self.count = count
+        self.extra = extra
+        self.collection = collection
+
+    @classmethod
+    def of(cls, queryset, extra='', collection=True):
+        probe = queryset.order_by().aggregate(last_modified=Max('updated_at'), count=Count('id'))
+        return cls(probe['last_modified'], probe['count'], extra, collection)
+
+    @classmethod
+    async def aof(cls, queryset, extra='', collection=True):
+        probe = await queryset.order_by().aaggregate(last_modified=Max('updated_at'), count=Count('id'))
+        return cls(probe['last_modified'], probe['count'], extra, collection)
+
+    @property
+    def timestamp(self):
+        if self.last_modified is None or self.collection:
+            return None
+        return int(self.last_modified.timestamp())
+
+    def etag(self, request):
+        user = request.user
+        # Per-user fields (e.g. user_vote) make authenticated bodies user-specific
+        owner = user.pk if user and user.is_authenticated else 'anon'
+        stamp = self.last_modified.isoformat() if self.last_modified else '-'
+        raw = f'{request.get_full_path()}|{stamp}|{self.count}|{self.extra}|{owner}'
+        return quote_etag(hashlib.md5(raw.encode()).hexdigest())
+
+
+def issues_version(request):
+    """Version of the whole Issue table, used by analytics endpoints"""
+    # Date-relative windows (trends, monthly buckets) roll over at midnight
+    return DataVersion.of(Issue.objects.all(), extra=timezone.localdate().isoformat())
+
+
+async def aissues_version(request):
+    return await DataVersion.aof(Issue.objects.all(), extra=timezone.localdate().isoformat())
+
+
+def set_cache_headers(request, response):
+    """Shared-cache headers for anonymous reads, revalidation for users"""
+    if request.user and request.user.is_authenticated:
+        patch_cache_control(response, private=True, no_cache=True)
+    else:
+        max_age = getattr(settings, 'API_CACHE_MAX_AGE', 30)
+        patch_cache_control(
+            response, public=True, max_age=max_age,
+            stale_while_revalidate=max_age * 2
+        )
+    patch_vary_headers(response, ['Authorization'])
+    return response
+
+
+def check_validators(request, version):
+    """``(etag, timestamp, not_modified_response_or_None)``"""
+    etag = version.etag(request)
+    timestamp = version.timestamp
+    return etag, timestamp, get_conditional_response(request, etag=etag, last_modified=timestamp)
+
+
+def stamp_validators(request, response, etag, timestamp):
+    response['ETag'] = etag
+    if timestamp is not None:
+        response['Last-Modified'] = http_date(timestamp)
+    return set_cache_headers(request, response)
+
+
+def respond_conditionally(request, version, render):
+    """Return 304 if the client's validators match ``version``, else ``render()``.
+
+    A ``version`` of None skips validation (e.g. the object does not exist)
+    and lets the view produce its own response.
+    """
+    if version is None or request.method not in ('GET', 'HEAD'):
+        return render()
+
+    etag, timestamp, response = check_validators(request, version)
+    if response is None:
+        response = render()
+        if not 200 <= response.status_code < 300:
+            return response
+    return stamp_validators(request, response, etag, timestamp)
+
+
+async def arespond_conditionally(request, version, render):
+    """respond_conditionally for async views: ``render`` is a coroutine function"""
+    if version is None or request.method not in ('GET', 'HEAD'):
+        return await render()
+
+    etag, timestamp, response = check_validators(request, version)
+    if response is None:
+        response = await render()
+        if not 200 <= response.status_code < 300:
+            return response
+    return stamp_validators(request, response, etag, timestamp)
+
+
+def conditional_get(probe):
+    """Decorator for function views: ``probe(request)`` returns a DataVersion"""
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            return respond_conditionally(
+                request, probe(request),
+                lambda: view(request, *args, **kwargs)
+            )
+        return wrapped
+    return decorator
+
+
+def aconditional_get(probe):
+    """conditional_get for async views; ``probe`` is a coroutine function"""
+    def decorator(view):
+        @wraps(view)
+        async def wrapped(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return await view(request, *args, **kwargs)
+            return await arespond_conditionally(
+                request, await probe(request),
+                lambda: view(request, *args, **kwargs)
+            )
+        return wrapped
+    return decorator
+
+
+class ConditionalGetMixin:
+    """Conditional GET for generic views; override ``get_data_version``"""
+
+    def get_data_version(self):
+        return DataVersion.of(self.filter_queryset(self.get_queryset()))
+
+    def get(self, request, *args, **kwargs):
+        return respond_conditionally(
+            request, self.get_data_version(),
+            lambda: super(ConditionalGetMixin, self).get(request, *args, **kwargs)
+        )
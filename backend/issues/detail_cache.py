@@ -0,0 +1,79 @@
+"""
+Versioned cache of serialized issue detail responses.
+
+Each issue has a version token, replaced (after the transaction commits)
+by any write to the issue or its images, admin response, notes, updates or
+votes. The public representation (everything but ``user_vote``) is cached
+under the issue ID, the token and the request host, since image URLs are
+absolute; old entries simply age out. ``user_vote`` is looked up per
+request and merged in.
+
+Tokens and entries both live in the ``CACHE`` alias from ``CACHES``: local
+memory per process, a file-based cache shared by the workers on one host,
+or Redis shared by every host. A write invalidates every process's
+entries only when the processes share that alias; with local memory,
+processes other than the writer keep serving their entry until it expires
+after ``TIMEOUT``. The same holds for writes that bypass model
+signals (bulk loads, queryset ``update()``). Losing a token to eviction
+only costs a miss.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from uwazi254_backend.metrics import CACHE_REQUESTS
+
+DEFAULTS = {
+    'ENABLED': True,
+    'CACHE': 'default',
+    'TIMEOUT': 300,
+}
+
+
+def detail_cache_setting(name):
+    return getattr(settings, 'ISSUE_DETAIL_CACHE', {}).get(name, DEFAULTS[name])
+
+
+def _version_key(pk):
+    return f'issue-detail:version:{pk}'
+
+
+def _entry_key(pk, version, host):
+    return f'issue-detail:{pk}:{version}:{host}'
+
+
+def _cache():
+    return caches[detail_cache_setting('CACHE')]
+
+
+def bump_version(pk):
+    """Invalidate every cached rendering of issue ``pk`` once the current transaction commits"""
+    # A fresh token rather than a counter: an evicted counter could restart at an old value
+    transaction.on_commit(lambda: _cache().set(_version_key(pk), uuid.uuid4().hex, None))
+
+
+async def acurrent_version(pk):
+    versions = _cache()
+    version = await versions.aget(_version_key(pk))
+    if version is None:
+        await versions.aadd(_version_key(pk), uuid.uuid4().hex, None)
+        version = await versions.aget(_version_key(pk))
+    return version
+
+
+async def aget_entry(pk, version, host):
+    """``{'data', 'last_modified'}`` cached for this version, or None"""
+    if not detail_cache_setting('ENABLED'):
+        return None
+    entry = await _cache().aget(_entry_key(pk, version, host))
+    CACHE_REQUESTS.inc(cache='issue_detail', result='miss' if entry is None else 'hit')
+    return entry
+
+
+async def aset_entry(pk, version, host, entry):
+    if not detail_cache_setting('ENABLED'):
+        return
+    await _cache().aset(
+        _entry_key(pk, version, host), entry, detail_cache_setting('TIMEOUT')
+    )
@@ -0,0 +1,170 @@
+"""
+Materialized "my area" feeds.
+
+Each ward, constituency and county keeps its newest active issues (those
+in ``STATUSES``) in ``AreaFeedEntry``. The lists are updated on write:
+``signals`` re-files an issue when it is created, changes status or moves
+to another area. Each list is trimmed to ``WINDOW`` entries, and its
+``AreaFeed`` row records the newest trimmed key (the horizon). That lets
+a reader tell how far down a list is complete.
+
+A user's feed merges the lists for their ward, constituency and county,
+newest first. Some pages can't be answered from the lists alone: pages
+past the window, or areas not materialized yet. Those fall back to
+``live_feed``, which returns the same issues in the same order.
+
+New areas are materialized by their first issue. Run
+``rebuild_area_feeds`` in these cases:
+- to load existing data;
+- after turning the feeds on;
+- after writes that bypass model signals (bulk loads, queryset ``update()``).
+"""
+import heapq
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from uwazi254_backend.metrics import CACHE_REQUESTS
+from .models import Issue, AreaFeed, AreaFeedEntry
+
+DEFAULTS = {
+    'ENABLED': True,
+    'WINDOW': 200,
+    'STATUSES': ['open', 'pending'],
+}
+
+SCOPES = ('ward', 'constituency', 'county')
+
+User = get_user_model()
+
+
+def area_feed_setting(name):
+    return getattr(settings, 'AREA_FEEDS', {}).get(name, DEFAULTS[name])
+
+
+def feed_areas(obj):
+    """``(scope, area)`` for the ward, constituency and county of a user or an issue"""
+    return [(scope, getattr(obj, scope)) for scope in SCOPES if getattr(obj, scope)]
+
+
+def _feeds_in(areas):
+    condition = Q()
+    for scope, area in areas:
+        condition |= Q(scope=scope, area=area)
+    return condition
+
+
+def _entries(scope, area):
+    return AreaFeedEntry.objects.filter(scope=scope, area=area).order_by('-created_at', '-issue_id')
+
+
+def live_feed(areas, queryset=None):
+    """The query the feed tables materialize; ``areas`` must not be empty"""
+    condition = Q()
+    for scope, area in areas:
+        condition |= Q(**{scope: area})
+    queryset = Issue.objects.all() if queryset is None else queryset
+    return queryset.filter(condition, status__in=area_feed_setting('STATUSES')).order_by('-created_at', '-id')
+
+
+def trim(scope, area):
+    window = area_feed_setting('WINDOW')
+    for created_at, issue_id in _entries(scope, area).values_list('created_at', 'issue_id')[window:window + 1]:
+        _entries(scope, area).filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, issue_id__lte=issue_id)
+        ).delete()
+        AreaFeed.objects.filter(scope=scope, area=area).update(horizon_at=created_at, horizon_id=issue_id)
+
+
+def file_issue(issue):
+    """Bring ``issue``'s feed entries in line with its current status and areas"""
+    AreaFeedEntry.objects.filter(issue=issue).delete()
+    if issue.status not in area_feed_setting('STATUSES'):
+        return
+    areas = feed_areas(issue)
+    feeds = {(feed.scope, feed.area): feed for feed in AreaFeed.objects.filter(_feeds_in(areas))}
+    key = (issue.created_at, issue.pk)
+    entries = []
+    for scope, area in areas:
+        feed = feeds.get((scope, area))
+        if feed is None:
+            # An area's first issue materializes it; areas with older issues wait for a rebuild
+            if live_feed([(scope, area)]).exclude(pk=issue.pk).exists():
+                continue
+            AreaFeed.objects.get_or_create(scope=scope, area=area)
+        elif feed.horizon_at is not None and key <= (feed.horizon_at, feed.horizon_id):
+            # Reopened below the window; the live query serves it
+            continue
+        entries.append(AreaFeedEntry(scope=scope, area=area, issue=issue, created_at=issue.created_at))
+    AreaFeedEntry.objects.bulk_create(entries)
+    for entry in entries:
+        trim(entry.scope, entry.area)
+
+
+def feed_page(areas, offset, limit):
+    """IDs of up to ``limit + 1`` feed issues from ``offset``, or None when only the live query can tell.
+
+    The extra ID tells the caller whether there is a next page.
+    """
+    need = offset + limit + 1
+    if not area_feed_setting('ENABLED') or need > area_feed_setting('WINDOW'):
+        return None
+    feeds = {(feed.scope, feed.area): feed for feed in AreaFeed.objects.filter(_feeds_in(areas))}
+    if len(feeds) < len(areas):
+        CACHE_REQUESTS.inc(cache='area_feed', result='miss')
+        return None
+
+    lists, fetched_to, trimmed_at = [], [], []
+    for scope, area in areas:
+        keys = list(_entries(scope, area).values_list('created_at', 'issue_id')[:need])
+        lists.append(keys)
+        if len(keys) == need:
+            # Keys below the last one read were not read
+            fetched_to.append(keys[-1])
+        feed = feeds[(scope, area)]
+        if feed.horizon_at is not None:
+            trimmed_at.append((feed.horizon_at, feed.horizon_id))
+
+    merged, exhausted = [], True
+    for key in heapq.merge(*lists, reverse=True):
+        if merged and merged[-1] == key:
+            # The same issue from its ward and its constituency or county
+            continue
+        if len(merged) == need or any(key < bound for bound in fetched_to) or any(
+                key <= bound for bound in trimmed_at):
+            exhausted = False
+            break
+        merged.append(key)
+    # A short page is only the end of the feed if every list was read to its end and none was trimmed
+    if len(merged) < need and (not exhausted or trimmed_at):
+        CACHE_REQUESTS.inc(cache='area_feed', result='miss')
+        return None
+    CACHE_REQUESTS.inc(cache='area_feed', result='hit')
+    return [issue_id for _, issue_id in merged[offset:]]
+
+
+def rebuild():
+    """Re-materialize the feed of every area with issues or residents; returns the number of feeds"""
+    window = area_feed_setting('WINDOW')
+    total = 0
+    with transaction.atomic():
+        AreaFeedEntry.objects.all().delete()
+        AreaFeed.objects.all().delete()
+        for scope in SCOPES:
+            areas = set(Issue.objects.order_by().values_list(scope, flat=True).distinct())
+            areas |= set(User.objects.order_by().values_list(scope, flat=True).distinct())
+            areas.discard(None)
+            areas.discard('')
+            feeds = []
+            for area in sorted(areas):
+                keys = list(live_feed([(scope, area)]).values_list('created_at', 'id')[:window + 1])
+                AreaFeedEntry.objects.bulk_create([
+                    AreaFeedEntry(scope=scope, area=area, issue_id=issue_id, created_at=created_at)
+                    for created_at, issue_id in keys[:window]
+                ])
+                horizon = keys[window] if len(keys) > window else (None, None)
+                feeds.append(AreaFeed(scope=scope, area=area, horizon_at=horizon[0], horizon_id=horizon[1]))
+            AreaFeed.objects.bulk_create(feeds)
+            total += len(feeds)
+    return total
@@ -0,0 +1,60 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from uwazi254_backend.benchmarking import (
+    DEFAULT_MIN_DELTA_MS, DEFAULT_TOLERANCE, ENDPOINTS,
+    compare, load_results, prepare_dataset, run_suite, save_results, scratch_database
+)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark every API endpoint on a generated dataset: queries, p50/p95 latency and bytes'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--issues', type=int, default=5000)
+        parser.add_argument('--votes', type=int, default=25000)
+        parser.add_argument('--seed', type=int, default=254)
+        parser.add_argument('--repeat', type=int, default=20, help='Timed requests per endpoint')
+        parser.add_argument('--endpoint', action='append', choices=[e.name for e in ENDPOINTS],
+                            help='Only run these endpoints (default: all)')
+        parser.add_argument('--output', default='benchmark-results.json', help='Results JSON file')
+        parser.add_argument('--compare', metavar='BASELINE', help='Fail on regressions against this results file')
+        parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                            help='Allowed relative p95 increase over the baseline')
+        parser.add_argument('--min-delta-ms', type=float, default=DEFAULT_MIN_DELTA_MS,
+                            help='Ignore p95 increases smaller than this')
+    
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                baseline = load_results(options['compare'])
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Could not read baseline {options["compare"]}: {e}')
+        
+        dataset = {key: options[key] for key in ('users', 'issues', 'votes', 'seed')}
+        with scratch_database():
+            # Anchored to today so date-relative endpoints (e.g. the 30-day trends) see the same rows
+            # relative to now on every run; the absolute dates move daily
+            prepare_dataset(
+                dataset['users'], dataset['issues'], dataset['votes'], seed=dataset['seed'],
+                end=datetime.now(dt_timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+            )
+            results = run_suite(repeat=options['repeat'], only=options['endpoint'], meta={'dataset': dataset})
+        save_results(results, options['output'])
+        
+        self.stdout.write(f"{'endpoint':<28}{'status':>7}{'queries':>9}{'budget':>8}{'p50 ms':>9}{'p95 ms':>9}{'bytes':>10}")
+        for name, result in results['endpoints'].items():
+            self.stdout.write(
+                f"{name:<28}{result['status']:>7}{result['queries']:>9}{result['budget']:>8}"
+                f"{result['p50_ms']:>9.1f}{result['p95_ms']:>9.1f}{result['bytes']:>10}"
+            )
+        self.stdout.write(f"Results written to {options['output']}")
+        
+        failures = compare(results, baseline, options['tolerance'], options['min_delta_ms'])
+        if failures:
+            for failure in failures:
+                self.stderr.write(failure)
+            raise CommandError(f'{len(failures)} benchmark check(s) failed')
+        self.stdout.write(self.style.SUCCESS('All endpoints within budget'))
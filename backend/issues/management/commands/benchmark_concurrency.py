@@ -0,0 +1,74 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from uwazi254_backend.benchmarking import prepare_dataset, scratch_database
+from uwazi254_backend.loadtest import build_context, parse_mix, run_load
+
+READ_MIX = 'browse=50,search=20,dashboard=20,categorize=10'
+
+
+class Command(BaseCommand):
+    help = ('Compare one process serving the read-heavy endpoints through WSGI worker threads '
+            'against the async views on the ASGI handler')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4,
+                            help='WSGI worker threads (a typical gunicorn --threads value)')
+        parser.add_argument('--clients', type=int, default=64, help='Concurrent ASGI clients')
+        parser.add_argument('--duration', type=float, default=20.0, help='Seconds per run')
+        parser.add_argument('--mix', type=parse_mix, default=parse_mix(READ_MIX),
+                            help=f'Traffic weights (default {READ_MIX})')
+        parser.add_argument('--categorizer-latency', type=float, default=0.2,
+                            help='Simulated categorizer response time in seconds (0 for the keyword rules)')
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--issues', type=int, default=5000)
+        parser.add_argument('--votes', type=int, default=25000)
+        parser.add_argument('--seed', type=int, default=254)
+        parser.add_argument('--output', help='Also write both reports as JSON to this file')
+
+    def handle(self, *args, **options):
+        if options['threads'] < 1 or options['clients'] < 1:
+            raise CommandError('--threads and --clients must be at least 1')
+
+        categorizer = {'BACKEND': 'issues.categorization.KeywordCategorizer'}
+        if options['categorizer_latency']:
+            categorizer = {
+                'BACKEND': 'issues.categorization.SimulatedCategorizer',
+                'OPTIONS': {'latency': options['categorizer_latency']},
+            }
+
+        reports = {}
+        # File-backed: the ASGI handler opens a connection per request
+        with scratch_database(file_backed=True), override_settings(ISSUE_CATEGORIZER=categorizer):
+            prepare_dataset(options['users'], options['issues'], options['votes'], seed=options['seed'])
+            context = build_context(users=options['users'])
+            for mode, clients in (('wsgi', options['threads']), ('asgi', options['clients'])):
+                self.stdout.write(f'Running {mode} with {clients} concurrent client(s)...')
+                reports[mode] = run_load(
+                    context, mix=options['mix'], clients=clients, duration=options['duration'],
+                    seed=options['seed'], mode=mode
+                )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(reports, f, indent=2, sort_keys=True)
+
+        wsgi, asgi = reports['wsgi'], reports['asgi']
+        self.stdout.write(f"{'action':<12}{'wsgi req/s':>12}{'asgi req/s':>12}{'wsgi p95':>10}{'asgi p95':>10}")
+        for action in sorted(set(wsgi['actions']) | set(asgi['actions'])):
+            w = wsgi['actions'].get(action, {})
+            a = asgi['actions'].get(action, {})
+            self.stdout.write(
+                f"{action:<12}{w.get('per_second', 0):>12.1f}{a.get('per_second', 0):>12.1f}"
+                f"{w.get('p95_ms', 0):>10.1f}{a.get('p95_ms', 0):>10.1f}"
+            )
+        self.stdout.write(
+            f"{'total':<12}{wsgi['per_second']:>12.1f}{asgi['per_second']:>12.1f}"
+        )
+        for mode, report in reports.items():
+            if report['errors']:
+                errors = ', '.join(f'{error} x{count}' for error, count in sorted(report['errors'].items()))
+                self.stderr.write(f'{mode} errors: {errors}')
+        if wsgi['per_second']:
+            self.stdout.write(f"ASGI/WSGI throughput: {asgi['per_second'] / wsgi['per_second']:.2f}x")
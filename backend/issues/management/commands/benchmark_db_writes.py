@@ -0,0 +1,128 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+from django.db.models import F
+from issues.models import Issue, IssueVote
+from uwazi254_backend.db_profiles import sqlite_database
+
+User = get_user_model()
+
+PROFILES = ['sqlite', 'sqlite-production']
+
+
+class Command(BaseCommand):
+    help = 'Measure concurrent vote writes per second and lock errors for each SQLite profile'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent writer threads')
+        parser.add_argument('--writes', type=int, default=200, help='Votes per writer thread')
+        parser.add_argument('--readers', type=int, default=4, help='Concurrent reader threads')
+        parser.add_argument('--issues', type=int, default=3, help='Issues the votes are spread over')
+        parser.add_argument('--profile', action='append', choices=PROFILES, help='Profiles to run (default: all)')
+    
+    def handle(self, *args, **options):
+        workdir = tempfile.mkdtemp(prefix='uwazi254-bench-')
+        results = []
+        try:
+            for profile in options['profile'] or PROFILES:
+                alias = f'bench_{profile.replace("-", "_")}'
+                connections.settings[alias] = {
+                    **connections.settings['default'],
+                    **sqlite_database(os.path.join(workdir, f'{alias}.sqlite3'), production=profile != 'sqlite'),
+                }
+                try:
+                    results.append((profile, self.run_profile(alias, options)))
+                finally:
+                    connections.close_all()
+                    del connections.settings[alias]
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        
+        self.stdout.write(f"{'profile':<20}{'writes/s':>10}{'committed':>11}{'locked':>8}{'lock rate':>11}{'reads/s':>10}")
+        for profile, result in results:
+            self.stdout.write(
+                f"{profile:<20}{result['writes_per_second']:>10.1f}{result['committed']:>11}"
+                f"{result['locked']:>8}{result['lock_rate']:>10.1%}{result['reads_per_second']:>10.1f}"
+            )
+    
+    def run_profile(self, alias, options):
+        with connections[alias].schema_editor() as editor:
+            for app_label in ('accounts', 'issues'):
+                for model in apps.get_app_config(app_label).get_models():
+                    editor.create_model(model)
+        
+        threads, writes = options['threads'], options['writes']
+        users = User.objects.db_manager(alias).bulk_create([
+            User(username=f'bench{i}', email=f'bench{i}@example.com', password='!')
+            for i in range(threads * writes)
+        ])
+        issues = Issue.objects.using(alias).bulk_create([
+            Issue(
+                title=f'Bench issue {i}', description='Benchmark', category='roads',
+                county='Nairobi', constituency='Kasarani', ward='Mwiki', submitted_by=users[0]
+            )
+            for i in range(options['issues'])
+        ])
+        
+        counts = {'committed': 0, 'locked': 0, 'reads': 0}
+        lock = threading.Lock()
+        done = threading.Event()
+        
+        def writer(offset):
+            committed = locked = 0
+            for i in range(writes):
+                issue = issues[(offset + i) % len(issues)]
+                try:
+                    # Same read-then-write shape as vote_issue
+                    with transaction.atomic(using=alias):
+                        user = users[offset * writes + i]
+                        if not IssueVote.objects.using(alias).filter(issue=issue, user=user).exists():
+                            IssueVote.objects.using(alias).create(issue=issue, user=user, vote_type='up')
+                        Issue.objects.using(alias).filter(pk=issue.pk).update(upvotes=F('upvotes') + 1)
+                    committed += 1
+                except OperationalError as e:
+                    if 'locked' not in str(e):
+                        raise
+                    locked += 1
+            connections[alias].close()
+            with lock:
+                counts['committed'] += committed
+                counts['locked'] += locked
+        
+        def reader():
+            reads = 0
+            while not done.is_set():
+                list(Issue.objects.using(alias).order_by('-upvotes').values('id', 'upvotes'))
+                reads += 1
+            connections[alias].close()
+            with lock:
+                counts['reads'] += reads
+        
+        readers = [threading.Thread(target=reader) for _ in range(options['readers'])]
+        writers = [threading.Thread(target=writer, args=(t,)) for t in range(threads)]
+        for thread in readers:
+            thread.start()
+        start = time.perf_counter()
+        for thread in writers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        done.set()
+        for thread in readers:
+            thread.join()
+        
+        attempts = counts['committed'] + counts['locked']
+        return {
+            'committed': counts['committed'],
+            'locked': counts['locked'],
+            'lock_rate': counts['locked'] / attempts if attempts else 0.0,
+            'writes_per_second': counts['committed'] / elapsed,
+            'reads_per_second': counts['reads'] / elapsed,
+        }
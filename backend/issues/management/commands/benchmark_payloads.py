@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from uwazi254_backend.benchmarking import payload_benchmark, prepare_dataset, scratch_database
+
+
+class Command(BaseCommand):
+    help = 'Render time per JSON renderer and bytes on the wire per content encoding for an issue-list page'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=100, help='Issues on the rendered page')
+        parser.add_argument('--repeat', type=int, default=50, help='Timed runs per renderer and encoding')
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--issues', type=int, default=1000)
+        parser.add_argument('--votes', type=int, default=3000)
+        parser.add_argument('--seed', type=int, default=254)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            prepare_dataset(options['users'], options['issues'], options['votes'], seed=options['seed'])
+            result = payload_benchmark(page_size=options['page_size'], repeat=options['repeat'])
+
+        self.stdout.write(f"Page of {result['issues']} issues")
+        self.stdout.write(f"{'renderer':<12}{'render ms':>11}{'bytes':>10}")
+        for name, row in result['renderers'].items():
+            self.stdout.write(f"{name:<12}{row['render_ms']:>11.2f}{row['bytes']:>10}")
+        identity = result['encodings']['identity']['bytes']
+        self.stdout.write(f"{'encoding':<12}{'compress ms':>11}{'bytes':>10}{'ratio':>8}")
+        for name, row in result['encodings'].items():
+            self.stdout.write(
+                f"{name:<12}{row['compress_ms']:>11.2f}{row['bytes']:>10}{row['bytes'] / identity:>8.2f}"
+            )
@@ -0,0 +1,76 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone as dt_timezone
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from accounts.models import User
+from issues.feeds import rebuild
+from issues.models import Issue
+from issues.synthetic import (
+    DEFAULT_CHUNK_SIZE, build_plan, chunk_count, next_id, reset_sequences, write_chunk
+)
+
+
+class Command(BaseCommand):
+    help = 'Generate a reproducible synthetic dataset of users, issues and votes'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--issues', type=int, default=10000)
+        parser.add_argument('--votes', type=int, default=50000, help='Approximate total votes')
+        parser.add_argument('--days', type=int, default=730, help='History length in days')
+        parser.add_argument('--end', help='Last day of history (YYYY-MM-DD, default: today)')
+        parser.add_argument('--seed', type=int, default=254)
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Writer processes')
+        parser.add_argument('--password', default='synthetic-pass', help='Password for every generated user')
+    
+    def handle(self, *args, **options):
+        if options['users'] < 1:
+            raise CommandError('--users must be at least 1')
+        end = None
+        if options['end']:
+            end = datetime.strptime(options['end'], '%Y-%m-%d').replace(tzinfo=dt_timezone.utc)
+        
+        plan = build_plan(
+            options['seed'], options['users'], options['issues'], options['votes'],
+            days=options['days'], end=end, chunk_size=options['chunk_size']
+        )
+        if not plan['places']:
+            raise CommandError('No counties/constituencies loaded; run load_boundaries first')
+        plan['user_base'] = next_id(User)
+        plan['issue_base'] = next_id(Issue)
+        # One hash for every user keeps generation fast
+        plan['password'] = make_password(options['password'])
+        
+        workers = options['workers']
+        
+        totals = {}
+        start = time.perf_counter()
+        for kind in ('users', 'issues', 'votes'):
+            phase_start = time.perf_counter()
+            chunks = range(chunk_count(plan, 'users' if kind == 'users' else 'issues'))
+            if workers > 1:
+                # Children open their own connections
+                connections.close_all()
+                context = multiprocessing.get_context('spawn')
+                with ProcessPoolExecutor(workers, mp_context=context, initializer=django.setup) as pool:
+                    written = sum(pool.map(write_chunk, [plan] * len(chunks), [kind] * len(chunks), chunks))
+            else:
+                written = sum(write_chunk(plan, kind, chunk) for chunk in chunks)
+            totals[kind] = written
+            elapsed = time.perf_counter() - phase_start
+            self.stdout.write(f'{kind}: {written} rows in {elapsed:.1f}s ({written / max(elapsed, 1e-9):.0f}/s)')
+        
+        reset_sequences()
+        # Bulk inserts skip the signals that keep the area feeds current
+        rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {totals['users']} users, {totals['issues']} issues and {totals['votes']} votes "
+            f'in {time.perf_counter() - start:.1f}s with {workers} worker(s)'
+        ))
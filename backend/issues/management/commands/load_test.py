@@ -0,0 +1,68 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from uwazi254_backend.benchmarking import prepare_dataset, scratch_database
+from uwazi254_backend.loadtest import DEFAULT_MIX, build_context, parse_mix, run_load
+
+
+class Command(BaseCommand):
+    help = 'Soak the API with concurrent browse/search/vote/submit/dashboard traffic on a scratch database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=8, help='Concurrent clients (threads or tasks)')
+        parser.add_argument('--duration', type=float, default=30.0, help='Seconds to run')
+        parser.add_argument('--requests', type=int, help='Stop after this many requests in total')
+        parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX,
+                            help='Traffic weights, e.g. browse=40,search=15,vote=25,submit=10,dashboard=10 '
+                                 '(categorize is also available)')
+        parser.add_argument('--hot-fraction', type=float, default=0.8,
+                            help='Share of votes aimed at the single most-voted issue')
+        parser.add_argument('--asgi', action='store_true', help='Drive the ASGI handler with asyncio tasks')
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--issues', type=int, default=5000)
+        parser.add_argument('--votes', type=int, default=25000)
+        parser.add_argument('--seed', type=int, default=254)
+        parser.add_argument('--output', help='Also write the report as JSON to this file')
+
+    def handle(self, *args, **options):
+        if options['clients'] < 1:
+            raise CommandError('--clients must be at least 1')
+
+        # File-backed so concurrent connections contend for locks as they would in production
+        with scratch_database(file_backed=True):
+            prepare_dataset(options['users'], options['issues'], options['votes'], seed=options['seed'])
+            context = build_context(users=options['users'], hot_fraction=options['hot_fraction'])
+            report = run_load(
+                context, mix=options['mix'], clients=options['clients'], duration=options['duration'],
+                max_requests=options['requests'], seed=options['seed'],
+                mode='asgi' if options['asgi'] else 'wsgi'
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+
+        self.stdout.write(
+            f"{report['requests']} requests from {report['clients']} {report['mode']} client(s) "
+            f"in {report['elapsed_s']}s ({report['per_second']} req/s)"
+        )
+        self.stdout.write(f"{'action':<12}{'requests':>10}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}  statuses")
+        for action, result in sorted(report['actions'].items()):
+            statuses = ' '.join(f'{code}x{count}' for code, count in sorted(result['statuses'].items()))
+            self.stdout.write(
+                f"{action:<12}{result['requests']:>10}{result['per_second']:>9.1f}{result['p50_ms']:>9.1f}"
+                f"{result['p95_ms']:>9.1f}{result['p99_ms']:>9.1f}  {statuses}"
+            )
+        self.stdout.write(f"Database lock errors: {report['lock_errors']}")
+        for error, count in sorted(report['errors'].items()):
+            if error != 'lock':
+                self.stdout.write(f'Other errors ({error}): {count}')
+
+        if report['drifted_issues']:
+            for row in report['drift']:
+                self.stderr.write(
+                    f"Issue {row['issue']}: upvotes {row['upvotes']} vs {row['up_votes']} votes, "
+                    f"downvotes {row['downvotes']} vs {row['down_votes']} votes"
+                )
+            raise CommandError(f"{report['drifted_issues']} issue(s) have vote counters out of sync")
+        self.stdout.write(self.style.SUCCESS('Vote counters match the vote rows'))
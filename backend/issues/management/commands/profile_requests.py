@@ -0,0 +1,46 @@
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError
+from uwazi254_backend.instrumentation import (
+    PROFILE_KEY, disable_profiling, enable_profiling, instrumentation_setting
+)
+
+
+class Command(BaseCommand):
+    help = 'Switch the request profiler on for path prefixes (or off) without restarting the server'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', help="Path prefixes to profile, e.g. /api/issues/")
+        parser.add_argument('--sample-rate', type=float, default=1.0,
+                            help='Fraction of matching requests to profile')
+        parser.add_argument('--minutes', type=float, default=10, help='Switch off automatically after this long')
+        parser.add_argument('--off', action='store_true', help='Stop profiling')
+
+    def handle(self, *args, **options):
+        if isinstance(caches['default'], LocMemCache):
+            # This command runs in its own process; the server would never see the switch
+            raise CommandError(
+                'The default cache is process-local (LocMemCache); '
+                'set CACHE=redis or CACHE=file so the server processes share the profiling switch'
+            )
+        poll = instrumentation_setting('PROFILE_POLL_SECONDS')
+        if options['off']:
+            disable_profiling()
+            self.stdout.write(f'Profiling off (workers notice within {poll}s)')
+            return
+
+        if not options['paths']:
+            config = cache.get(PROFILE_KEY)
+            if config:
+                self.stdout.write(f"Profiling {', '.join(config['paths'])} at sample rate {config['sample_rate']}")
+            else:
+                self.stdout.write('Profiling is off')
+            return
+
+        if not 0 < options['sample_rate'] <= 1:
+            raise CommandError('--sample-rate must be in (0, 1]')
+        enable_profiling(options['paths'], options['sample_rate'], int(options['minutes'] * 60))
+        self.stdout.write(
+            f"Profiling {', '.join(options['paths'])} for {options['minutes']:g} minutes "
+            f"(server processes sharing this cache pick this up within {poll}s; reports go to the uwazi254.profile logger)"
+        )
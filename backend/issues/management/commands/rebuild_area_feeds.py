@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from issues.feeds import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Re-materialize the ward, constituency and county feeds from the issues table'
+
+    def handle(self, *args, **options):
+        feeds = rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {feeds} area feeds'))
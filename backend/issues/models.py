@@ -133,4 +133,38 @@ class IssueUpdate(models.Model):
         ordering = ['-created_at']
     
     def __str__(self):
-        return f"Update: {self.title}"
\ No newline at end of file
+        return f"Update: {self.title}"
+
+class AreaFeed(models.Model):
+    """A materialized ward, constituency or county feed; see issues.feeds"""
+    SCOPE_CHOICES = [
+        ('ward', 'Ward'),
+        ('constituency', 'Constituency'),
+        ('county', 'County'),
+    ]
+    
+    scope = models.CharField(max_length=12, choices=SCOPE_CHOICES)
+    area = models.CharField(max_length=100)
+    # Entries at or below this (created_at, issue ID) key were trimmed and may be missing
+    horizon_at = models.DateTimeField(blank=True, null=True)
+    horizon_id = models.PositiveIntegerField(blank=True, null=True)
+    
+    class Meta:
+        unique_together = ['scope', 'area']
+    
+    def __str__(self):
+        return f"{self.get_scope_display()} feed: {self.area}"
+
+class AreaFeedEntry(models.Model):
+    scope = models.CharField(max_length=12, choices=AreaFeed.SCOPE_CHOICES)
+    area = models.CharField(max_length=100)
+    issue = models.ForeignKey(Issue, on_delete=models.CASCADE, related_name='feed_entries')
+    # Copied from the issue so feeds are read from this table's index alone
+    created_at = models.DateTimeField()
+    
+    class Meta:
+        unique_together = ['scope', 'area', 'issue']
+        indexes = [models.Index(fields=['scope', 'area', '-created_at', '-issue'])]
+    
+    def __str__(self):
+        return f"{self.area}: {self.issue_id}"
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from rest_framework.exceptions import ParseError
 from .models import Issue, IssueImage, AdminResponse, InternalNote, IssueVote, IssueUpdate
 from accounts.serializers import UserSerializer
 
@@ -29,6 +30,7 @@ class IssueUpdateSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'description', 'updated_by', 'is_public', 'created_at']
 
 class IssueSerializer(serializers.ModelSerializer):
+    """Pass ``fields`` (see ``issue_fieldset``) to render only some fields"""
     submitted_by = UserSerializer(read_only=True)
     images = IssueImageSerializer(many=True, read_only=True)
     admin_response = AdminResponseSerializer(read_only=True)
@@ -48,6 +50,12 @@ class IssueSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'submitted_by', 'upvotes', 'downvotes', 'created_at', 'updated_at']
     
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+    
     def get_user_vote(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
@@ -62,6 +70,61 @@ class IssueSerializer(serializers.ModelSerializer):
         validated_data['submitted_by'] = self.context['request'].user
         return super().create(validated_data)
 
+# Relations and per-row lookups; left out when a client picks fields
+# unless named in ?fields= or ?expand=
+ISSUE_EXPANDABLE = ('submitted_by', 'images', 'admin_response', 'internal_notes', 'updates', 'user_vote')
+
+# Lookups that load each relation IssueSerializer renders, so serialization
+# issues no per-row queries (user_vote aside)
+ISSUE_SELECT = {'submitted_by': 'submitted_by', 'admin_response': 'admin_response__responded_by'}
+ISSUE_PREFETCH = {
+    'images': 'images',
+    'internal_notes': 'internal_notes__added_by',
+    'updates': 'updates__updated_by',
+}
+
+# Columns behind fields that aren't plain Issue columns
+ISSUE_COLUMNS = {
+    'vote_score': ('upvotes', 'downvotes'),
+    'images': (), 'internal_notes': (), 'updates': (), 'user_vote': (),
+}
+
+
+def _names(value):
+    return [name.strip() for name in (value or '').split(',') if name.strip()]
+
+
+def issue_fieldset(query_params):
+    """IssueSerializer fields picked with ``?fields=`` and ``?expand=``; None for all of them.
+
+    ``fields`` lists exactly what to render; ``expand`` alone adds relations
+    to the plain fields. Unknown names are a 400.
+    """
+    fields = _names(query_params.get('fields'))
+    expand = _names(query_params.get('expand'))
+    if not fields and not expand:
+        return None
+    known = IssueSerializer.Meta.fields
+    unknown = [name for name in fields + expand if name not in known]
+    if unknown:
+        raise ParseError(f"Unknown issue field(s): {', '.join(unknown)}")
+    if not fields:
+        fields = [name for name in known if name not in ISSUE_EXPANDABLE]
+    return [name for name in known if name in fields or name in expand]
+
+
+def issue_lookups(fields):
+    """``(only() columns or None, select_related, prefetch_related)`` rendering ``fields`` needs"""
+    if fields is None:
+        return None, tuple(ISSUE_SELECT.values()), tuple(ISSUE_PREFETCH.values())
+    columns = {'id'}
+    for name in fields:
+        columns.update(ISSUE_COLUMNS.get(name, (name,)))
+    select = tuple(lookup for name, lookup in ISSUE_SELECT.items() if name in fields)
+    prefetch = tuple(lookup for name, lookup in ISSUE_PREFETCH.items() if name in fields)
+    return sorted(columns), select, prefetch
+
+
 class IssueCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Issue
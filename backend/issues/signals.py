@@ -0,0 +1,47 @@
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from .detail_cache import bump_version
+from .feeds import area_feed_setting, file_issue
+from .models import Issue, IssueImage, AdminResponse, InternalNote, IssueUpdate, IssueVote
+
+
+@receiver([post_save, post_delete], sender=IssueImage)
+@receiver([post_save, post_delete], sender=AdminResponse)
+@receiver([post_save, post_delete], sender=InternalNote)
+@receiver([post_save, post_delete], sender=IssueUpdate)
+def touch_issue(sender, instance, **kwargs):
+    """Bump the parent issue's updated_at so version probes see related changes"""
+    Issue.objects.filter(pk=instance.issue_id).update(updated_at=timezone.now())
+
+
+@receiver([post_save, post_delete], sender=Issue)
+@receiver([post_save, post_delete], sender=IssueImage)
+@receiver([post_save, post_delete], sender=AdminResponse)
+@receiver([post_save, post_delete], sender=InternalNote)
+@receiver([post_save, post_delete], sender=IssueUpdate)
+@receiver([post_save, post_delete], sender=IssueVote)
+def invalidate_issue_detail(sender, instance, **kwargs):
+    bump_version(instance.pk if sender is Issue else instance.issue_id)
+
+
+FEED_FIELDS = ('status', 'county', 'constituency', 'ward')
+
+
+def feed_state(issue):
+    # Read from __dict__ so deferred fields are not loaded
+    return tuple(issue.__dict__.get(name) for name in FEED_FIELDS)
+
+
+@receiver(post_init, sender=Issue)
+def remember_feed_state(sender, instance, **kwargs):
+    instance._feed_state = feed_state(instance)
+
+
+@receiver(post_save, sender=Issue)
+def refile_issue(sender, instance, created, **kwargs):
+    """Keep the area feeds current; votes and edits that leave status and areas alone cost nothing"""
+    state = feed_state(instance)
+    if area_feed_setting('ENABLED') and (created or state != instance._feed_state):
+        file_issue(instance)
+    instance._feed_state = state
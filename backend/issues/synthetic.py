@@ -0,0 +1,325 @@
+"""
+Reproducible synthetic users, issues and votes at production scale.
+
+Every chunk draws from its own numpy generator seeded with
+``(seed, kind, chunk)``, so the output depends only on the seed and the
+requested sizes and chunk size, not on how many worker processes write
+it. Primary keys are assigned up front, so chunks never need IDs back
+from the database, and the phases run users -> issues -> votes so
+foreign keys always resolve at commit.
+
+Coordinates are scattered around synthetic ward centres placed within an
+approximate radius of each county's centre; the boundary tables carry no
+polygons.
+"""
+import hashlib
+import math
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+
+import numpy as np
+from django.db import connections, transaction
+from django.core.management.color import no_style
+from accounts.models import User, Ward, Constituency
+from .models import Issue, IssueVote
+
+# code: (approximate centre latitude, longitude, radius in degrees, 2019 population in millions)
+COUNTY_PROFILES = {
+    '001': (-4.04, 39.67, 0.08, 1.21), '002': (-4.18, 39.45, 0.35, 0.87),
+    '003': (-3.51, 39.85, 0.45, 1.45), '004': (-1.50, 40.00, 0.80, 0.32),
+    '005': (-2.27, 40.90, 0.30, 0.14), '006': (-3.40, 38.56, 0.45, 0.34),
+    '007': (-0.45, 39.65, 0.90, 0.84), '008': (1.75, 40.06, 0.90, 0.78),
+    '009': (3.94, 41.86, 0.60, 0.87), '010': (2.33, 37.99, 1.00, 0.46),
+    '011': (0.35, 37.58, 0.60, 0.27), '012': (0.05, 37.65, 0.35, 1.55),
+    '013': (-0.30, 37.88, 0.20, 0.39), '014': (-0.54, 37.45, 0.25, 0.61),
+    '015': (-1.37, 38.01, 0.70, 1.14), '016': (-1.52, 37.26, 0.35, 1.42),
+    '017': (-1.80, 37.62, 0.40, 0.99), '018': (-0.18, 36.52, 0.25, 0.64),
+    '019': (-0.42, 36.95, 0.25, 0.76), '020': (-0.50, 37.28, 0.15, 0.61),
+    '021': (-0.72, 37.15, 0.20, 1.06), '022': (-1.17, 36.83, 0.20, 2.42),
+    '023': (3.12, 35.60, 1.20, 0.93), '024': (1.24, 35.11, 0.40, 0.62),
+    '025': (1.10, 36.70, 0.60, 0.31), '026': (1.02, 35.00, 0.20, 0.99),
+    '027': (0.51, 35.27, 0.25, 1.16), '028': (0.67, 35.51, 0.25, 0.45),
+    '029': (0.18, 35.12, 0.25, 0.89), '030': (0.47, 35.97, 0.45, 0.67),
+    '031': (0.36, 36.78, 0.45, 0.52), '032': (-0.30, 36.07, 0.35, 2.16),
+    '033': (-1.08, 35.87, 0.60, 1.16), '034': (-1.85, 36.78, 0.50, 1.12),
+    '035': (-0.37, 35.28, 0.20, 0.90), '036': (-0.78, 35.34, 0.20, 0.88),
+    '037': (0.28, 34.75, 0.25, 1.87), '038': (0.08, 34.72, 0.08, 0.59),
+    '039': (0.56, 34.56, 0.25, 1.67), '040': (0.46, 34.11, 0.20, 0.89),
+    '041': (0.06, 34.29, 0.25, 0.99), '042': (-0.09, 34.77, 0.20, 1.16),
+    '043': (-0.53, 34.46, 0.25, 1.13), '044': (-1.06, 34.47, 0.25, 1.12),
+    '045': (-0.68, 34.77, 0.12, 1.27), '046': (-0.57, 34.94, 0.12, 0.61),
+    '047': (-1.29, 36.82, 0.10, 4.40),
+}
+
+CATEGORY_WEIGHTS = {
+    'roads': 0.28, 'water': 0.20, 'security': 0.12, 'health': 0.10,
+    'environment': 0.09, 'corruption': 0.08, 'education': 0.07, 'housing': 0.06,
+}
+
+SEVERITY_WEIGHTS = {'low': 0.30, 'medium': 0.40, 'high': 0.22, 'critical': 0.08}
+
+# Reports per hour of day (EAT), peaking on the morning commute and early evening
+HOUR_WEIGHTS = np.array([
+    1, 1, 1, 1, 1, 2, 5, 9, 10, 9, 7, 6, 6, 6, 5, 5, 6, 8, 9, 7, 5, 3, 2, 1
+], dtype=np.float64)
+
+# Mean days for an issue to be resolved or closed
+RESOLUTION_DAYS = 60
+
+TITLES = {
+    'roads': ['Potholes on the main road', 'Collapsed culvert', 'Broken street lights', 'Impassable feeder road'],
+    'water': ['No water supply for a week', 'Burst water pipe', 'Blocked sewer line', 'Contaminated borehole'],
+    'health': ['Dispensary out of medicine', 'No nurse on duty', 'Clinic closed during the day'],
+    'security': ['Frequent muggings at night', 'No police patrols', 'Broken security lights'],
+    'corruption': ['Bribe demanded for permit', 'Ghost workers on payroll', 'Inflated tender prices'],
+    'education': ['Classrooms without desks', 'School roof leaking', 'Teacher shortage'],
+    'environment': ['Illegal dumping site', 'Burning of waste', 'Blocked drainage after rain'],
+    'housing': ['Unsafe building under construction', 'Evictions without notice', 'Overcrowded estate'],
+}
+
+DEFAULT_CHUNK_SIZE = 10000
+
+BATCH_SIZE = 2000
+
+
+def _rng(seed, kind, chunk):
+    return np.random.default_rng([seed, {'users': 1, 'issues': 2}[kind], chunk])
+
+
+def _unit(*parts):
+    """Deterministic float in [0, 1) from strings"""
+    digest = hashlib.blake2b('|'.join(parts).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') / 2 ** 64
+
+
+def build_plan(seed, users, issues, votes, days=730, end=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Everything a worker needs to generate any chunk (picklable)"""
+    rows = list(
+        Ward.objects.values_list('constituency__county__code', 'constituency__county__name',
+                                 'constituency__name', 'name')
+    )
+    with_wards = {(code, constituency) for code, _, constituency, _ in rows}
+    # Constituencies without loaded wards stand in as their own ward
+    rows += [
+        (code, county, name, name)
+        for code, county, name in Constituency.objects.values_list('county__code', 'county__name', 'name')
+        if (code, name) not in with_wards
+    ]
+    rows.sort()
+
+    places, weights = [], []
+    per_county = {}
+    for row in rows:
+        per_county[row[0]] = per_county.get(row[0], 0) + 1
+    for code, county, constituency, ward in rows:
+        lat, lon, radius, population = COUNTY_PROFILES.get(code, (-0.02, 37.9, 0.5, 0.5))
+        # Ward centre at a stable pseudo-random point within the county radius
+        angle = 2 * math.pi * _unit(code, constituency, ward, 'angle')
+        distance = radius * math.sqrt(_unit(code, constituency, ward, 'distance'))
+        places.append((county, constituency, ward, lat + distance * math.sin(angle),
+                       lon + distance * math.cos(angle), radius / math.sqrt(per_county[code])))
+        # Superlinear in population: reporting concentrates in urban counties
+        weights.append(population ** 1.3 / per_county[code])
+
+    end = end or datetime.now(dt_timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    return {
+        'seed': seed, 'users': users, 'issues': issues, 'votes': votes,
+        'days': days, 'end': end.timestamp(), 'chunk_size': chunk_size,
+        'places': places, 'place_weights': np.asarray(weights) / sum(weights),
+    }
+
+
+def _choice(rng, weights, size):
+    keys = list(weights)
+    p = np.asarray([weights[key] for key in keys])
+    return np.asarray(keys, dtype=object)[rng.choice(len(keys), size=size, p=p / p.sum())]
+
+
+def user_rows(plan, chunk):
+    """User instances for one chunk; IDs start at plan['user_base']"""
+    start = chunk * plan['chunk_size']
+    stop = min(start + plan['chunk_size'], plan['users'])
+    rng = _rng(plan['seed'], 'users', chunk)
+    count = stop - start
+    place_index = rng.choice(len(plan['places']), size=count, p=plan['place_weights'])
+    joined = plan['end'] - rng.uniform(0, plan['days'] * 86400, size=count)
+
+    users = []
+    for offset in range(count):
+        number = start + offset
+        pk = plan['user_base'] + number
+        county, constituency, ward = plan['places'][place_index[offset]][:3]
+        users.append(User(
+            id=pk,
+            username=f'user{pk}',
+            email=f'user{pk}@example.org',
+            first_name='User',
+            last_name=str(pk),
+            password=plan['password'],
+            # One moderator per thousand citizens
+            role='moderator' if number % 1000 == 999 else 'citizen',
+            county=county, constituency=constituency, ward=ward,
+            date_joined=datetime.fromtimestamp(joined[offset], dt_timezone.utc),
+            created_at=datetime.fromtimestamp(joined[offset], dt_timezone.utc),
+            updated_at=datetime.fromtimestamp(joined[offset], dt_timezone.utc),
+        ))
+    return users
+
+
+def issue_arrays(plan, chunk):
+    """Column arrays for one issue chunk, including per-issue vote counts"""
+    start = chunk * plan['chunk_size']
+    stop = min(start + plan['chunk_size'], plan['issues'])
+    count = stop - start
+    rng = _rng(plan['seed'], 'issues', chunk)
+
+    place = rng.choice(len(plan['places']), size=count, p=plan['place_weights'])
+    # Issue volume grows over time: ages skew towards the recent end
+    age_days = np.floor(plan['days'] * rng.random(count) ** 1.6)
+    hours = rng.choice(24, size=count, p=HOUR_WEIGHTS / HOUR_WEIGHTS.sum())
+    created = (plan['end'] - (age_days + 1) * 86400 + hours * 3600 + rng.uniform(0, 3600, size=count))
+
+    # Older issues are more likely to be resolved or closed
+    done = rng.random(count) < 1 - np.exp(-age_days / RESOLUTION_DAYS)
+    closing = rng.random(count)
+    status = np.where(done, np.where(closing < 0.8, 'resolved', 'closed'),
+                      np.where(closing < 0.7, 'open', 'pending'))
+    updated = np.where(done, created + (plan['end'] - created) * rng.random(count) ** 2, created)
+
+    # Most reports come from anyone; a third from a Zipf-ranked core of prolific reporters
+    reporter = np.where(
+        rng.random(count) < 0.33,
+        (rng.zipf(1.5, size=count) - 1) % plan['users'],
+        rng.integers(0, plan['users'], size=count)
+    )
+
+    # Heavy-tailed vote counts with the requested overall mean, at most one vote per user
+    mean = plan['votes'] / max(plan['issues'], 1)
+    spread = rng.lognormal(0.0, 1.2, size=count) / math.exp(1.2 ** 2 / 2)
+    votes = np.minimum(rng.poisson(mean * spread), plan['users'])
+    downvotes = rng.binomial(votes, rng.beta(2, 12, size=count))
+
+    # Scatter around the ward centre
+    centres = np.asarray([plan['places'][index][3:] for index in place])
+    located = rng.random(count) < 0.85
+    latitude = np.round(centres[:, 0] + rng.normal(0, 1, count) * centres[:, 2] / 3, 6)
+    longitude = np.round(centres[:, 1] + rng.normal(0, 1, count) * centres[:, 2] / 3, 6)
+
+    return {
+        'ids': plan['issue_base'] + np.arange(start, stop),
+        'place': place, 'created': created, 'updated': updated, 'status': status,
+        'category': _choice(rng, CATEGORY_WEIGHTS, count),
+        'severity': _choice(rng, SEVERITY_WEIGHTS, count),
+        'title': rng.integers(0, 1 << 16, size=count),
+        'reporter': reporter, 'anonymous': rng.random(count) < 0.1,
+        'votes': votes, 'downvotes': downvotes,
+        'located': located, 'latitude': latitude, 'longitude': longitude,
+        'voter_offset': rng.integers(0, plan['users'], size=count),
+    }
+
+
+def issue_rows(plan, chunk):
+    columns = issue_arrays(plan, chunk)
+    issues = []
+    for i in range(len(columns['ids'])):
+        county, constituency, ward = plan['places'][columns['place'][i]][:3]
+        category = columns['category'][i]
+        titles = TITLES[category]
+        title = titles[columns['title'][i] % len(titles)]
+        issues.append(Issue(
+            id=int(columns['ids'][i]),
+            title=f'{title} in {ward}',
+            description=f'{title} reported by residents of {ward} ward, {constituency}.',
+            category=category,
+            severity=columns['severity'][i],
+            status=columns['status'][i],
+            county=county, constituency=constituency, ward=ward,
+            latitude=float(columns['latitude'][i]) if columns['located'][i] else None,
+            longitude=float(columns['longitude'][i]) if columns['located'][i] else None,
+            submitted_by_id=plan['user_base'] + int(columns['reporter'][i]),
+            anonymous=bool(columns['anonymous'][i]),
+            upvotes=int(columns['votes'][i] - columns['downvotes'][i]),
+            downvotes=int(columns['downvotes'][i]),
+            created_at=datetime.fromtimestamp(columns['created'][i], dt_timezone.utc),
+            updated_at=datetime.fromtimestamp(columns['updated'][i], dt_timezone.utc),
+        ))
+    return issues
+
+
+def vote_rows(plan, chunk):
+    """Votes matching the counters written for the same issue chunk"""
+    columns = issue_arrays(plan, chunk)
+    users = plan['users']
+    # A stride coprime with the user count visits distinct users from any offset
+    stride = next(s for s in range(7919, 7919 + users + 1) if math.gcd(s, users) == 1)
+    votes = []
+    for i in range(len(columns['ids'])):
+        total, down = int(columns['votes'][i]), int(columns['downvotes'][i])
+        if not total:
+            continue
+        voters = (int(columns['voter_offset'][i]) + np.arange(total, dtype=np.int64) * stride) % users
+        # Votes trail the report over the issue's active life
+        created = columns['created'][i]
+        spread = max(columns['updated'][i] - created, 3600)
+        for position, voter in enumerate(voters.tolist()):
+            votes.append(IssueVote(
+                issue_id=int(columns['ids'][i]),
+                user_id=plan['user_base'] + voter,
+                vote_type='down' if position < down else 'up',
+                created_at=datetime.fromtimestamp(created + spread * position / total, dt_timezone.utc),
+            ))
+    return votes
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let bulk_create keep the generated created_at/updated_at values"""
+    saved = []
+    for model in models:
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                saved.append((field, field.auto_now, field.auto_now_add))
+                field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+BUILDERS = {'users': (user_rows, User), 'issues': (issue_rows, Issue), 'votes': (vote_rows, IssueVote)}
+
+
+def write_chunk(plan, kind, chunk, alias='default'):
+    """Generate and insert one chunk; returns the number of rows written.
+
+    Each batch commits on its own so that, on SQLite, other writer processes
+    can take the lock while this one prepares its next batch.
+    """
+    build, model = BUILDERS[kind]
+    with explicit_timestamps(model):
+        rows = build(plan, chunk)
+        for offset in range(0, len(rows), BATCH_SIZE):
+            with transaction.atomic(using=alias):
+                model.objects.using(alias).bulk_create(rows[offset:offset + BATCH_SIZE])
+    return len(rows)
+
+
+def chunk_count(plan, kind):
+    total = plan['users'] if kind == 'users' else plan['issues']
+    return math.ceil(total / plan['chunk_size'])
+
+
+def reset_sequences(alias='default'):
+    """Move ID sequences past explicitly assigned keys (PostgreSQL)"""
+    connection = connections[alias]
+    statements = connection.ops.sequence_reset_sql(no_style(), [User, Issue])
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def next_id(model, alias='default'):
+    last = model.objects.using(alias).order_by('-id').values_list('id', flat=True).first()
+    return (last or 0) + 1
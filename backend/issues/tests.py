@@ -1,8 +1,23 @@
-from django.test import TestCase
+import asyncio
+import time
+from datetime import datetime, timezone as dt_timezone
+from io import StringIO
+from unittest import mock
+from asgiref.sync import async_to_sync
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db.models import Count, Sum
+from django.test import TestCase, override_settings
+from django.utils.http import http_date
 from django.contrib.auth import get_user_model
 from rest_framework.test import APITestCase
 from rest_framework import status
-from .models import Issue
+from accounts.boundaries import DEFAULT_FILE, load_boundaries, read_rows
+from uwazi254_backend import metrics
+from .categorization import KeywordCategorizer, categorize
+from .feeds import feed_areas, live_feed
+from .models import Issue, IssueUpdate, IssueVote, AreaFeed, AreaFeedEntry
+from .synthetic import build_plan, issue_rows
 
 User = get_user_model()
 
@@ -36,6 +51,9 @@ class IssueAPITest(APITestCase):
             email='test@example.com',
             password='testpass123'
         )
+        # Detail cache versions only move on commit, which TestCase never does
+        cache.clear()
+        caches['issue_detail'].clear()
     
     def test_create_issue_authenticated(self):
         self.client.force_authenticate(user=self.user)
@@ -65,4 +83,331 @@ class IssueAPITest(APITestCase):
         
         response = self.client.get('/api/issues/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data['results']), 1)
\ No newline at end of file
+        self.assertEqual(len(response.json()['results']), 1)
+    
+    def test_list_issues_conditional_get(self):
+        issue = Issue.objects.create(
+            title='Test Issue',
+            description='Test description',
+            category='roads',
+            county='Kiambu',
+            constituency='Ruiru',
+            ward='Kahawa West',
+            submitted_by=self.user
+        )
+        
+        response = self.client.get('/api/issues/')
+        etag = response['ETag']
+        self.assertIn('public', response['Cache-Control'])
+        
+        response = self.client.get('/api/issues/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        
+        issue.status = 'resolved'
+        issue.save()
+        response = self.client.get('/api/issues/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+    
+    def test_list_not_validated_by_last_modified(self):
+        for title in ('Older', 'Newer'):
+            Issue.objects.create(
+                title=title,
+                description='Test description',
+                category='roads',
+                county='Kiambu',
+                constituency='Ruiru',
+                ward='Kahawa West',
+                submitted_by=self.user
+            )
+        response = self.client.get('/api/issues/')
+        self.assertNotIn('Last-Modified', response)
+        
+        # Deleting a row doesn't move MAX(updated_at); a client sending only If-Modified-Since must not get a 304
+        Issue.objects.get(title='Older').delete()
+        response = self.client.get('/api/issues/', HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['count'], 1)
+        
+        issue = Issue.objects.get()
+        response = self.client.get(f'/api/issues/{issue.pk}/')
+        self.assertIn('Last-Modified', response)
+    
+    def test_detail_conditional_get_missing_issue(self):
+        response = self.client.get('/api/issues/999/', HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+    
+    def test_async_list_filters_and_authenticates(self):
+        for category in ('roads', 'water'):
+            Issue.objects.create(
+                title=f'{category} issue',
+                description='Test description',
+                category=category,
+                county='Kiambu',
+                constituency='Ruiru',
+                ward='Kahawa West',
+                submitted_by=self.user
+            )
+        
+        response = self.client.get('/api/issues/', {'category': 'water'})
+        self.assertEqual([issue['title'] for issue in response.json()['results']], ['water issue'])
+        self.assertEqual(response.json()['count'], 1)
+        
+        response = self.client.get('/api/issues/', {'page': 5})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        
+        response = self.client.get('/api/issues/', HTTP_AUTHORIZATION='Bearer not-a-token')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn('Bearer', response['WWW-Authenticate'])
+        
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get('/api/issues/')
+        self.assertEqual({issue['user_vote'] for issue in response.json()['results']}, {None})
+    
+    def test_browsable_api_served_by_drf(self):
+        response = self.client.get('/api/issues/', HTTP_ACCEPT='text/html')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/html'))
+    
+    def test_categorize(self):
+        data = {'description': 'Huge pothole on the road to the market'}
+        response = self.client.post('/api/issues/categorize/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post('/api/issues/categorize/', data, format='json')
+        self.assertEqual(response.json(), {'category': 'Infrastructure'})
+        
+        response = self.client.post('/api/issues/categorize/', {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    @override_settings(ISSUE_CATEGORIZER={
+        'BACKEND': 'issues.tests.StalledCategorizer', 'TIMEOUT': 0.05
+    })
+    def test_categorizer_timeout_falls_back_to_keywords(self):
+        with self.assertLogs('uwazi254.categorizer', 'WARNING'):
+            result = async_to_sync(categorize)('Clinic has no health workers')
+        self.assertEqual(result, {'category': 'Health'})
+    
+    @override_settings(ISSUE_CATEGORIZER={'BACKEND': 'issues.categorization.GeminiCategorizer'})
+    def test_unconfigured_gemini_falls_back_to_keywords(self):
+        real_import = __import__
+        
+        def import_without_key(name, *args, **kwargs):
+            if name == 'ai_categorizer':
+                raise ValueError('GOOGLE_API_KEY not found in environment.')
+            return real_import(name, *args, **kwargs)
+        
+        with mock.patch('builtins.__import__', import_without_key), self.assertLogs('uwazi254.categorizer', 'WARNING'):
+            result = async_to_sync(categorize)('Clinic has no health workers')
+        self.assertEqual(result, {'category': 'Health'})
+
+    
+    def test_sparse_fieldsets(self):
+        issue = Issue.objects.create(
+            title='Test Issue',
+            description='Test description',
+            category='roads',
+            county='Kiambu',
+            constituency='Ruiru',
+            ward='Kahawa West',
+            latitude='-1.200000',
+            longitude='36.900000',
+            submitted_by=self.user
+        )
+        self.client.force_authenticate(user=self.user)
+        
+        with self.assertNumQueries(3):  # version, count, page
+            response = self.client.get('/api/issues/', {'fields': 'id,latitude,longitude,category,status'})
+        self.assertEqual(response.json()['results'], [{
+            'id': issue.pk, 'category': 'roads', 'status': 'open',
+            'latitude': '-1.200000', 'longitude': '36.900000',
+        }])
+        
+        response = self.client.get(f'/api/issues/{issue.pk}/', {'expand': 'submitted_by'})
+        data = response.json()
+        self.assertEqual(data['submitted_by']['username'], 'testuser')
+        self.assertEqual(data['vote_score'], 0)
+        for name in ('images', 'updates', 'user_vote'):
+            self.assertNotIn(name, data)
+        
+        response = self.client.get('/api/issues/my-issues/', {'fields': 'title', 'expand': 'user_vote'})
+        self.assertEqual(response.json()['results'], [{'title': 'Test Issue', 'user_vote': None}])
+        
+        response = self.client.get('/api/issues/', {'fields': 'title,password'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    
+    def test_detail_cache(self):
+        issue = Issue.objects.create(
+            title='Test Issue',
+            description='Test description',
+            category='roads',
+            county='Kiambu',
+            constituency='Ruiru',
+            ward='Kahawa West',
+            submitted_by=self.user
+        )
+        metrics.reset()
+        first = self.client.get(f'/api/issues/{issue.pk}/').json()
+        with self.assertNumQueries(0):
+            second = self.client.get(f'/api/issues/{issue.pk}/').json()
+        self.assertEqual(first, second)
+        # The version token lives beside the entries, not in the default cache
+        self.assertIsNotNone(caches['issue_detail'].get(f'issue-detail:version:{issue.pk}'))
+        self.assertIsNone(cache.get(f'issue-detail:version:{issue.pk}'))
+        values, _ = metrics.registry.collect()
+        self.assertEqual(values[('cache_requests_total', ('issue_detail', 'miss'))], 1)
+        self.assertEqual(values[('cache_requests_total', ('issue_detail', 'hit'))], 1)
+        
+        self.client.force_authenticate(user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/issues/{issue.pk}/vote/', {'vote_type': 'up'})
+        with self.assertNumQueries(5):  # re-render (issue, three prefetches) and user_vote
+            data = self.client.get(f'/api/issues/{issue.pk}/').json()
+        self.assertEqual((data['upvotes'], data['user_vote']), (1, 'up'))
+        
+        # Another user shares the cached body but not the vote
+        other = User.objects.create_user(username='other', email='other@example.com', password='x')
+        self.client.force_authenticate(user=other)
+        with self.assertNumQueries(1):
+            data = self.client.get(f'/api/issues/{issue.pk}/').json()
+        self.assertEqual((data['upvotes'], data['user_vote']), (1, None))
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            IssueUpdate.objects.create(issue=issue, title='Crew dispatched', description='', updated_by=self.user)
+        data = self.client.get(f'/api/issues/{issue.pk}/').json()
+        self.assertEqual([update['title'] for update in data['updates']], ['Crew dispatched'])
+
+
+class StalledCategorizer(KeywordCategorizer):
+    async def categorize(self, description):
+        await asyncio.sleep(1)
+        return {'category': 'Other'}
+
+class SyntheticDatasetTest(TestCase):
+    def setUp(self):
+        load_boundaries(read_rows(DEFAULT_FILE))
+    
+    def test_generate_dataset(self):
+        call_command(
+            'generate_dataset', users=50, issues=300, votes=1500, chunk_size=100,
+            end='2024-06-30', workers=1, stdout=StringIO()
+        )
+        self.assertEqual(User.objects.count(), 50)
+        self.assertEqual(Issue.objects.count(), 300)
+        totals = Issue.objects.aggregate(up=Sum('upvotes'), down=Sum('downvotes'))
+        self.assertEqual(IssueVote.objects.filter(vote_type='up').count(), totals['up'])
+        self.assertEqual(IssueVote.objects.filter(vote_type='down').count(), totals['down'])
+        # Generated timestamps are kept rather than replaced by auto_now
+        self.assertLess(Issue.objects.order_by('created_at').first().created_at.year, 2024)
+        # Urban counties dominate
+        top = Issue.objects.values('county').annotate(n=Count('id')).order_by('-n').first()
+        self.assertEqual(top['county'], 'Nairobi')
+    
+    def test_chunks_are_reproducible(self):
+        plan = build_plan(7, users=20, issues=50, votes=100, end=datetime(2024, 1, 1, tzinfo=dt_timezone.utc))
+        plan.update(user_base=1, issue_base=1, password='!')
+        first = [(i.county, i.ward, i.category, i.created_at, i.upvotes) for i in issue_rows(plan, 0)]
+        second = [(i.county, i.ward, i.category, i.created_at, i.upvotes) for i in issue_rows(plan, 0)]
+        self.assertEqual(first, second)
+
+class AreaFeedTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='resident', email='resident@example.com', password='testpass123',
+            county='Nairobi', constituency='Kasarani', ward='Mwiki'
+        )
+        self.client.force_authenticate(user=self.user)
+        metrics.reset()
+    
+    def report(self, count, county='Nairobi', constituency='Kasarani', ward='Mwiki'):
+        return [
+            Issue.objects.create(
+                title=f'Issue {i} in {ward}', description='Test description', category='roads',
+                county=county, constituency=constituency, ward=ward, submitted_by=self.user
+            )
+            for i in range(count)
+        ]
+    
+    def feed(self, page=1):
+        response = self.client.get(f'/api/issues/feed/?page={page}')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+    
+    def expected(self, offset=0, limit=20):
+        return list(live_feed(feed_areas(self.user)).values_list('id', flat=True)[offset:offset + limit])
+    
+    def feed_reads(self, result):
+        return metrics.registry.collect()[0].get(('cache_requests_total', ('area_feed', result)), 0)
+    
+    def test_feed_merges_ward_constituency_and_county(self):
+        self.report(6)
+        self.report(6, ward='Githurai')
+        self.report(6, constituency='Embakasi East', ward='Utawala')
+        self.report(6, county='Kiambu', constituency='Ruiru', ward='Kahawa West')
+        resolved = self.report(1)[0]
+        resolved.status = 'resolved'
+        resolved.save()
+        
+        first = self.feed()
+        self.assertEqual([issue['id'] for issue in first['results']], self.expected())
+        self.assertIsNone(first['previous'])
+        second = self.feed(2)
+        self.assertEqual([issue['id'] for issue in second['results']], self.expected(20))
+        self.assertIsNone(second['next'])
+        self.assertNotIn(resolved.pk, [issue['id'] for issue in first['results'] + second['results']])
+        self.assertEqual(self.feed_reads('hit'), 2)
+        
+        # Votes don't touch the feeds; reopening does
+        resolved.upvotes = 3
+        resolved.save()
+        self.assertFalse(AreaFeedEntry.objects.filter(issue=resolved).exists())
+        resolved.status = 'open'
+        resolved.save()
+        self.assertEqual(self.feed()['results'][0]['id'], resolved.pk)
+    
+    @override_settings(AREA_FEEDS={'WINDOW': 10})
+    def test_feeds_are_capped_with_live_fallback(self):
+        issues = self.report(25)
+        self.assertEqual(AreaFeedEntry.objects.filter(scope='ward', area='Mwiki').count(), 10)
+        self.assertEqual(AreaFeed.objects.get(scope='county', area='Nairobi').horizon_id, issues[14].pk)
+        
+        # A page of 20 needs more than the window
+        self.assertEqual([issue['id'] for issue in self.feed()['results']], self.expected())
+        self.assertEqual(self.feed_reads('miss'), 0)
+        self.assertEqual(self.feed_reads('hit'), 0)
+        
+        # Reopening an issue below the window leaves the table alone
+        issues[0].status = 'closed'
+        issues[0].save()
+        issues[0].status = 'open'
+        issues[0].save()
+        self.assertFalse(AreaFeedEntry.objects.filter(issue=issues[0]).exists())
+        with self.settings(AREA_FEEDS={'WINDOW': 50}):
+            self.assertEqual([issue['id'] for issue in self.feed()['results']], self.expected())
+            self.assertEqual(self.feed_reads('miss'), 1)
+    
+    def test_rebuild_after_bulk_load(self):
+        Issue.objects.bulk_create([
+            Issue(title=f'Imported {i}', description='Bulk', category='water', county='Nairobi',
+                  constituency='Kasarani', ward='Mwiki', submitted_by=self.user)
+            for i in range(5)
+        ])
+        # Not materialized yet: the live query answers
+        self.assertEqual(len(self.feed()['results']), 5)
+        self.assertEqual(self.feed_reads('miss'), 1)
+        
+        call_command('rebuild_area_feeds', stdout=StringIO())
+        self.assertEqual([issue['id'] for issue in self.feed()['results']], self.expected())
+        self.assertEqual(self.feed_reads('hit'), 1)
+    
+    def test_user_without_area(self):
+        self.report(3)
+        self.client.force_authenticate(user=User.objects.create_user(
+            username='nowhere', email='nowhere@example.com', password='testpass123'
+        ))
+        self.assertEqual(self.feed()['results'], [])
+        self.assertEqual(self.client.get('/api/issues/feed/?page=0').status_code, 404)
+
@@ -1,7 +1,18 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CategorizeIssueView 
+from .views import (
+    MyIssuesView, AreaFeedView, issue_list, issue_detail, categorize_issue,
+    vote_issue, add_admin_response, add_internal_note, update_issue_status
+)
 
 urlpatterns = [
-    path('api/issues/categorize/', CategorizeIssueView.as_view(), name='categorize-issue'),
+    path('', issue_list, name='issue-list'),
+    path('<int:pk>/', issue_detail, name='issue-detail'),
+    path('<int:pk>/vote/', vote_issue, name='issue-vote'),
+    path('<int:pk>/response/', add_admin_response, name='issue-admin-response'),
+    path('<int:pk>/notes/', add_internal_note, name='issue-internal-note'),
+    path('<int:pk>/status/', update_issue_status, name='issue-status'),
+    path('my-issues/', MyIssuesView.as_view(), name='my-issues'),
+    path('feed/', AreaFeedView.as_view(), name='area-feed'),
+    path('categorize/', categorize_issue, name='categorize-issue'),
 ]
@@ -1,15 +1,27 @@
+from asgiref.sync import async_to_sync, sync_to_async
 from rest_framework import generics, status, permissions, viewsets
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import NotAuthenticated, NotFound, ParseError
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
-from django.db.models import Q, F
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from django.core.paginator import InvalidPage, Page, Paginator
+from django.db.models import Q, F, prefetch_related_objects
+from uwazi254_backend.async_api import api_response, async_api_view, drf_request, request_data
 from .models import Issue, IssueVote, AdminResponse, InternalNote
 from .serializers import (
     IssueSerializer, IssueCreateSerializer, IssueVoteSerializer,
-    AdminResponseCreateSerializer, InternalNoteCreateSerializer
+    AdminResponseSerializer, AdminResponseCreateSerializer,
+    InternalNoteSerializer, InternalNoteCreateSerializer,
+    issue_fieldset, issue_lookups
 )
 from .filters import IssueFilter
+from .conditional import ConditionalGetMixin, DataVersion, arespond_conditionally
+from .categorization import categorize
+from .detail_cache import acurrent_version, aget_entry, aset_entry
+from .feeds import feed_areas, feed_page, live_feed
 
 
 class IssueViewSet(viewsets.ModelViewSet):
@@ -17,7 +29,32 @@ class IssueViewSet(viewsets.ModelViewSet):
     serializer_class = IssueSerializer
 
 
-class IssueListCreateView(generics.ListCreateAPIView):
+class IssueFieldsetMixin:
+    """``?fields=``/``?expand=`` for generic views rendering IssueSerializer"""
+    
+    def get_fieldset(self):
+        if not hasattr(self, '_fieldset'):
+            reading = self.request.method in ('GET', 'HEAD')
+            self._fieldset = issue_fieldset(self.request.query_params) if reading else None
+        return self._fieldset
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method not in ('GET', 'HEAD'):
+            # Saving an instance with deferred fields would only write the loaded ones
+            return queryset
+        columns, select, prefetch = issue_lookups(self.get_fieldset())
+        if columns:
+            queryset = queryset.only(*columns)
+        return queryset.select_related(*select).prefetch_related(*prefetch)
+    
+    def get_serializer(self, *args, **kwargs):
+        if self.get_serializer_class() is IssueSerializer:
+            kwargs['fields'] = self.get_fieldset()
+        return super().get_serializer(*args, **kwargs)
+
+
+class IssueListCreateView(IssueFieldsetMixin, ConditionalGetMixin, generics.ListCreateAPIView):
     queryset = Issue.objects.all()
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_class = IssueFilter
@@ -35,10 +72,73 @@ class IssueListCreateView(generics.ListCreateAPIView):
             return [permissions.IsAuthenticated()]
         return [permissions.AllowAny()]
 
-class IssueDetailView(generics.RetrieveUpdateDestroyAPIView):
+
+async def load_issues(queryset, fields=None):
+    """Evaluate ``queryset`` with the columns and relations rendering ``fields`` needs"""
+    columns, select, prefetch = issue_lookups(fields)
+    if columns:
+        queryset = queryset.only(*columns)
+    issues = [issue async for issue in queryset.select_related(*select)]
+    if issues and prefetch:
+        # Async iteration can't prefetch (Django 4.2)
+        await sync_to_async(prefetch_related_objects)(issues, *prefetch)
+    return issues
+
+
+async def serialize_issues(issues, request, many=True, fields=None):
+    # user_vote still queries per issue for authenticated users
+    return await sync_to_async(
+        lambda: IssueSerializer(issues, many=many, fields=fields, context={'request': request}).data
+    )()
+
+
+async def paginate_issues(pagination, queryset, request, fields=None):
+    """PageNumberPagination.paginate_queryset on the async ORM"""
+    page_size = pagination.get_page_size(request)
+    paginator = Paginator(queryset, page_size)
+    # Prime the cached count so the paginator never queries synchronously
+    paginator.count = await queryset.acount()
+    page_number = request.query_params.get(pagination.page_query_param, 1)
+    if page_number in pagination.last_page_strings:
+        page_number = paginator.num_pages
+    try:
+        number = paginator.validate_number(page_number)
+    except InvalidPage as exc:
+        raise NotFound(pagination.invalid_page_message.format(page_number=page_number, message=str(exc)))
+    bottom = (number - 1) * page_size
+    issues = await load_issues(queryset[bottom:bottom + page_size], fields)
+    pagination.page = Page(issues, number, paginator)
+    pagination.request = request
+    return issues
+
+
+@async_api_view(IssueListCreateView.as_view())
+async def issue_list(request):
+    """Filtered, paginated issue list on the async ORM (POST and the browsable API stay on DRF)"""
+    api_request = drf_request(request)
+    fields = issue_fieldset(request.GET)
+    view = IssueListCreateView(request=api_request, format_kwarg=None, args=(), kwargs={})
+    # Not view.get_queryset(): its prefetches can't run on async iteration
+    queryset = view.filter_queryset(Issue.objects.all())
+    
+    async def render():
+        pagination = view.paginator
+        issues = await paginate_issues(pagination, queryset, api_request, fields)
+        data = await serialize_issues(issues, request, fields=fields)
+        return api_response(pagination.get_paginated_response(data).data)
+    
+    return await arespond_conditionally(request, await DataVersion.aof(queryset), render)
+
+
+class IssueDetailView(IssueFieldsetMixin, ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Issue.objects.all()
     serializer_class = IssueSerializer
     
+    def get_data_version(self):
+        version = DataVersion.of(self.get_queryset().filter(pk=self.kwargs['pk']), collection=False)
+        # Missing issues fall through to the regular 404
+        return version if version.count else None
+    
     def get_permissions(self):
         if self.request.method in ['PUT', 'PATCH', 'DELETE']:
             return [permissions.IsAuthenticated()]
@@ -57,6 +157,49 @@ class IssueDetailView(generics.RetrieveUpdateDestroyAPIView):
         
         return super().update(request, *args, **kwargs)
 
+
+# Everything but the per-user fields, which are merged in per request
+PUBLIC_ISSUE_FIELDS = [name for name in IssueSerializer.Meta.fields if name != 'user_vote']
+
+
+async def public_issue(request, pk):
+    """``(version, {'data', 'last_modified'})`` for issue ``pk`` from the detail cache, or
+    freshly serialized and cached; the entry is None if the issue doesn't exist"""
+    # Read the version first: a write landing mid-render then bumps past what we store
+    version = await acurrent_version(pk)
+    origin = f'{request.scheme}://{request.get_host()}'
+    entry = await aget_entry(pk, version, origin)
+    if entry is None:
+        issues = await load_issues(Issue.objects.filter(pk=pk), PUBLIC_ISSUE_FIELDS)
+        if not issues:
+            return version, None
+        data = await serialize_issues(issues[0], request, many=False, fields=PUBLIC_ISSUE_FIELDS)
+        entry = {'data': dict(data), 'last_modified': issues[0].updated_at}
+        await aset_entry(pk, version, origin, entry)
+    return version, entry
+
+
+@async_api_view(IssueDetailView.as_view())
+async def issue_detail(request, pk):
+    """Single issue from the detail cache (writes and the browsable API stay on DRF)"""
+    fields = issue_fieldset(request.GET) or IssueSerializer.Meta.fields
+    version, entry = await public_issue(request, pk)
+    if entry is None:
+        raise NotFound()
+    
+    async def render():
+        data = {name: entry['data'][name] for name in fields if name in entry['data']}
+        if 'user_vote' in fields:
+            data['user_vote'] = None
+            if request.user.is_authenticated:
+                data['user_vote'] = await IssueVote.objects.filter(
+                    issue_id=pk, user=request.user
+                ).values_list('vote_type', flat=True).afirst()
+        return api_response(data)
+    
+    # The cache version changes with every write, votes included
+    return await arespond_conditionally(request, DataVersion(entry['last_modified'], 1, version), render)
+
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def vote_issue(request, pk):
@@ -188,12 +331,53 @@ def update_issue_status(request, pk):
     
     return Response({'message': 'Status updated successfully'})
 
-class MyIssuesView(generics.ListAPIView):
+class MyIssuesView(IssueFieldsetMixin, generics.ListAPIView):
+    queryset = Issue.objects.all()
     serializer_class = IssueSerializer
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        return Issue.objects.filter(submitted_by=self.request.user)
+        return super().get_queryset().filter(submitted_by=self.request.user)
+    
+
+class AreaFeedView(IssueFieldsetMixin, generics.ListAPIView):
+    """Active issues in the user's ward, constituency and county, newest first.
+
+    Pages are numbered like the other lists, but there is no count: most
+    pages come from the feed tables (see ``issues.feeds``), which don't
+    know the total.
+    """
+    queryset = Issue.objects.all()
+    serializer_class = IssueSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def list(self, request, *args, **kwargs):
+        page_size = api_settings.PAGE_SIZE
+        page_number = request.query_params.get('page', '1')
+        if not page_number.isdigit() or int(page_number) < 1:
+            raise NotFound(f'Invalid page "{page_number}".')
+        number = int(page_number)
+        offset = (number - 1) * page_size
+        
+        areas = feed_areas(request.user)
+        issues = []
+        if areas:
+            ids = feed_page(areas, offset, page_size)
+            if ids is None:
+                issues = list(live_feed(areas, self.get_queryset())[offset:offset + page_size + 1])
+            else:
+                by_id = self.get_queryset().in_bulk(ids)
+                issues = [by_id[pk] for pk in ids if pk in by_id]
+        
+        url = request.build_absolute_uri()
+        previous = None
+        if number > 1:
+            previous = replace_query_param(url, 'page', number - 1) if number > 2 else remove_query_param(url, 'page')
+        return Response({
+            'next': replace_query_param(url, 'page', number + 1) if len(issues) > page_size else None,
+            'previous': previous,
+            'results': self.get_serializer(issues[:page_size], many=True).data,
+        })
     
     
 from rest_framework.views import APIView
@@ -207,12 +391,18 @@ class CategorizeIssueView(APIView):
         if not description:
             return Response({"error": "Description is required"}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Dummy categorization logic (replace with AI later)
-        if "health" in description.lower():
-            category = "Health"
-        elif "road" in description.lower():
-            category = "Infrastructure"
-        else:
-            category = "Other"
+        return Response(async_to_sync(categorize)(description), status=status.HTTP_200_OK)
+
 
-        return Response({"category": category}, status=status.HTTP_200_OK)
+@async_api_view(CategorizeIssueView.as_view(), methods=('POST',))
+async def categorize_issue(request):
+    """Categorize a description without holding a thread while a remote categorizer answers"""
+    if not request.user.is_authenticated:
+        raise NotAuthenticated()
+    data = request_data(request)
+    if data is None:
+        raise ParseError()
+    description = data.get('description', '')
+    if not description:
+        return api_response({'error': 'Description is required'}, status=status.HTTP_400_BAD_REQUEST)
+    return api_response(await categorize(description))
@@ -0,0 +1,14 @@
+from django.contrib import admin
+from .models import NotificationEvent, Digest
+
+@admin.register(NotificationEvent)
+class NotificationEventAdmin(admin.ModelAdmin):
+    list_display = ['issue', 'kind', 'title', 'created_at', 'fanned_out_at']
+    list_filter = ['kind']
+    ordering = ['-created_at']
+
+@admin.register(Digest)
+class DigestAdmin(admin.ModelAdmin):
+    list_display = ['address', 'channel', 'notification_count', 'status', 'attempts', 'created_at', 'sent_at']
+    list_filter = ['status', 'channel']
+    ordering = ['-created_at']
@@ -0,0 +1,66 @@
+"""
+Delivery backends for notification digests.
+
+A backend is named per channel in ``NOTIFICATIONS['CHANNELS']`` and has
+``address(user)``, the user's address on that channel (or a falsy value
+to skip them), and ``send(digests)``, which delivers a batch and returns
+``{digest_pk: error}`` for the ones that failed.
+"""
+import logging
+import sys
+
+from django.core.mail import EmailMessage, get_connection
+
+logger = logging.getLogger('uwazi254.notifications')
+
+
+class EmailBackend:
+    """Sends through Django's EMAIL_BACKEND over one connection per batch"""
+
+    def __init__(self, **options):
+        self.options = options
+
+    def address(self, user):
+        return user.email
+
+    def send(self, digests):
+        errors = {}
+        with get_connection(fail_silently=False) as connection:
+            for digest in digests:
+                try:
+                    EmailMessage(digest.subject, digest.body, to=[digest.address], connection=connection).send()
+                except Exception as e:
+                    errors[digest.pk] = repr(e)
+        return errors
+
+
+class ConsoleSMSBackend:
+    """Writes text messages to stdout; for development"""
+
+    def __init__(self, stream=None, **options):
+        self.stream = stream or sys.stdout
+        self.options = options
+
+    def address(self, user):
+        return user.phone
+
+    def format(self, digest):
+        return f'{digest.subject}: {digest.body}'
+
+    def send(self, digests):
+        for digest in digests:
+            self.stream.write(f'SMS to {digest.address}: {self.format(digest)}\n')
+        self.stream.flush()
+        return {}
+
+
+# Messages "sent" by LocMemSMSBackend, like django.core.mail.outbox
+outbox = []
+
+
+class LocMemSMSBackend(ConsoleSMSBackend):
+    """Keeps text messages in ``outbox``; for tests"""
+
+    def send(self, digests):
+        outbox.extend({'to': digest.address, 'body': self.format(digest)} for digest in digests)
+        return {}
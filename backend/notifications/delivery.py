@@ -0,0 +1,218 @@
+"""
+Batched notification fan-out.
+
+Posting an admin response or a public issue update only writes one
+``NotificationEvent`` (see ``signals``), so the request costs the same
+whatever the audience. ``notification_worker`` then runs three steps:
+
+1. ``fan_out`` claims pending events and ``bulk_create``s a
+   ``Notification`` for the submitter and every voter, ``BATCH_SIZE``
+   rows at a time.
+2. ``build_digests`` coalesces each user's undigested notifications into
+   one ``Digest`` per channel once the oldest is ``DIGEST_SECONDS`` old,
+   so a busy issue sends one message rather than one per event.
+3. ``deliver`` hands due digests to each channel's backend in batches,
+   retrying failures with exponential backoff up to ``MAX_ATTEMPTS``.
+
+Rows are claimed with ``select_for_update(skip_locked=True)`` or a
+conditional update, so several workers can run side by side. Claims on
+events and digests are leases committed before the slow part (writing
+the audience, calling a backend), so no transaction stays open across
+it; work left by a worker that died is taken up again after
+``LEASE_SECONDS``. Delivery is therefore at least once.
+"""
+from datetime import timedelta
+from itertools import groupby, islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Min, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from django.utils.text import Truncator
+from uwazi254_backend.metrics import NOTIFICATIONS_SENT
+from .models import NotificationEvent, Notification, Digest
+
+DEFAULTS = {
+    'CHANNELS': {'email': 'notifications.backends.EmailBackend'},
+    'DIGEST_SECONDS': 300,
+    'BATCH_SIZE': 500,
+    'MAX_ATTEMPTS': 5,
+    'RETRY_SECONDS': 60,
+    'POLL_SECONDS': 5,
+    'LEASE_SECONDS': 300,
+}
+
+User = get_user_model()
+
+
+def notification_setting(name):
+    return getattr(settings, 'NOTIFICATIONS', {}).get(name, DEFAULTS[name])
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+_backends = {}
+
+
+def get_backends():
+    """``{channel: backend}`` for the configured channels"""
+    backends = {}
+    for channel, path in notification_setting('CHANNELS').items():
+        backend_class = import_string(path)
+        if type(_backends.get(channel)) is not backend_class:
+            _backends[channel] = backend_class()
+        backends[channel] = _backends[channel]
+    return backends
+
+
+def audience(event):
+    """IDs of the issue's submitter and voters, minus whoever caused the event"""
+    return (
+        User.objects.filter(Q(submitted_issues__pk=event.issue_id) | Q(issuevote__issue_id=event.issue_id))
+        .exclude(pk=event.actor_id).order_by().values_list('pk', flat=True).distinct()
+    )
+
+
+def _unclaimed(stale_before):
+    """Events not fanned out and not claimed by a worker since ``stale_before``"""
+    return Q(fanned_out_at__isnull=True) & (Q(claimed_at__isnull=True) | Q(claimed_at__lt=stale_before))
+
+
+def fan_out():
+    """Write notifications for up to ``BATCH_SIZE`` pending events; returns how many were written"""
+    batch_size = notification_setting('BATCH_SIZE')
+    lease = timedelta(seconds=notification_setting('LEASE_SECONDS'))
+    written = 0
+    events = NotificationEvent.objects.filter(_unclaimed(timezone.now() - lease)).order_by('created_at')[:batch_size]
+    for event in events:
+        claimed_at = timezone.now()
+        # The conditional update is the claim: a second worker updates nothing and moves on
+        if not NotificationEvent.objects.filter(_unclaimed(claimed_at - lease), pk=event.pk).update(
+                claimed_at=claimed_at):
+            continue
+        # Each chunk commits on its own; a retry after a crash skips the rows already written
+        existing = event.notifications.count()
+        for chunk in batched(audience(event).iterator(chunk_size=batch_size), batch_size):
+            with transaction.atomic():
+                Notification.objects.bulk_create(
+                    [Notification(user_id=pk, event=event, created_at=event.created_at) for pk in chunk],
+                    ignore_conflicts=True
+                )
+        # ignore_conflicts doesn't report which rows it skipped
+        written += event.notifications.count() - existing
+        NotificationEvent.objects.filter(pk=event.pk).update(fanned_out_at=timezone.now())
+    return written
+
+
+def compose(notifications):
+    """Subject and body for one user's pending notifications"""
+    if len(notifications) == 1:
+        event = notifications[0].event
+        subject = f'{event.title}: {event.issue.title}'
+    else:
+        subject = f'{len(notifications)} updates on issues you follow'
+    lines = []
+    for notification in notifications:
+        event = notification.event
+        lines.append(f'{event.issue.title} - {event.title}')
+        if event.message:
+            lines.append(Truncator(event.message).chars(200))
+    return Truncator(subject).chars(200), '\n'.join(lines)
+
+
+def build_digests(now=None):
+    """Coalesce due notifications into per-user, per-channel digests; returns how many were created"""
+    now = now or timezone.now()
+    batch_size = notification_setting('BATCH_SIZE')
+    backends = get_backends()
+    due_users = (
+        Notification.objects.filter(digested=False).values('user_id')
+        .annotate(oldest=Min('created_at'))
+        .filter(oldest__lte=now - timedelta(seconds=notification_setting('DIGEST_SECONDS')))
+        .order_by().values_list('user_id', flat=True)
+    )
+    created = 0
+    for user_ids in batched(list(due_users), batch_size):
+        with transaction.atomic():
+            pending = list(
+                Notification.objects.select_for_update(skip_locked=True, of=('self',))
+                .filter(user_id__in=user_ids, digested=False)
+                .select_related('user', 'event__issue').order_by('user_id', 'created_at')
+            )
+            digests = []
+            for _, group in groupby(pending, key=lambda notification: notification.user_id):
+                group = list(group)
+                user = group[0].user
+                subject, body = compose(group)
+                for channel, backend in backends.items():
+                    address = backend.address(user)
+                    if address:
+                        digests.append(Digest(
+                            user=user, channel=channel, address=address, subject=subject, body=body,
+                            notification_count=len(group), next_attempt_at=now
+                        ))
+            Digest.objects.bulk_create(digests, batch_size=batch_size)
+            Notification.objects.filter(pk__in=[notification.pk for notification in pending]).update(digested=True)
+            created += len(digests)
+    return created
+
+
+def deliver(now=None):
+    """Send due digests channel by channel; returns ``{'sent', 'retried', 'failed'}`` counts"""
+    now = now or timezone.now()
+    batch_size = notification_setting('BATCH_SIZE')
+    max_attempts = notification_setting('MAX_ATTEMPTS')
+    lease = timedelta(seconds=notification_setting('LEASE_SECONDS'))
+    totals = {'sent': 0, 'retried': 0, 'failed': 0}
+    for channel, backend in get_backends().items():
+        while True:
+            # Claim the batch by moving it past this pass; if this worker dies it is retried after the lease
+            with transaction.atomic():
+                batch = list(
+                    Digest.objects.select_for_update(skip_locked=True)
+                    .filter(status='pending', channel=channel, next_attempt_at__lte=now)
+                    .order_by('next_attempt_at')[:batch_size]
+                )
+                Digest.objects.filter(pk__in=[digest.pk for digest in batch]).update(next_attempt_at=now + lease)
+            if not batch:
+                break
+
+            # Outside any transaction: a slow backend holds no row locks
+            try:
+                errors = backend.send(batch)
+            except Exception as e:
+                errors = {digest.pk: repr(e) for digest in batch}
+
+            with transaction.atomic():
+                sent = [digest.pk for digest in batch if digest.pk not in errors]
+                Digest.objects.filter(pk__in=sent).update(status='sent', sent_at=timezone.now(), last_error='')
+                failed = [digest for digest in batch if digest.pk in errors]
+                for digest in failed:
+                    digest.attempts += 1
+                    digest.last_error = errors[digest.pk]
+                    if digest.attempts >= max_attempts:
+                        digest.status = 'failed'
+                    else:
+                        delay = notification_setting('RETRY_SECONDS') * 2 ** (digest.attempts - 1)
+                        digest.next_attempt_at = now + timedelta(seconds=delay)
+                Digest.objects.bulk_update(failed, ['attempts', 'last_error', 'status', 'next_attempt_at'])
+
+            given_up = sum(digest.status == 'failed' for digest in failed)
+            for result, count in (('sent', len(sent)), ('retried', len(failed) - given_up), ('failed', given_up)):
+                totals[result] += count
+                if count:
+                    NOTIFICATIONS_SENT.inc(count, channel=channel, result=result)
+    return totals
+
+
+def run_once(now=None):
+    """One pass of the worker"""
+    notifications = fan_out()
+    digests = build_digests(now)
+    return {'notifications': notifications, 'digests': digests, **deliver(now)}
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+from notifications.delivery import notification_setting, run_once
+
+
+class Command(BaseCommand):
+    help = 'Fan out issue notifications, build digests and send them through the configured channels'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run a single pass and exit')
+        parser.add_argument('--poll', type=float, help='Seconds between passes (default NOTIFICATIONS POLL_SECONDS)')
+
+    def handle(self, *args, **options):
+        poll = options['poll'] or notification_setting('POLL_SECONDS')
+        while True:
+            counts = run_once()
+            if any(counts.values()) or options['verbosity'] > 1:
+                self.stdout.write(', '.join(f'{name} {count}' for name, count in counts.items()))
+            if options['once']:
+                return
+            time.sleep(poll)
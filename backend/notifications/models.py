@@ -0,0 +1,73 @@
+from django.db import models
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from issues.models import Issue
+
+User = get_user_model()
+
+class NotificationEvent(models.Model):
+    """Something the followers of an issue should hear about; fanned out by the worker"""
+    KIND_CHOICES = [
+        ('admin_response', 'Admin response'),
+        ('issue_update', 'Issue update'),
+    ]
+    
+    issue = models.ForeignKey(Issue, on_delete=models.CASCADE, related_name='notification_events')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    title = models.CharField(max_length=200)
+    message = models.TextField(blank=True)
+    actor = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(blank=True, null=True)
+    fanned_out_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        ordering = ['created_at']
+        indexes = [models.Index(fields=['fanned_out_at', 'created_at'])]
+    
+    def __str__(self):
+        return f"{self.get_kind_display()} on {self.issue_id}"
+
+class Notification(models.Model):
+    """One user's copy of an event"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
+    event = models.ForeignKey(NotificationEvent, on_delete=models.CASCADE, related_name='notifications')
+    digested = models.BooleanField(default=False)
+    read_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        unique_together = ['user', 'event']
+        indexes = [models.Index(fields=['digested', 'user'])]
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.event} for {self.user_id}"
+
+class Digest(models.Model):
+    """A user's pending notifications coalesced into one message on one channel"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notification_digests')
+    channel = models.CharField(max_length=20)
+    address = models.CharField(max_length=254)
+    subject = models.CharField(max_length=200)
+    body = models.TextField()
+    notification_count = models.PositiveIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        indexes = [models.Index(fields=['status', 'channel', 'next_attempt_at'])]
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.channel} digest for {self.address} ({self.status})"
@@ -0,0 +1,23 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from issues.models import AdminResponse, IssueUpdate
+from .models import NotificationEvent
+
+
+@receiver(post_save, sender=AdminResponse)
+def queue_admin_response(sender, instance, created, **kwargs):
+    """One event row per response; the worker fans it out, so the request never scales with the audience"""
+    if created and instance.is_public:
+        NotificationEvent.objects.create(
+            issue_id=instance.issue_id, kind='admin_response', title='New official response',
+            message=instance.message, actor_id=instance.responded_by_id
+        )
+
+
+@receiver(post_save, sender=IssueUpdate)
+def queue_issue_update(sender, instance, created, **kwargs):
+    if created and instance.is_public:
+        NotificationEvent.objects.create(
+            issue_id=instance.issue_id, kind='issue_update', title=instance.title,
+            message=instance.description, actor_id=instance.updated_by_id
+        )
@@ -0,0 +1,164 @@
+from datetime import timedelta
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from issues.models import Issue, IssueUpdate, IssueVote
+from uwazi254_backend import metrics
+from . import backends
+from .delivery import fan_out, run_once
+from .models import NotificationEvent, Notification, Digest
+
+User = get_user_model()
+
+NOTIFICATIONS = {
+    'CHANNELS': {
+        'email': 'notifications.backends.EmailBackend',
+        'sms': 'notifications.backends.LocMemSMSBackend',
+    },
+    'DIGEST_SECONDS': 0,
+    'MAX_ATTEMPTS': 2,
+}
+
+
+class FailingBackend(backends.EmailBackend):
+    def send(self, digests):
+        return {digest.pk: 'SMTP unavailable' for digest in digests}
+
+
+class CrashingBackend(backends.EmailBackend):
+    """The worker process dies mid-send"""
+    def send(self, digests):
+        raise SystemExit
+
+
+def later(seconds=1):
+    return timezone.now() + timedelta(seconds=seconds)
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend', NOTIFICATIONS=NOTIFICATIONS)
+class NotificationTest(APITestCase):
+    def setUp(self):
+        self.submitter = User.objects.create_user(
+            username='submitter', email='submitter@example.com', password='testpass123', phone='0700000001'
+        )
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password='testpass123', role='admin'
+        )
+        self.issue = Issue.objects.create(
+            title='Broken water pipe', description='Leaking for a week', category='water',
+            county='Nairobi', constituency='Kasarani', ward='Mwiki', submitted_by=self.submitter
+        )
+        backends.outbox.clear()
+        metrics.reset()
+    
+    def add_voters(self, count):
+        voters = User.objects.bulk_create([
+            User(username=f'voter{i}', email=f'voter{i}@example.com') for i in range(count)
+        ])
+        IssueVote.objects.bulk_create([IssueVote(issue=self.issue, user=voter, vote_type='up') for voter in voters])
+    
+    def respond(self, issue):
+        self.client.force_authenticate(user=self.admin)
+        return self.client.post(f'/api/issues/{issue.pk}/response/', {'message': 'Crew dispatched'}, format='json')
+    
+    def test_response_cost_is_independent_of_audience(self):
+        other = Issue.objects.create(
+            title='Pothole', description='Deep', category='roads', county='Nairobi',
+            constituency='Kasarani', ward='Mwiki', submitted_by=self.submitter
+        )
+        self.add_voters(200)
+        counts = []
+        for issue in (other, self.issue):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.respond(issue)
+            self.assertEqual(response.status_code, 201)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(NotificationEvent.objects.count(), 2)
+        self.assertFalse(Notification.objects.exists())
+        
+        run_once(now=later())
+        # The submitter and 200 voters; the responding admin is not told about their own response
+        self.assertEqual(Notification.objects.filter(event__issue=self.issue).count(), 201)
+        self.assertEqual(len(mail.outbox), 201)
+    
+    def test_events_are_coalesced_into_one_digest_per_channel(self):
+        self.add_voters(1)
+        self.respond(self.issue)
+        IssueUpdate.objects.create(
+            issue=self.issue, title='Repairs scheduled', description='Monday', updated_by=self.admin
+        )
+        IssueUpdate.objects.create(
+            issue=self.issue, title='Internal', description='Budget', updated_by=self.admin, is_public=False
+        )
+        
+        counts = run_once(now=later())
+        self.assertEqual(counts['notifications'], 4)
+        # One email each for the submitter and the voter, one text for the submitter (the voter has no phone)
+        self.assertEqual(counts['digests'], 3)
+        self.assertEqual(counts['sent'], 3)
+        self.assertEqual(len(mail.outbox), 2)
+        message = next(m for m in mail.outbox if m.to == ['submitter@example.com'])
+        self.assertEqual(message.subject, '2 updates on issues you follow')
+        self.assertIn('Crew dispatched', message.body)
+        self.assertIn('Repairs scheduled', message.body)
+        self.assertNotIn('Budget', message.body)
+        self.assertEqual([sms['to'] for sms in backends.outbox], ['0700000001'])
+        self.assertEqual(metrics.registry.collect()[0][('notifications_sent_total', ('email', 'sent'))], 2)
+        
+        # Nothing is sent twice
+        self.assertEqual(run_once(now=later())['sent'], 0)
+    
+    def test_digests_wait_for_the_digest_window(self):
+        self.respond(self.issue)
+        with self.settings(NOTIFICATIONS={**NOTIFICATIONS, 'DIGEST_SECONDS': 300}):
+            self.assertEqual(run_once(now=later())['digests'], 0)
+            self.assertEqual(run_once(now=later(301))['sent'], 2)
+    
+    def test_failed_deliveries_are_retried_then_given_up(self):
+        channels = {'email': 'notifications.tests.FailingBackend'}
+        with self.settings(NOTIFICATIONS={**NOTIFICATIONS, 'CHANNELS': channels}):
+            self.respond(self.issue)
+            self.assertEqual(run_once(now=later())['retried'], 1)
+            digest = Digest.objects.get()
+            self.assertEqual((digest.status, digest.attempts, digest.last_error), ('pending', 1, 'SMTP unavailable'))
+            
+            # Backed off: not retried until RETRY_SECONDS have passed
+            self.assertEqual(run_once(now=later(30))['retried'], 0)
+            self.assertEqual(run_once(now=later(61))['failed'], 1)
+            self.assertEqual(Digest.objects.get().status, 'failed')
+    
+    def test_work_left_by_a_dead_worker_is_taken_up_after_the_lease(self):
+        self.add_voters(1)
+        self.respond(self.issue)
+        event = NotificationEvent.objects.get()
+        # Claimed by a worker that died after writing the submitter's row
+        NotificationEvent.objects.filter(pk=event.pk).update(claimed_at=timezone.now())
+        Notification.objects.create(user=self.submitter, event=event, created_at=event.created_at)
+        self.assertEqual(fan_out(), 0)
+        
+        NotificationEvent.objects.filter(pk=event.pk).update(claimed_at=timezone.now() - timedelta(seconds=301))
+        # Only the voter's row is new
+        self.assertEqual(fan_out(), 1)
+        self.assertEqual(Notification.objects.count(), 2)
+        
+        channels = {'email': 'notifications.tests.CrashingBackend'}
+        with self.settings(NOTIFICATIONS={**NOTIFICATIONS, 'CHANNELS': channels}):
+            with self.assertRaises(SystemExit):
+                run_once(now=later())
+        # The claim on the digests outlives the crash: not resent until the lease runs out
+        self.assertEqual(run_once(now=later(2))['sent'], 0)
+        self.assertEqual(run_once(now=later(302))['sent'], 2)
+        self.assertEqual(len(mail.outbox), 2)
+    
+    def test_worker_command(self):
+        self.respond(self.issue)
+        with self.settings(NOTIFICATIONS={**NOTIFICATIONS, 'CHANNELS': {'email': 'notifications.backends.EmailBackend'}}):
+            call_command('notification_worker', '--once', stdout=open('/dev/null', 'w'))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['submitter@example.com'])
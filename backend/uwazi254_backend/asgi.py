@@ -2,6 +2,8 @@
 ASGI config for uwazi254_backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Long-lived streams such as /api/analytics/live/ need this entry point, e.g.
+``uvicorn uwazi254_backend.asgi:application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
@@ -0,0 +1,100 @@
+"""
+Async Django views that speak the same JSON as the DRF API.
+
+DRF 3.14 views are synchronous, so the read-heavy endpoints that benefit
+from running on the event loop are written as plain async views wrapped
+with ``async_api_view``. The wrapper authenticates with the configured
+DRF authenticators, turns DRF exceptions into DRF's error bodies, and
+hands other methods and the browsable API to the equivalent DRF view.
+"""
+import functools
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+
+def request_data(request):
+    """JSON or form body as a mapping; None if the JSON is malformed"""
+    if request.content_type == 'application/json':
+        try:
+            return json.loads(request.body or b'{}')
+        except ValueError:
+            return None
+    return request.POST
+
+
+def wants_browsable_api(request):
+    return request.GET.get('format') == 'api' or 'text/html' in request.headers.get('Accept', '')
+
+
+def _authenticate(request):
+    for authenticator_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        result = authenticator_class().authenticate(request)
+        if result is not None:
+            return result
+    return None
+
+
+async def aauthenticate(request):
+    """Set ``request.user``/``request.auth`` like DRF; bad credentials raise AuthenticationFailed"""
+    result = None
+    if getattr(request, '_force_auth_user', None) is not None:
+        # APIClient.force_authenticate, as DRF's Request honours it
+        result = (request._force_auth_user, getattr(request, '_force_auth_token', None))
+    elif 'HTTP_AUTHORIZATION' in request.META:
+        result = await sync_to_async(_authenticate)(request)
+    request.user, request.auth = result or (AnonymousUser(), None)
+
+
+def drf_request(request):
+    """DRF Request around an authenticated Django request, for filter backends and pagination"""
+    wrapped = Request(request)
+    wrapped.user = request.user
+    wrapped.auth = request.auth
+    return wrapped
+
+
+def api_response(data, status=status.HTTP_200_OK):
+    renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+    return HttpResponse(renderer.render(data), status=status, content_type=renderer.media_type)
+
+
+def error_response(request, exc):
+    """DRF's default exception handler, for APIException"""
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    response = api_response(data, status=exc.status_code)
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        authenticators = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+        challenge = authenticators[0]().authenticate_header(request) if authenticators else None
+        if challenge:
+            response['WWW-Authenticate'] = challenge
+        else:
+            # Like DRF: without a challenge the client gets 403
+            response.status_code = status.HTTP_403_FORBIDDEN
+    return response
+
+
+def async_api_view(fallback, methods=('GET', 'HEAD')):
+    """Serve ``methods`` with the decorated async view and everything else
+    (other methods, the browsable API) with ``fallback``, a sync DRF view"""
+    fallback = sync_to_async(fallback)
+
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods or wants_browsable_api(request):
+                return await fallback(request, *args, **kwargs)
+            try:
+                await aauthenticate(request)
+                return await view(request, *args, **kwargs)
+            except exceptions.APIException as exc:
+                return error_response(request, exc)
+        # Token-authenticated like the DRF views, which are csrf_exempt too
+        wrapper.csrf_exempt = True
+        return wrapper
+    return decorator
@@ -0,0 +1,296 @@
+"""
+Endpoint benchmark suite: query counts, latency percentiles and response sizes.
+
+Every endpoint declares a query budget. ``run_suite`` drives the full
+middleware stack with the Django test client against whatever database
+is active (a throwaway one from ``scratch_database`` when run from the
+``benchmark_api`` command), and ``compare`` reports budget overruns and
+regressions against a stored baseline.
+"""
+import json
+import os
+import platform
+import shutil
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+DEFAULT_TOLERANCE = 0.25
+
+# Latency changes smaller than this are treated as noise (milliseconds)
+DEFAULT_MIN_DELTA_MS = 2.0
+
+
+class Endpoint:
+    def __init__(self, name, path, budget, method='GET', data=None, auth=False):
+        self.name = name
+        self.path = path
+        self.budget = budget
+        self.method = method
+        self.data = data
+        self.auth = auth
+
+
+# Paths are formatted with the fixture returned by ``pick_fixture``. Budgets
+# are today's counts, so any added query fails the check; tighten them as
+# endpoints improve.
+ENDPOINTS = [
+    # Version, count, page and three prefetches; user_vote adds one per row when signed in
+    Endpoint('issue-list', '/api/issues/', budget=6),
+    Endpoint('issue-list-auth', '/api/issues/', budget=26, auth=True),
+    # Map pins: no relations, no user_vote, five columns
+    Endpoint('issue-list-map', '/api/issues/?fields=id,latitude,longitude,category,status', budget=3),
+    Endpoint('issue-list-cards', '/api/issues/?expand=submitted_by', budget=3, auth=True),
+    Endpoint('issue-search', '/api/issues/?search={search}', budget=6),
+    Endpoint('issue-filter', '/api/issues/?county={county}&category=roads', budget=6),
+    # Served from the detail cache after the warm-up request; user_vote is per user
+    Endpoint('issue-detail', '/api/issues/{issue}/', budget=0),
+    Endpoint('issue-detail-auth', '/api/issues/{issue}/', budget=1, auth=True),
+    Endpoint('issue-vote', '/api/issues/{issue}/vote/', budget=6, method='POST',
+             data={'vote_type': 'up'}, auth=True),
+    Endpoint('my-issues', '/api/issues/my-issues/', budget=25, auth=True),
+    # Feed rows, three area lists, the page and three prefetches; user_vote adds one per row
+    Endpoint('area-feed', '/api/issues/feed/', budget=28, auth=True),
+    Endpoint('analytics-dashboard', '/api/analytics/dashboard/', budget=6),
+    Endpoint('analytics-counties', '/api/analytics/counties/', budget=2),
+    Endpoint('analytics-county', '/api/analytics/counties/?county={county}', budget=2),
+    Endpoint('analytics-categories', '/api/analytics/categories/', budget=2),
+    # Two COUNTs per day of the 30-day window
+    Endpoint('analytics-trends', '/api/analytics/trends/', budget=63),
+    Endpoint('analytics-cube', '/api/analytics/cube/?group_by=county,category', budget=1),
+    Endpoint('analytics-heatmap', '/api/analytics/heatmap/?bins=50', budget=1),
+    Endpoint('analytics-snapshots', '/api/analytics/snapshots/', budget=1),
+    Endpoint('analytics-county-stats', '/api/analytics/county-stats/', budget=1),
+    Endpoint('analytics-category-stats', '/api/analytics/category-stats/', budget=1),
+    Endpoint('analytics-alerts', '/api/analytics/alerts/', budget=1),
+    Endpoint('geo-counties', '/api/auth/counties/?all=true', budget=1),
+    Endpoint('geo-constituencies', '/api/auth/constituencies/?county={county_id}', budget=2),
+    Endpoint('geo-wards', '/api/auth/wards/?constituency={constituency_id}', budget=2),
+    Endpoint('geo-tree', '/api/auth/geography/', budget=3),
+]
+
+
+@contextmanager
+def scratch_database(verbosity=0, file_backed=False):
+    """Run against a freshly created test database, destroyed afterwards.
+
+    SQLite test databases are in-memory by default; ``file_backed`` puts
+    them in a temporary file so concurrent connections lock like production.
+    """
+    test_settings = connection.settings_dict.setdefault('TEST', {})
+    original_test_name = test_settings.get('NAME')
+    workdir = None
+    if file_backed and connection.vendor == 'sqlite':
+        workdir = tempfile.mkdtemp(prefix='uwazi254-scratch-')
+        test_settings['NAME'] = os.path.join(workdir, 'scratch.sqlite3')
+    old_name = connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+        test_settings['NAME'] = original_test_name
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def prepare_dataset(users, issues, votes, seed=254, end=None):
+    """Load the bundled boundaries and write a synthetic dataset inline"""
+    from accounts.boundaries import DEFAULT_FILE, load_boundaries, read_rows
+    from accounts.models import User
+    from issues.feeds import rebuild
+    from issues.models import Issue
+    from issues.synthetic import build_plan, chunk_count, next_id, write_chunk
+
+    load_boundaries(read_rows(DEFAULT_FILE))
+    plan = build_plan(seed, users, issues, votes, end=end)
+    plan.update(user_base=next_id(User), issue_base=next_id(Issue), password='!')
+    for kind in ('users', 'issues', 'votes'):
+        for chunk in range(chunk_count(plan, 'users' if kind == 'users' else 'issues')):
+            write_chunk(plan, kind, chunk)
+    rebuild()
+    return plan
+
+
+def pick_fixture():
+    """Stable IDs and terms the endpoint paths are formatted with"""
+    from accounts.models import Constituency, User
+    from issues.feeds import area_feed_setting
+    from issues.models import Issue
+
+    issue = Issue.objects.order_by('-upvotes', 'id').first()
+    active_counties = Issue.objects.filter(status__in=area_feed_setting('STATUSES')).values('county')
+    # A reporter whose area feed is not empty
+    user = (
+        User.objects.filter(submitted_issues__isnull=False, county__in=active_counties).order_by('id').first()
+        or User.objects.filter(submitted_issues__isnull=False).order_by('id').first()
+        or User.objects.order_by('id').first()
+    )
+    constituency = Constituency.objects.filter(wards__isnull=False).order_by('id').first()
+    return {
+        'issue': issue.pk if issue else 0,
+        'county': issue.county if issue else 'Nairobi',
+        'search': issue.ward if issue else 'water',
+        'county_id': constituency.county_id if constituency else 0,
+        'constituency_id': constituency.pk if constituency else 0,
+        'user': user,
+    }
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def measure(client, endpoint, fixture, headers, repeat, warmup=1):
+    """Query count of a warm request plus latency/size over ``repeat`` requests"""
+    path = endpoint.path.format(**fixture)
+    kwargs = dict(headers if endpoint.auth else {})
+
+    def request():
+        if endpoint.method == 'POST':
+            return client.post(path, endpoint.data or {}, content_type='application/json', **kwargs)
+        return client.get(path, **kwargs)
+
+    for _ in range(warmup):
+        request()
+    with CaptureQueriesContext(connection) as queries:
+        response = request()
+    # Read now: later requests reset the connection's query log
+    query_count = len(queries)
+
+    timings = []
+    size = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = request()
+        size = len(b''.join(response)) if response.streaming else len(response.content)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return {
+        'status': response.status_code,
+        'queries': query_count,
+        'budget': endpoint.budget,
+        'p50_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'bytes': size,
+    }
+
+
+def run_suite(repeat=20, only=None, meta=None):
+    """Measure every endpoint (or those named in ``only``) and return the results dict"""
+    from accounts.tokens import UserRefreshToken
+
+    fixture = pick_fixture()
+    headers = {}
+    if fixture['user'] is not None:
+        token = UserRefreshToken.for_user(fixture['user']).access_token
+        headers['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+
+    client = Client()
+    results = {}
+    for endpoint in ENDPOINTS:
+        if only and endpoint.name not in only:
+            continue
+        results[endpoint.name] = measure(client, endpoint, fixture, headers, repeat)
+
+    return {
+        'meta': {
+            'created_at': datetime.now(dt_timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'database': connection.vendor,
+            'repeat': repeat,
+            **(meta or {}),
+        },
+        'endpoints': results,
+    }
+
+
+def compare(results, baseline=None, tolerance=DEFAULT_TOLERANCE, min_delta_ms=DEFAULT_MIN_DELTA_MS):
+    """List of human-readable failures: budget overruns, errors and regressions"""
+    failures = []
+    previous = (baseline or {}).get('endpoints', {})
+    for name, current in results['endpoints'].items():
+        # A 401 or 404 page costs few queries and would pass the budgets unnoticed
+        if current['status'] >= 400:
+            failures.append(f"{name}: HTTP {current['status']}")
+        if current['queries'] > current['budget']:
+            failures.append(f"{name}: {current['queries']} queries exceeds budget of {current['budget']}")
+
+        old = previous.get(name)
+        if old is None:
+            continue
+        if current['status'] != old['status']:
+            failures.append(f"{name}: status changed from {old['status']} to {current['status']}")
+        if current['queries'] > old['queries']:
+            failures.append(f"{name}: queries rose from {old['queries']} to {current['queries']}")
+        limit = old['p95_ms'] * (1 + tolerance)
+        if current['p95_ms'] > limit and current['p95_ms'] - old['p95_ms'] > min_delta_ms:
+            failures.append(
+                f"{name}: p95 {current['p95_ms']:.1f}ms regressed from {old['p95_ms']:.1f}ms "
+                f'(tolerance {tolerance:.0%})'
+            )
+    return failures
+
+
+def _median_ms(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(timings), 3), result
+
+
+def payload_benchmark(page_size=100, repeat=50):
+    """Render time per JSON renderer and wire size per content encoding for one issue-list page"""
+    from django.contrib.auth.models import AnonymousUser
+    from django.test import RequestFactory
+    from rest_framework.renderers import JSONRenderer
+    from issues.models import Issue
+    from issues.serializers import IssueSerializer
+    from issues.serializers import issue_lookups
+    from .compression import available_encodings, compress
+    from .renderers import FastJSONRenderer, orjson
+
+    _, select, prefetch = issue_lookups(None)
+    issues = list(
+        Issue.objects.select_related(*select).prefetch_related(*prefetch)
+        .order_by('-created_at')[:page_size]
+    )
+    request = RequestFactory().get('/api/issues/')
+    request.user = AnonymousUser()
+    data = {
+        'count': Issue.objects.count(), 'next': None, 'previous': None,
+        'results': IssueSerializer(issues, many=True, context={'request': request}).data,
+    }
+
+    renderers = {'drf': JSONRenderer()}
+    if orjson is not None:
+        renderers['orjson'] = FastJSONRenderer()
+    rendered = {}
+    for name, renderer in renderers.items():
+        ms, body = _median_ms(lambda: renderer.render(data), repeat)
+        rendered[name] = {'render_ms': ms, 'bytes': len(body)}
+
+    body = JSONRenderer().render(data)
+    encodings = {'identity': {'compress_ms': 0.0, 'bytes': len(body)}}
+    for encoding in available_encodings():
+        ms, compressed = _median_ms(lambda: compress(body, encoding), repeat)
+        encodings[encoding] = {'compress_ms': ms, 'bytes': len(compressed)}
+    return {'issues': len(issues), 'renderers': rendered, 'encodings': encodings}
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_results(results, path):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
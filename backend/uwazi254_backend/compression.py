@@ -0,0 +1,119 @@
+"""
+Response compression negotiated from ``Accept-Encoding``.
+
+``CompressionMiddleware`` brotli- or gzip-compresses text and JSON
+responses of at least ``MIN_SIZE`` bytes. Levels favour speed over ratio
+because bodies are compressed on every request; precompressed responses
+(e.g. the geography tree) already carry ``Content-Encoding`` and pass
+through untouched. Like Django's GZipMiddleware, strong ETags are
+weakened since the bytes on the wire now differ per encoding.
+
+Responses that echo credentials (login, register) are excluded by path:
+compressing secrets next to attacker-controlled input enables BREACH.
+"""
+import gzip
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from .instrumentation import timed
+
+try:
+    import brotli
+except ImportError:  # Optional: only gzip is offered without it
+    brotli = None
+
+DEFAULTS = {
+    'ENABLED': True,
+    'MIN_SIZE': 1024,
+    'GZIP_LEVEL': 6,
+    'BROTLI_QUALITY': 4,
+    'CONTENT_TYPES': ['application/json', 'text/', 'application/javascript', 'image/svg+xml'],
+    'EXCLUDE_PATHS': ['/api/auth/login/', '/api/auth/register/'],
+}
+
+
+def compression_setting(name):
+    return getattr(settings, 'COMPRESSION', {}).get(name, DEFAULTS[name])
+
+
+def available_encodings():
+    """Supported encodings, most preferred first"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate(accept_encoding, available):
+    """First of ``available`` the client accepts, or '' for identity"""
+    accepted = set()
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        q = params.strip()
+        if q.startswith('q='):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip().lower())
+    for encoding in available:
+        if encoding in accepted or '*' in accepted:
+            return encoding
+    return ''
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=compression_setting('BROTLI_QUALITY'))
+    # mtime=0 keeps identical bodies byte-identical
+    return gzip.compress(body, compresslevel=compression_setting('GZIP_LEVEL'), mtime=0)
+
+
+def is_compressible(request, response):
+    if response.streaming or response.has_header('Content-Encoding'):
+        return False
+    content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+    if not any(content_type.startswith(prefix) for prefix in compression_setting('CONTENT_TYPES')):
+        return False
+    return not any(request.path.startswith(path) for path in compression_setting('EXCLUDE_PATHS'))
+
+
+def compress_response(request, response):
+    if not compression_setting('ENABLED') or not is_compressible(request, response):
+        return response
+    # The representation depends on Accept-Encoding even when sent uncompressed
+    patch_vary_headers(response, ['Accept-Encoding'])
+    if len(response.content) < compression_setting('MIN_SIZE'):
+        return response
+    encoding = negotiate(request.headers.get('Accept-Encoding', ''), available_encodings())
+    if not encoding:
+        return response
+
+    with timed('compress'):
+        compressed = compress(response.content, encoding)
+    if len(compressed) >= len(response.content):
+        return response
+    response.content = compressed
+    response['Content-Length'] = str(len(compressed))
+    response['Content-Encoding'] = encoding
+    etag = response.get('ETag')
+    if etag and etag.startswith('"'):
+        response['ETag'] = 'W/' + etag
+    return response
+
+
+class CompressionMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return compress_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return compress_response(request, await self.get_response(request))
@@ -0,0 +1,31 @@
+"""
+SQLite backend with per-connection pragmas and IMMEDIATE transactions.
+
+OPTIONS accepts two keys on top of the sqlite3.connect() arguments:
+``pragmas`` (a mapping applied on every new connection) and
+``transaction_mode`` ('IMMEDIATE' takes the write lock at BEGIN, so two
+transactions can't deadlock upgrading from read to write locks, which
+sqlite reports as "database is locked" without waiting for busy_timeout).
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        kwargs.pop('pragmas', None)
+        kwargs.pop('transaction_mode', None)
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.settings_dict['OPTIONS'].get('pragmas', {}).items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        mode = self.settings_dict['OPTIONS'].get('transaction_mode')
+        if mode:
+            self.cursor().execute(f'BEGIN {mode}')
+        else:
+            super()._start_transaction_under_autocommit()
@@ -0,0 +1,72 @@
+"""
+Database profiles selected with the DATABASE_PROFILE environment variable.
+
+- ``sqlite``: development default, a plain SQLite file.
+- ``sqlite-production``: WAL journaling, synchronous=NORMAL, busy_timeout,
+  mmap and a larger page cache, IMMEDIATE transactions and persistent
+  connections.
+- ``postgres``: DATABASE_URL, persistent connections with health checks;
+  set DATABASE_POOLER=pgbouncer when connecting through a transaction pooler.
+"""
+from urllib.parse import unquote, urlparse
+
+SQLITE_PRODUCTION_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,            # ms to wait for a lock instead of failing
+    'mmap_size': 268435456,          # 256 MiB of memory-mapped reads
+    'cache_size': -65536,            # 64 MiB page cache (negative = KiB)
+    'temp_store': 'MEMORY',
+}
+
+
+def sqlite_database(name, production=False, conn_max_age=600):
+    database = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+    }
+    if production:
+        database.update({
+            'ENGINE': 'uwazi254_backend.db_backends.sqlite3',
+            'CONN_MAX_AGE': conn_max_age,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'timeout': 5,
+                'transaction_mode': 'IMMEDIATE',
+                'pragmas': dict(SQLITE_PRODUCTION_PRAGMAS),
+            },
+        })
+    return database
+
+
+def postgres_database(url, conn_max_age=600, pooler=None):
+    parsed = urlparse(url)
+    database = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': parsed.path.lstrip('/'),
+        'USER': unquote(parsed.username or ''),
+        'PASSWORD': unquote(parsed.password or ''),
+        'HOST': parsed.hostname or '',
+        'PORT': str(parsed.port or ''),
+        'CONN_MAX_AGE': conn_max_age,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'connect_timeout': 5,
+            'keepalives': 1,
+            'keepalives_idle': 30,
+        },
+    }
+    if pooler == 'pgbouncer':
+        # Transaction pooling can't keep named cursors across transactions
+        database['DISABLE_SERVER_SIDE_CURSORS'] = True
+    return database
+
+
+def database_settings(profile, base_dir, url='', conn_max_age=600, pooler=None):
+    if profile == 'sqlite':
+        return sqlite_database(base_dir / 'db.sqlite3')
+    if profile == 'sqlite-production':
+        return sqlite_database(base_dir / 'db.sqlite3', production=True, conn_max_age=conn_max_age)
+    if profile == 'postgres':
+        return postgres_database(url, conn_max_age=conn_max_age, pooler=pooler)
+    raise ValueError(f"Unknown DATABASE_PROFILE '{profile}'")
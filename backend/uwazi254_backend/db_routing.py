@@ -0,0 +1,212 @@
+"""
+Read-replica routing.
+
+``ReplicaRoutingMiddleware`` decides per request whether reads may go to a
+replica and stores the chosen alias in a context variable that
+``ReplicaRouter`` consults. Writes always go to ``default``. After a write,
+the client is pinned to the primary for ``PIN_SECONDS`` so it reads its own
+writes, and replicas lagging more than ``MAX_LAG_SECONDS`` are skipped.
+
+The pin travels three ways, since any worker may serve the next read:
+- a ``PIN_HEADER`` response header carrying the pin's expiry (Unix time),
+  which cross-origin clients echo back on their next requests (cookies
+  are not sent on the SPA's cross-site API calls);
+- a cookie, for same-site browsers;
+- an entry in the default cache keyed by the Authorization header, for
+  clients that echo neither.
+
+Only the cache entry covers clients that don't echo the header (the SPA
+doesn't), and it only reaches other workers through a shared cache, so
+the middleware refuses to start with replicas configured over
+``LocMemCache``; set ``CACHE=redis`` or ``file``.
+"""
+import hashlib
+import random
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+
+PRIMARY = 'default'
+
+DEFAULTS = {
+    'READ_PATHS': ['/api/analytics/'],
+    'ANONYMOUS_READ_PATHS': ['/api/issues/', '/api/auth/counties/',
+                             '/api/auth/constituencies/', '/api/auth/wards/',
+                             '/api/auth/geography/'],
+    'PIN_SECONDS': 5,
+    'PIN_COOKIE': 'uwazi_db_pin',
+    'PIN_HEADER': 'X-DB-Pin',
+    'MAX_LAG_SECONDS': 10,
+    'LAG_CHECK_SECONDS': 5,
+}
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_read_alias = ContextVar('read_alias', default=None)
+
+# alias -> (checked_at, lag_seconds)
+_lag_cache = {}
+
+
+def routing_setting(name):
+    return getattr(settings, 'REPLICA_ROUTING', {}).get(name, DEFAULTS[name])
+
+
+def replicas():
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+def replica_lag(alias):
+    """Replication lag in seconds; infinite if the replica cannot be reached"""
+    checked_at, lag = _lag_cache.get(alias, (None, None))
+    now = time.monotonic()
+    if checked_at is not None and now - checked_at < routing_setting('LAG_CHECK_SECONDS'):
+        return lag
+
+    try:
+        connection = connections[alias]
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # The last replayed transaction ages while the primary is idle, so only
+                # count its age when WAL has been received but not yet replayed
+                cursor.execute(
+                    'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+                    'ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END'
+                )
+                lag = float(cursor.fetchone()[0])
+            else:
+                # No replication metadata (e.g. SQLite copies); reachable means fresh
+                cursor.execute('SELECT 1')
+                lag = 0.0
+    except Exception:
+        lag = float('inf')
+
+    _lag_cache[alias] = (now, lag)
+    return lag
+
+
+def healthy_replica():
+    """A random replica within the lag budget, or None"""
+    max_lag = routing_setting('MAX_LAG_SECONDS')
+    candidates = [alias for alias in replicas() if replica_lag(alias) <= max_lag]
+    return random.choice(candidates) if candidates else None
+
+
+def _pin_key(request):
+    auth = request.META.get('HTTP_AUTHORIZATION')
+    if not auth:
+        return None
+    return 'db-pin:' + hashlib.sha256(auth.encode()).hexdigest()
+
+
+def _header_pinned(request):
+    try:
+        expires = float(request.headers.get(routing_setting('PIN_HEADER'), ''))
+    except ValueError:
+        return False
+    now = time.time()
+    # Expiries further out than a pin lasts are not ones we issued
+    return now < expires <= now + routing_setting('PIN_SECONDS')
+
+
+def is_pinned(request):
+    if request.COOKIES.get(routing_setting('PIN_COOKIE')) or _header_pinned(request):
+        return True
+    key = _pin_key(request)
+    return bool(key and cache.get(key))
+
+
+def read_alias_for(request):
+    """Database alias this request's reads should use"""
+    if not replicas() or request.method not in SAFE_METHODS or is_pinned(request):
+        return PRIMARY
+
+    path = request.path
+    if any(path.startswith(prefix) for prefix in routing_setting('READ_PATHS')):
+        return healthy_replica() or PRIMARY
+    if 'HTTP_AUTHORIZATION' not in request.META and any(
+        path.startswith(prefix) for prefix in routing_setting('ANONYMOUS_READ_PATHS')
+    ):
+        return healthy_replica() or PRIMARY
+    return PRIMARY
+
+
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if replicas() and isinstance(caches['default'], LocMemCache):
+            # Another worker would serve the read after a write from a stale replica
+            raise ImproperlyConfigured(
+                'Replica routing needs a cache shared by the worker processes for read-your-writes pins; '
+                'set CACHE=redis or CACHE=file'
+            )
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        alias = read_alias_for(request)
+        request.db_alias = alias
+        token = _read_alias.set(alias)
+        try:
+            response = self.get_response(request)
+        finally:
+            _read_alias.reset(token)
+
+        if self.should_pin(request, response):
+            self.pin(request, response)
+        return response
+
+    async def __acall__(self, request):
+        # Lag checks and pins touch the database and cache; only pay for the thread hop with replicas
+        alias = await sync_to_async(read_alias_for)(request) if replicas() else PRIMARY
+        request.db_alias = alias
+        token = _read_alias.set(alias)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _read_alias.reset(token)
+
+        if self.should_pin(request, response):
+            await sync_to_async(self.pin)(request, response)
+        return response
+
+    def should_pin(self, request, response):
+        return request.method not in SAFE_METHODS and response.status_code < 400 and replicas()
+
+    def pin(self, request, response):
+        # Read-your-writes: keep this client on the primary for a short window
+        seconds = routing_setting('PIN_SECONDS')
+        response[routing_setting('PIN_HEADER')] = f'{time.time() + seconds:.3f}'
+        response.set_cookie(
+            routing_setting('PIN_COOKIE'), '1', max_age=seconds,
+            httponly=True, samesite='Lax'
+        )
+        key = _pin_key(request)
+        if key:
+            cache.set(key, True, seconds)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive schema changes through replication
+        return db not in replicas()
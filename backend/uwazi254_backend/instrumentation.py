@@ -0,0 +1,335 @@
+"""
+Per-request timing instrumentation.
+
+``RequestTimingMiddleware`` records the query count and database time,
+the view time and the time spent rendering serializer output for every
+request, and reports them in a ``Server-Timing`` header. Requests slower
+than ``SLOW_REQUEST_MS`` are logged to ``uwazi254.slow_requests`` with
+their SQL, duplicate-query fingerprints and EXPLAIN plans of the slowest
+statements.
+
+A cProfile session can be switched on for path prefixes at runtime (see
+the ``profile_requests`` command); the flag lives in the cache and is
+polled every ``PROFILE_POLL_SECONDS``, so an idle profiler costs one
+clock read per request. Switching it across worker processes needs a
+shared cache backend, so the command refuses to run against LocMemCache.
+"""
+import cProfile
+import io
+import logging
+import os
+import pstats
+import random
+import re
+import time
+import uuid
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from rest_framework.renderers import JSONRenderer
+
+DEFAULTS = {
+    'ENABLED': True,
+    'SERVER_TIMING': True,
+    'SLOW_REQUEST_MS': 1000,
+    # SQL statements kept per request for the slow-request log
+    'MAX_QUERIES': 200,
+    'EXPLAIN_SLOWEST': 3,
+    'PROFILE_POLL_SECONDS': 5,
+    'PROFILE_DIR': None,
+    'PROFILE_TOP': 30,
+}
+
+PROFILE_KEY = 'instrumentation:profile'
+
+logger = logging.getLogger('uwazi254.slow_requests')
+profile_logger = logging.getLogger('uwazi254.profile')
+
+_current = ContextVar('request_timings', default=None)
+
+
+def instrumentation_setting(name):
+    return getattr(settings, 'REQUEST_INSTRUMENTATION', {}).get(name, DEFAULTS[name])
+
+
+class RequestTimings:
+    """Accumulates the measurements of one request"""
+
+    def __init__(self, max_queries, request_id='', method='', path=''):
+        self.request_id = request_id
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        self.view_started = None
+        self.query_count = 0
+        self.query_time = 0.0
+        self.queries = []
+        self.max_queries = max_queries
+        self.phases = defaultdict(float)
+
+    def add_query(self, alias, sql, params, many, elapsed):
+        self.query_count += 1
+        self.query_time += elapsed
+        if len(self.queries) < self.max_queries:
+            self.queries.append((alias, sql, params, many, elapsed))
+
+
+def current_timings():
+    return _current.get()
+
+
+_REQUEST_ID = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+
+def request_id(request):
+    """The caller's X-Request-ID if well-formed, else a new one"""
+    supplied = request.headers.get('X-Request-ID', '')
+    return supplied if _REQUEST_ID.match(supplied) else uuid.uuid4().hex
+
+
+@contextmanager
+def timed(phase):
+    """Add the block's duration to ``phase`` of the current request, if any"""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.phases[phase] += time.perf_counter() - start
+
+
+def record_query(execute, sql, params, many, context):
+    """Connection execute wrapper; a no-op outside instrumented requests"""
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add_query(context['connection'].alias, sql, params, many, time.perf_counter() - start)
+
+
+def install(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@receiver(connection_created)
+def install_on_connect(sender, connection, **kwargs):
+    install(connection)
+
+
+class InstrumentedJSONRenderer(JSONRenderer):
+    """JSON renderer that reports its time as the ``serialize`` phase"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed('serialize'):
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+_NUMBER = re.compile(r'\b\d+(\.\d+)?\b')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_IN_LIST = re.compile(r'\bIN \((?:%s|\?)(?:, (?:%s|\?))*\)', re.IGNORECASE)
+
+
+def fingerprint(sql):
+    """SQL with literals and IN-list lengths collapsed, for spotting N+1 patterns"""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return ' '.join(sql.split())
+
+
+def duplicate_queries(queries):
+    """``[(count, fingerprint)]`` of statements run more than once, most frequent first"""
+    counts = Counter(fingerprint(sql) for _, sql, _, _, _ in queries)
+    return [(count, sql) for sql, count in counts.most_common() if count > 1]
+
+
+def explain(alias, sql, params):
+    connection = connections[alias]
+    prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+    except Exception as e:
+        return f'EXPLAIN failed: {e}'
+
+
+def server_timing(timings, total):
+    metrics = [
+        f'db;dur={timings.query_time * 1000:.1f};desc="{timings.query_count} queries"',
+    ]
+    for phase, elapsed in sorted(timings.phases.items()):
+        metrics.append(f'{phase};dur={elapsed * 1000:.1f}')
+    if timings.view_started is not None:
+        # Serializing and compressing happen after the view starts; report them separately
+        view = time.perf_counter() - timings.view_started - sum(timings.phases.values())
+        metrics.append(f'view;dur={max(view, 0.0) * 1000:.1f}')
+    metrics.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(metrics)
+
+
+def log_slow_request(request, response, timings, total):
+    lines = [
+        f'Slow request: {request.method} {request.get_full_path()} -> {response.status_code} '
+        f'in {total * 1000:.0f}ms ({timings.query_count} queries, {timings.query_time * 1000:.0f}ms in SQL)'
+    ]
+    duplicates = duplicate_queries(timings.queries)
+    if duplicates:
+        lines.append('Duplicate queries:')
+        lines.extend(f'  {count}x {sql}' for count, sql in duplicates[:10])
+
+    lines.append('SQL:')
+    lines.extend(f'  [{alias} {elapsed * 1000:.1f}ms] {sql}' for alias, sql, _, _, elapsed in timings.queries)
+    if timings.query_count > len(timings.queries):
+        lines.append(f'  ... {timings.query_count - len(timings.queries)} more')
+
+    slowest = sorted(
+        (query for query in timings.queries
+         if not query[3] and query[1].lstrip().upper().startswith('SELECT')),
+        key=lambda query: query[4], reverse=True
+    )[:instrumentation_setting('EXPLAIN_SLOWEST')]
+    for alias, sql, params, _, elapsed in slowest:
+        lines.append(f'EXPLAIN ({elapsed * 1000:.1f}ms) {sql}')
+        lines.append(explain(alias, sql, params))
+    logger.warning('\n'.join(lines))
+
+
+# Profiler switch, refreshed from the cache at most every PROFILE_POLL_SECONDS
+_profile_state = {'checked_at': None, 'config': None}
+
+
+def enable_profiling(paths, sample_rate=1.0, seconds=600):
+    cache.set(PROFILE_KEY, {'paths': list(paths), 'sample_rate': sample_rate}, seconds)
+    _profile_state['checked_at'] = None
+
+
+def disable_profiling():
+    cache.delete(PROFILE_KEY)
+    _profile_state['checked_at'] = None
+
+
+def profiling_config():
+    now = time.monotonic()
+    checked_at = _profile_state['checked_at']
+    if checked_at is None or now - checked_at >= instrumentation_setting('PROFILE_POLL_SECONDS'):
+        _profile_state['config'] = cache.get(PROFILE_KEY)
+        _profile_state['checked_at'] = now
+    return _profile_state['config']
+
+
+def should_profile(request):
+    config = profiling_config()
+    if not config or not any(request.path.startswith(prefix) for prefix in config['paths']):
+        return False
+    return random.random() < config.get('sample_rate', 1.0)
+
+
+def report_profile(request, profile):
+    stream = io.StringIO()
+    stats = pstats.Stats(profile, stream=stream).sort_stats('cumulative')
+    stats.print_stats(instrumentation_setting('PROFILE_TOP'))
+    profile_logger.info('Profile of %s %s\n%s', request.method, request.path, stream.getvalue())
+
+    directory = instrumentation_setting('PROFILE_DIR')
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        name = re.sub(r'[^A-Za-z0-9]+', '_', request.path).strip('_') or 'root'
+        stats.dump_stats(os.path.join(directory, f'{name}-{time.time():.0f}-{os.getpid()}.prof'))
+
+
+@receiver(setting_changed)
+def reset_profiling_state(setting, **kwargs):
+    if setting == 'REQUEST_INSTRUMENTATION':
+        _profile_state['checked_at'] = None
+
+
+class RequestTimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not instrumentation_setting('ENABLED'):
+            return self.get_response(request)
+
+        timings, token, profile = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            self.stop(token, profile)
+        return self.finish(request, response, timings, profile)
+
+    async def __acall__(self, request):
+        if not instrumentation_setting('ENABLED'):
+            return await self.get_response(request)
+
+        # Under ASGI a profile also covers other requests interleaved on the event loop
+        timings, token, profile = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.stop(token, profile)
+        # Slow-request EXPLAINs query the database
+        return await sync_to_async(self.finish)(request, response, timings, profile)
+
+    def start(self, request):
+        # Connections opened before this module was imported miss the signal
+        for connection in connections.all(initialized_only=True):
+            install(connection)
+
+        timings = RequestTimings(
+            instrumentation_setting('MAX_QUERIES'), request_id(request), request.method, request.path
+        )
+        request.timings = timings
+        token = _current.set(timings)
+        profile = None
+        if should_profile(request):
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # Another profiler is active in this process
+                profile = None
+        return timings, token, profile
+
+    def stop(self, token, profile):
+        if profile is not None:
+            profile.disable()
+        _current.reset(token)
+
+    def finish(self, request, response, timings, profile):
+        total = time.perf_counter() - timings.started
+        response['X-Request-ID'] = timings.request_id
+        if instrumentation_setting('SERVER_TIMING'):
+            response['Server-Timing'] = server_timing(timings, total)
+        if total * 1000 >= instrumentation_setting('SLOW_REQUEST_MS'):
+            log_slow_request(request, response, timings, total)
+        if profile is not None:
+            report_profile(request, profile)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = _current.get()
+        if timings is not None:
+            timings.view_started = time.perf_counter()
@@ -0,0 +1,299 @@
+"""
+In-process soak/load harness for concurrent reads and writes.
+
+Worker threads (WSGI mode) each drive the app through the full middleware
+stack with their own test client; in ASGI mode asyncio tasks call the
+real ASGI application, so every request gets its own thread for sync work
+as under uvicorn or daphne. Actions are picked from a weighted traffic
+mix. Votes concentrate on one "viral"
+issue to provoke write contention. At the end the harness reports
+throughput, latency percentiles, database lock errors and any drift
+between the Issue vote counters and the IssueVote rows.
+"""
+import asyncio
+import json
+import logging
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.core.asgi import get_asgi_application
+from django.core.signals import got_request_exception
+from django.db import connections
+from django.db.models import Count, F, Q
+from django.test import Client
+from issues.models import Issue
+from .benchmarking import percentile
+
+DEFAULT_MIX = {'browse': 40, 'search': 15, 'vote': 25, 'submit': 10, 'dashboard': 10}
+
+ACTIONS = ('browse', 'search', 'vote', 'submit', 'dashboard', 'categorize')
+
+# Substrings of database errors caused by lock contention (SQLite and PostgreSQL)
+LOCK_ERRORS = ('database is locked', 'database table is locked', 'deadlock detected',
+               'could not serialize access', 'lock timeout')
+
+SEARCH_TERMS = ['water', 'road', 'school', 'lights', 'sewer', 'clinic']
+
+
+def parse_mix(value):
+    """``browse=40,vote=30`` -> weights dict; unknown actions are rejected"""
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in ACTIONS:
+            raise ValueError(f"Unknown action '{name}' (choose from {', '.join(ACTIONS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def counter_drift():
+    """Issues whose upvotes/downvotes differ from their IssueVote rows"""
+    drifted = (
+        Issue.objects
+        .annotate(up=Count('votes', filter=Q(votes__vote_type='up')),
+                  down=Count('votes', filter=Q(votes__vote_type='down')))
+        .exclude(upvotes=F('up'), downvotes=F('down'))
+        .values('id', 'upvotes', 'up', 'downvotes', 'down')
+    )
+    return [
+        {'issue': row['id'], 'upvotes': row['upvotes'], 'up_votes': row['up'],
+         'downvotes': row['downvotes'], 'down_votes': row['down']}
+        for row in drifted
+    ]
+
+
+class Context:
+    """Shared, read-only inputs for every worker"""
+
+    def __init__(self, issue_ids, hot_issue, tokens, places, hot_fraction):
+        self.issue_ids = issue_ids
+        self.hot_issue = hot_issue
+        self.tokens = tokens
+        self.places = places
+        self.hot_fraction = hot_fraction
+
+
+def build_context(users=200, hot_fraction=0.8):
+    from accounts.models import User
+    from accounts.tokens import UserRefreshToken
+
+    issue_ids = list(Issue.objects.values_list('id', flat=True))
+    if not issue_ids:
+        raise ValueError('The load test needs issues to read and vote on')
+    tokens = [
+        f'Bearer {UserRefreshToken.for_user(user).access_token}'
+        for user in User.objects.filter(is_active=True).order_by('id')[:users]
+    ]
+    places = list(Issue.objects.values_list('county', 'constituency', 'ward').distinct()[:500])
+    hot_issue = Issue.objects.order_by('-upvotes', 'id').values_list('id', flat=True).first()
+    return Context(issue_ids, hot_issue, tokens, places, hot_fraction)
+
+
+def plan_request(action, context, rng):
+    """``(method, path, data, auth_header)`` for one action"""
+    if action == 'browse':
+        if rng.random() < 0.5:
+            return 'GET', f'/api/issues/?page={rng.randint(1, 5)}', None, None
+        return 'GET', f'/api/issues/{rng.choice(context.issue_ids)}/', None, None
+    if action == 'search':
+        return 'GET', f'/api/issues/?search={rng.choice(SEARCH_TERMS)}', None, None
+    if action == 'dashboard':
+        return 'GET', '/api/analytics/dashboard/', None, None
+
+    token = rng.choice(context.tokens)
+    if action == 'categorize':
+        return 'POST', '/api/issues/categorize/', {
+            'description': f'Burst {rng.choice(SEARCH_TERMS)} main near the market',
+        }, token
+    if action == 'vote':
+        issue = context.hot_issue if rng.random() < context.hot_fraction else rng.choice(context.issue_ids)
+        vote_type = 'up' if rng.random() < 0.85 else 'down'
+        return 'POST', f'/api/issues/{issue}/vote/', {'vote_type': vote_type}, token
+    county, constituency, ward = rng.choice(context.places)
+    return 'POST', '/api/issues/', {
+        'title': f'Load test report in {ward}',
+        'description': 'Generated by the load harness',
+        'category': rng.choice([choice for choice, _ in Issue.CATEGORY_CHOICES]),
+        'severity': rng.choice(['low', 'medium', 'high']),
+        'county': county, 'constituency': constituency, 'ward': ward,
+    }, token
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.errors = Counter()
+
+    def record(self, action, elapsed, status_code):
+        with self._lock:
+            self.latencies[action].append(elapsed)
+            self.statuses[action][status_code] += 1
+
+    def exception(self, **kwargs):
+        """``got_request_exception`` receiver; the exception is being handled"""
+        exc = sys.exc_info()[1]
+        message = str(exc)
+        error = 'lock' if any(text in message for text in LOCK_ERRORS) else type(exc).__name__
+        with self._lock:
+            self.errors[error] += 1
+
+
+def _deadline_reached(deadline, budget):
+    if time.perf_counter() >= deadline:
+        return True
+    with budget['lock']:
+        if budget['remaining'] <= 0:
+            return True
+        budget['remaining'] -= 1
+        return False
+
+
+def _drive(client, rng, context, mix, deadline, budget, recorder):
+    """Synchronous request loop shared by threads and the inline single client"""
+    actions, weights = list(mix), list(mix.values())
+    while not _deadline_reached(deadline, budget):
+        action = rng.choices(actions, weights)[0]
+        method, path, data, token = plan_request(action, context, rng)
+        headers = {'Authorization': token} if token else {}
+        start = time.perf_counter()
+        if method == 'POST':
+            response = client.post(path, data, content_type='application/json', headers=headers)
+        else:
+            response = client.get(path, headers=headers)
+        recorder.record(action, time.perf_counter() - start, response.status_code)
+
+
+def _thread_worker(worker, context, mix, seed, deadline, budget, recorder):
+    try:
+        _drive(Client(raise_request_exception=False), random.Random(seed * 1000 + worker),
+               context, mix, deadline, budget, recorder)
+    finally:
+        # Each thread opened its own connection; release it before teardown
+        connections.close_all()
+
+
+async def asgi_request(app, method, path, data=None, token=None):
+    """Send one HTTP request through ``app``; returns the status code"""
+    path, _, query = path.partition('?')
+    body = json.dumps(data).encode() if data is not None else b''
+    headers = [(b'host', b'testserver')]
+    if data is not None:
+        headers.append((b'content-type', b'application/json'))
+    if token:
+        headers.append((b'authorization', token.encode()))
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': method, 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+        'query_string': query.encode(), 'headers': headers,
+        'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+    }
+    incoming = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    status_code = None
+
+    async def receive():
+        if incoming:
+            return incoming.pop()
+        # The client never disconnects
+        await asyncio.Future()
+
+    async def send(message):
+        nonlocal status_code
+        if message['type'] == 'http.response.start':
+            status_code = message['status']
+
+    await app(scope, receive, send)
+    return status_code
+
+
+async def _async_worker(app, worker, context, mix, seed, deadline, budget, recorder):
+    rng = random.Random(seed * 1000 + worker)
+    actions, weights = list(mix), list(mix.values())
+    while not _deadline_reached(deadline, budget):
+        action = rng.choices(actions, weights)[0]
+        method, path, data, token = plan_request(action, context, rng)
+        start = time.perf_counter()
+        status_code = await asgi_request(app, method, path, data, token)
+        recorder.record(action, time.perf_counter() - start, status_code)
+
+
+def run_load(context, mix=None, clients=8, duration=30.0, max_requests=None, seed=254, mode='wsgi'):
+    """Drive the app concurrently and return the report dict.
+
+    ``mode`` is ``wsgi`` (one thread per client; a single client runs in the
+    calling thread) or ``asgi`` (asyncio tasks through the ASGI application,
+    which opens a database connection per request, so SQLite needs a
+    file-backed database).
+    """
+    mix = mix or DEFAULT_MIX
+    recorder = Recorder()
+    budget = {'lock': threading.Lock(), 'remaining': max_requests if max_requests else float('inf')}
+    request_logger = logging.getLogger('django.request')
+    level = request_logger.level
+    # Expected 4xx/5xx under contention would otherwise flood the log
+    request_logger.setLevel(logging.CRITICAL)
+    got_request_exception.connect(recorder.exception, dispatch_uid='loadtest')
+
+    start = time.perf_counter()
+    deadline = start + duration
+    try:
+        if mode == 'asgi':
+            app = get_asgi_application()
+
+            async def main():
+                await asyncio.gather(*(
+                    _async_worker(app, worker, context, mix, seed, deadline, budget, recorder)
+                    for worker in range(clients)
+                ))
+            asyncio.run(main())
+        elif clients == 1:
+            # Inline, so the run shares the caller's connection (and test transaction)
+            _drive(Client(raise_request_exception=False), random.Random(seed * 1000),
+                   context, mix, deadline, budget, recorder)
+        else:
+            threads = [
+                threading.Thread(
+                    target=_thread_worker,
+                    args=(worker, context, mix, seed, deadline, budget, recorder)
+                )
+                for worker in range(clients)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+    finally:
+        got_request_exception.disconnect(dispatch_uid='loadtest')
+        request_logger.setLevel(level)
+    elapsed = time.perf_counter() - start
+
+    actions = {}
+    for action, latencies in recorder.latencies.items():
+        actions[action] = {
+            'requests': len(latencies),
+            'per_second': round(len(latencies) / elapsed, 2),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+            'statuses': dict(recorder.statuses[action]),
+        }
+    total = sum(len(latencies) for latencies in recorder.latencies.values())
+    drift = counter_drift()
+    return {
+        'mode': mode,
+        'clients': clients,
+        'elapsed_s': round(elapsed, 2),
+        'requests': total,
+        'per_second': round(total / elapsed, 2) if elapsed else 0.0,
+        'actions': actions,
+        'lock_errors': recorder.errors.get('lock', 0),
+        'errors': dict(recorder.errors),
+        'drifted_issues': len(drift),
+        'drift': drift[:20],
+    }
+
@@ -0,0 +1,188 @@
+"""
+Non-blocking, rotating JSON logging.
+
+``QueuedJSONHandler`` is used from ``settings.LOGGING``. ``emit`` only
+renders the message, snapshots the request context (request ID, method,
+path, query count and elapsed time so far) and does a non-blocking put
+onto a bounded queue; a ``QueueListener`` thread formats each record as
+one JSON line and writes it through a size- or time-rotating file
+handler. When the queue is full the record is dropped and counted, so a
+slow disk never stalls a request.
+
+The queue and listener are created lazily per process, so handlers
+configured before a fork (e.g. gunicorn ``--preload``) start their own
+writer in each worker. Rotation assumes one writing process per file, so
+the filename may contain a ``{pid}`` placeholder (the default in
+``settings.LOGGING`` does); without it, workers that rotate the same file
+rename it under each other and lose records.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+import traceback
+import weakref
+from datetime import datetime, timezone as dt_timezone
+
+from .instrumentation import current_timings
+from .metrics import CounterMetric, GaugeMetric
+
+_handlers = weakref.WeakSet()
+
+# Standard LogRecord attributes; anything else was passed via ``extra``
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record):
+        payload = {
+            'time': datetime.fromtimestamp(record.created, dt_timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'process': record.process,
+            'thread': record.threadName,
+        }
+        context = getattr(record, 'request', None)
+        if isinstance(context, dict):
+            payload['request'] = context
+        if record.exc_info and not record.exc_text:
+            record.exc_text = ''.join(traceback.format_exception(*record.exc_info))
+        if record.exc_text:
+            payload['exception'] = record.exc_text
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and key not in payload and key != 'request':
+                payload[key] = value
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+def request_context(request=None):
+    """Request ID and timings of the request on this thread/task, or of ``request``"""
+    timings = current_timings() or getattr(request, 'timings', None)
+    if timings is None:
+        return None
+    return {
+        'id': timings.request_id,
+        'method': timings.method,
+        'path': timings.path,
+        'queries': timings.query_count,
+        'db_ms': round(timings.query_time * 1000, 2),
+        'elapsed_ms': round((time.perf_counter() - timings.started) * 1000, 2),
+    }
+
+
+def file_handler(filename, max_bytes, backup_count, when):
+    directory = os.path.dirname(filename)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if when:
+        handler = logging.handlers.TimedRotatingFileHandler(
+            filename, when=when, backupCount=backup_count, encoding='utf-8', delay=True, utc=True
+        )
+    else:
+        handler = logging.handlers.RotatingFileHandler(
+            filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True
+        )
+    handler.setFormatter(JSONFormatter())
+    return handler
+
+
+class _Listener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        # Shutdown may wait for room; only emit must never block
+        self.queue.put(self._sentinel)
+
+
+class QueuedJSONHandler(logging.Handler):
+    """Queue records for a background writer thread; drop (and count) when full.
+
+    ``when`` selects time-based rotation (``'midnight'``, ``'H'``, ...);
+    otherwise files rotate at ``max_bytes``.
+    """
+
+    def __init__(self, filename, max_bytes=10 * 1024 * 1024, backup_count=5, when=None,
+                 queue_size=10000, level=logging.NOTSET):
+        super().__init__(level)
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.when = when
+        self.queue_size = queue_size
+        self.dropped = 0
+        self._pid = None
+        self._queue = None
+        self._listener = None
+        self._target = None
+        self._start_lock = threading.Lock()
+        _handlers.add(self)
+
+    def _start(self):
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(self.queue_size)
+            self._target = file_handler(
+                self.filename.format(pid=os.getpid()), self.max_bytes, self.backup_count, self.when
+            )
+            self._listener = _Listener(self._queue, self._target)
+            self._listener.start()
+            self._pid = os.getpid()
+            atexit.register(self.stop)
+
+    def prepare(self, record):
+        """A detached copy of ``record`` that is safe to format on another thread"""
+        prepared = logging.makeLogRecord(vars(record))
+        prepared.msg = record.getMessage()
+        prepared.args = None
+        if record.exc_info:
+            prepared.exc_text = ''.join(traceback.format_exception(*record.exc_info))
+        prepared.exc_info = None
+        # django.request attaches the HttpRequest, which must not reach the writer thread
+        prepared.request = request_context(getattr(record, 'request', None))
+        return prepared
+
+    def emit(self, record):
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self._queue.put_nowait(self.prepare(record))
+        except queue.Full:
+            self.dropped += 1
+            LOG_RECORDS_DROPPED.inc()
+        except Exception:
+            self.handleError(record)
+
+    def handle(self, record):
+        # No handler lock: the queue is thread-safe and emit never blocks
+        if self.filter(record):
+            self.emit(record)
+        return record
+
+    def depth(self):
+        return self._queue.qsize() if self._queue is not None and self._pid == os.getpid() else 0
+
+    def stop(self):
+        """Drain the queue and close the file"""
+        if self._listener is not None and self._pid == os.getpid():
+            self._listener.stop()
+            self._target.close()
+            self._listener = None
+            self._pid = None
+
+    def close(self):
+        self.stop()
+        super().close()
+
+
+def queue_depths():
+    return {(handler.filename,): handler.depth() for handler in list(_handlers)}
+
+
+LOG_RECORDS_DROPPED = CounterMetric('log_records_dropped_total', 'Log records dropped because the log queue was full')
+LOG_QUEUE_DEPTH = GaugeMetric('log_queue_depth', 'Log records waiting for the writer thread', queue_depths, ('file',))
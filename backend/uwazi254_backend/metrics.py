@@ -0,0 +1,373 @@
+"""
+Prometheus metrics in the text exposition format, without a client library.
+
+Recording is lock-free: every thread updates its own shard of plain dicts,
+and shards are only summed when metrics are collected. Shards of finished
+threads are folded into a retired shard so thread churn doesn't grow the
+set.
+
+For multi-process deployments set ``MULTIPROCESS_DIR``: a background
+thread in each worker writes its totals to ``<dir>/metrics-<pid>.json``
+every ``FLUSH_SECONDS``, and the scrape endpoint merges every worker's
+file. Counters and histograms of exited workers keep counting towards the
+totals; gauges are only reported for live workers, labelled by pid.
+Empty the directory when the server is restarted.
+"""
+import glob
+import json
+import os
+import threading
+import time
+import weakref
+from collections import defaultdict
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from .instrumentation import current_timings
+
+DEFAULTS = {
+    'ENABLED': True,
+    'MULTIPROCESS_DIR': None,
+    'FLUSH_SECONDS': 5,
+    # Bearer token the scraper must send; without one the endpoint only answers when DEBUG is on
+    'TOKEN': None,
+}
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def metrics_setting(name):
+    return getattr(settings, 'METRICS', {}).get(name, DEFAULTS[name])
+
+
+class Shards:
+    """Per-thread value dicts keyed by ``(metric name, label values)``"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._live = []
+        self._retired = {}
+
+    def values(self):
+        values = getattr(self._local, 'values', None)
+        if values is None:
+            values = self._local.values = {}
+            # Once per thread, never on the recording path afterwards
+            with self._lock:
+                self._live.append((weakref.ref(threading.current_thread()), values))
+        return values
+
+    def snapshot(self):
+        """Merged ``{key: value}``; histogram values are lists"""
+        with self._lock:
+            live = []
+            for thread, values in self._live:
+                if thread() is None or not thread().is_alive():
+                    merge_into(self._retired, list(values.items()))
+                else:
+                    live.append((thread, values))
+            self._live = live
+            merged = {key: list(value) if isinstance(value, list) else value
+                      for key, value in self._retired.items()}
+            for _, values in live:
+                merge_into(merged, list(values.items()))
+        return merged
+
+    def reset(self):
+        with self._lock:
+            for _, values in self._live:
+                values.clear()
+            self._retired.clear()
+
+
+def merge_into(target, items):
+    for key, value in items:
+        if isinstance(value, list):
+            current = target.get(key)
+            if current is None:
+                target[key] = list(value)
+            else:
+                for i, v in enumerate(value):
+                    current[i] += v
+        else:
+            target[key] = target.get(key, 0) + value
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        registry.register(self)
+
+    def key(self, labels):
+        return (self.name, tuple(str(labels.get(label, '')) for label in self.labelnames))
+
+
+class CounterMetric(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        values = _shards.values()
+        key = self.key(labels)
+        values[key] = values.get(key, 0) + amount
+
+
+class HistogramMetric(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(name, documentation, labelnames)
+
+    def observe(self, value, **labels):
+        values = _shards.values()
+        key = self.key(labels)
+        counts = values.get(key)
+        if counts is None:
+            # One slot per bucket, then +Inf, sum and count
+            counts = values[key] = [0] * (len(self.buckets) + 3)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[len(self.buckets)] += 1
+        counts[-2] += value
+        counts[-1] += 1
+
+
+class GaugeMetric(Metric):
+    """Sampled when metrics are collected; ``fn`` returns ``{label values tuple: value}``"""
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, fn, labelnames=()):
+        self.fn = fn
+        super().__init__(name, documentation, labelnames)
+
+    def sample(self):
+        try:
+            return {(self.name, tuple(str(v) for v in labels)): value for labels, value in self.fn().items()}
+        except Exception:
+            return {}
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+
+    def collect(self):
+        """``(values, gauges)`` of this process"""
+        gauges = {}
+        for metric in self.metrics.values():
+            if isinstance(metric, GaugeMetric):
+                gauges.update(metric.sample())
+        return _shards.snapshot(), gauges
+
+
+_shards = Shards()
+registry = Registry()
+
+
+def reset():
+    """Zero this process's counters and histograms"""
+    _shards.reset()
+
+
+def _encode(values):
+    return [[name, list(labels), value] for (name, labels), value in values.items()]
+
+
+def _decode(rows):
+    return {(name, tuple(labels)): value for name, labels, value in rows}
+
+
+def flush():
+    """Write this worker's totals to the multi-process directory"""
+    directory = metrics_setting('MULTIPROCESS_DIR')
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    values, gauges = registry.collect()
+    path = os.path.join(directory, f'metrics-{os.getpid()}.json')
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'pid': os.getpid(), 'values': _encode(values), 'gauges': _encode(gauges)}, f)
+    os.replace(tmp, path)
+
+
+_flusher = {'pid': None}
+
+
+def start_flusher():
+    """Start the per-worker flush thread (again after a fork)"""
+    if not metrics_setting('MULTIPROCESS_DIR') or _flusher['pid'] == os.getpid():
+        return
+    _flusher['pid'] = os.getpid()
+
+    def run():
+        while True:
+            time.sleep(metrics_setting('FLUSH_SECONDS'))
+            try:
+                flush()
+            except OSError:
+                pass
+
+    threading.Thread(target=run, name='metrics-flush', daemon=True).start()
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def gather():
+    """``(values, gauges)`` merged over every worker"""
+    values, own_gauges = registry.collect()
+    directory = metrics_setting('MULTIPROCESS_DIR')
+    if not directory:
+        return values, own_gauges
+
+    pid = os.getpid()
+    gauges = {(name, labels + (str(pid),)): value for (name, labels), value in own_gauges.items()}
+    for path in glob.glob(os.path.join(directory, 'metrics-*.json')):
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if data['pid'] == pid:
+            continue
+        merge_into(values, _decode(data['values']).items())
+        if _alive(data['pid']):
+            for (name, labels), value in _decode(data['gauges']).items():
+                gauges[(name, labels + (str(data['pid']),))] = value
+    return values, gauges
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def exposition():
+    """All metrics in the Prometheus text format"""
+    values, gauges = gather()
+    by_metric = defaultdict(list)
+    for (name, labels), value in list(values.items()) + list(gauges.items()):
+        by_metric[name].append((labels, value))
+
+    multiprocess = bool(metrics_setting('MULTIPROCESS_DIR'))
+    lines = []
+    for name, metric in sorted(registry.metrics.items()):
+        lines.append(f'# HELP {name} {metric.documentation}')
+        lines.append(f'# TYPE {name} {metric.kind}')
+        labelnames = metric.labelnames
+        if metric.kind == 'gauge' and multiprocess:
+            labelnames += ('pid',)
+        for labels, value in sorted(by_metric.get(name, [])):
+            if metric.kind != 'histogram':
+                lines.append(f'{name}{_labels(labelnames, labels)} {_number(value)}')
+                continue
+            cumulative = 0
+            for bound, count in zip(metric.buckets + (float('inf'),), value):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(labelnames, labels, [('le', _number(bound))])} {cumulative}")
+            lines.append(f'{name}_sum{_labels(labelnames, labels)} {_number(value[-2])}')
+            lines.append(f'{name}_count{_labels(labelnames, labels)} {value[-1]}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    token = metrics_setting('TOKEN')
+    if not token:
+        if not settings.DEBUG:
+            return HttpResponseForbidden()
+    elif not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponseForbidden()
+    return HttpResponse(exposition(), content_type=CONTENT_TYPE)
+
+
+REQUEST_LATENCY = HistogramMetric(
+    'http_request_duration_seconds', 'Request latency by route', ('route', 'method', 'status'))
+REQUEST_QUERIES = HistogramMetric(
+    'http_request_queries', 'Database queries per request by route', ('route', 'method'), buckets=QUERY_BUCKETS)
+CACHE_REQUESTS = CounterMetric(
+    'cache_requests_total', 'Cache lookups by cache and result (hit or miss)', ('cache', 'result'))
+ISSUES_CREATED = CounterMetric('issues_created_total', 'Issues reported, by category', ('category',))
+VOTES_CAST = CounterMetric(
+    'issue_votes_total', 'Votes cast or changed; rate() gives votes per minute', ('vote_type',))
+STATUS_TRANSITIONS = CounterMetric(
+    'issue_status_transitions_total', 'Issue status changes', ('from_status', 'to_status'))
+NOTIFICATIONS_SENT = CounterMetric(
+    'notifications_sent_total', 'Notification digests delivered, by channel and result', ('channel', 'result'))
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not metrics_setting('ENABLED'):
+            return self.get_response(request)
+        start_flusher()
+
+        start = time.perf_counter()
+        response = self.get_response(request)
+        self.observe(request, response, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        if not metrics_setting('ENABLED'):
+            return await self.get_response(request)
+        start_flusher()
+
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        self.observe(request, response, time.perf_counter() - start)
+        return response
+
+    def observe(self, request, response, elapsed):
+        match = request.resolver_match
+        # The URL pattern, not the path, keeps label cardinality bounded
+        route = match.route if match else 'unmatched'
+        REQUEST_LATENCY.observe(elapsed, route=route, method=request.method,
+                                status=f'{response.status_code // 100}xx')
+        timings = current_timings()
+        if timings is not None:
+            REQUEST_QUERIES.observe(timings.query_count, route=route, method=request.method)
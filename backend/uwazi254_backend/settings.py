@@ -1,5 +1,6 @@
 import os
 from pathlib import Path
+from corsheaders.defaults import default_headers
 from decouple import config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -25,6 +26,7 @@ INSTALLED_APPS = [
     # Third party apps
     'rest_framework',
     'rest_framework_simplejwt',
+    'rest_framework_simplejwt.token_blacklist',
     'corsheaders',
     'django_filters',
     
@@ -32,11 +34,16 @@ INSTALLED_APPS = [
     'accounts',
     'issues',
     'analytics',
+    'notifications',
 ]
 
 MIDDLEWARE = [
+    'uwazi254_backend.instrumentation.RequestTimingMiddleware',
+    'uwazi254_backend.metrics.MetricsMiddleware',
+    'uwazi254_backend.compression.CompressionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'uwazi254_backend.db_routing.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -65,12 +72,31 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'uwazi254_backend.wsgi.application'
 
-# Database
+# Database (see uwazi254_backend/db_profiles.py for the available profiles)
+from .db_profiles import database_settings
+
+DATABASE_PROFILE = config('DATABASE_PROFILE', default='sqlite')
+
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_settings(
+        DATABASE_PROFILE,
+        BASE_DIR,
+        url=config('DATABASE_URL', default=''),
+        conn_max_age=config('CONN_MAX_AGE', default=600, cast=int),
+        pooler=config('DATABASE_POOLER', default=None),
+    )
+}
+
+# Read replicas: aliases in DATABASES that serve analytics and anonymous
+# list reads. Writes and recently-writing clients stay on 'default'.
+# Requires a shared CACHE (redis or file) for the read-your-writes pins.
+DATABASE_REPLICAS = []
+DATABASE_ROUTERS = ['uwazi254_backend.db_routing.ReplicaRouter']
+
+REPLICA_ROUTING = {
+    'PIN_SECONDS': 5,
+    'MAX_LAG_SECONDS': 10,
+    'LAG_CHECK_SECONDS': 5,
 }
 
 # Password validation
@@ -99,6 +125,10 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# Precomputed analytics artifacts (manage.py publish_analytics); serve
+# /static/analytics/ directly from nginx/CDN with gzip_static/brotli_static
+ANALYTICS_PUBLISH_ROOT = os.path.join(STATIC_ROOT, 'analytics')
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
@@ -111,7 +141,7 @@ AUTH_USER_MODEL = 'accounts.User'
 # Django REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -121,8 +151,37 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'uwazi254_backend.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 20
+    'PAGE_SIZE': 20,
+    # Reverse proxies in front of the app; X-Forwarded-For is only trusted this far
+    'NUM_PROXIES': config('NUM_PROXIES', default=0, cast=int),
+}
+
+# Shared-cache lifetime (seconds) for anonymous, conditional GET endpoints
+API_CACHE_MAX_AGE = config('API_CACHE_MAX_AGE', default=30, cast=int)
+
+# Analytics cube: minimum seconds between incremental refreshes
+ANALYTICS_CUBE_REFRESH_SECONDS = config('ANALYTICS_CUBE_REFRESH_SECONDS', default=5, cast=int)
+
+# Live dashboard push (server-sent events at /api/analytics/live/, ASGI only)
+LIVE_UPDATES = {
+    'BACKEND': config('LIVE_UPDATES_BACKEND', default='analytics.live.InProcessBackend'),
+    'TICK_SECONDS': 1.0,
+    'HISTORY': 1000,
+    'HEARTBEAT_SECONDS': 15,
+}
+
+# Report spike detection (EWMA per county x category x hour)
+SPIKE_DETECTION = {
+    'ENABLED': config('SPIKE_DETECTION_ENABLED', default=True, cast=bool),
+    'ALPHA': 0.1,
+    'THRESHOLD': 3.0,
+    'MIN_COUNT': 3,
+    'WARMUP_HOURS': 24,
 }
 
 # JWT Settings
@@ -132,6 +191,32 @@ SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
+    'TOKEN_OBTAIN_SERIALIZER': 'accounts.serializers.ClaimsTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'accounts.serializers.ClaimsTokenRefreshSerializer',
+}
+
+# Refresh-token revocation Bloom filter; compact with manage.py compact_tokens
+TOKEN_REVOCATION = {
+    'REFRESH_SECONDS': 5,
+    'ERROR_RATE': 0.001,
+}
+
+# In-process cache of authenticated users (seconds, entries)
+AUTH_USER_CACHE = {
+    'TTL': 30,
+    'MAX_SIZE': 10000,
+}
+
+# Password hashing pool for the async login/registration views (0 = inline)
+PASSWORD_HASHING = {
+    'WORKERS': config('PASSWORD_HASH_WORKERS', default=os.cpu_count() or 2, cast=int),
+}
+
+# Login/registration throttles as (limit, window seconds)
+AUTH_THROTTLES = {
+    'LOGIN_IP': (30, 60),
+    'LOGIN_ACCOUNT': (5, 900),
+    'REGISTER_IP': (10, 3600),
 }
 
 # CORS Settings
@@ -145,18 +230,32 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Clients echo the read-your-writes pin back (see db_routing)
+CORS_ALLOW_HEADERS = (*default_headers, 'x-db-pin')
+CORS_EXPOSE_HEADERS = ['X-DB-Pin']
+
 # Email Configuration (for production)
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
 # Logging
+LOG_DIR = config('LOG_DIR', default=str(BASE_DIR / 'logs'))
+
+# JSON lines written by a background thread; records are dropped (and
+# counted in log_records_dropped_total) rather than blocking when the queue is full
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
     'handlers': {
         'file': {
             'level': 'INFO',
-            'class': 'logging.FileHandler',
-            'filename': 'uwazi254.log',
+            'class': 'uwazi254_backend.logconfig.QueuedJSONHandler',
+            # One file per process: rotation is not safe with several writers
+            'filename': os.path.join(LOG_DIR, config('LOG_FILE', default='uwazi254-{pid}.log')),
+            'max_bytes': config('LOG_MAX_BYTES', default=10 * 1024 * 1024, cast=int),
+            'backup_count': config('LOG_BACKUP_COUNT', default=5, cast=int),
+            # e.g. 'midnight' for daily files instead of size-based rotation
+            'when': config('LOG_ROTATE_WHEN', default=None),
+            'queue_size': config('LOG_QUEUE_SIZE', default=10000, cast=int),
         },
     },
     'loggers': {
@@ -165,5 +264,103 @@ LOGGING = {
             'level': 'INFO',
             'propagate': True,
         },
+        'uwazi254': {
+            'handlers': ['file'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
+}
+
+# Serialized issue detail responses and their version tokens: 'locmem' (per
+# process; other processes serve stale entries until they expire), 'file' (shared
+# by the workers on one host) or 'redis' (shared by every host). MAX_ENTRIES covers
+# the entries plus one version token per issue viewed.
+ISSUE_DETAIL_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'issue-detail',
+        'OPTIONS': {'MAX_ENTRIES': config('ISSUE_DETAIL_CACHE_ENTRIES', default=20000, cast=int)},
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': config('ISSUE_DETAIL_CACHE_DIR', default='/tmp/uwazi254-issue-detail'),
+        'OPTIONS': {'MAX_ENTRIES': config('ISSUE_DETAIL_CACHE_ENTRIES', default=20000, cast=int)},
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config('REDIS_URL', default='redis://localhost:6379/0'),
+    },
+}
+
+# Cache shared by the worker processes: throttle counters, read-your-writes pins,
+# version tokens and runtime switches. 'locmem' is per process and only right for
+# a single process (development, tests); use 'redis', or 'file' on a single host.
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': config('CACHE_ENTRIES', default=10000, cast=int)},
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': config('CACHE_DIR', default='/tmp/uwazi254-cache'),
+        'OPTIONS': {'MAX_ENTRIES': config('CACHE_ENTRIES', default=10000, cast=int)},
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config('REDIS_URL', default='redis://localhost:6379/0'),
+    },
+}
+
+CACHES = {
+    'default': CACHE_BACKENDS[config('CACHE', default='locmem')],
+    'issue_detail': ISSUE_DETAIL_CACHE_BACKENDS[config('ISSUE_DETAIL_CACHE', default='locmem')],
+}
+
+ISSUE_DETAIL_CACHE = {
+    'ENABLED': config('ISSUE_DETAIL_CACHE_ENABLED', default=True, cast=bool),
+    'CACHE': 'issue_detail',
+    'TIMEOUT': config('ISSUE_DETAIL_CACHE_TIMEOUT', default=300, cast=int),
+}
+
+# "My area" feeds; run `manage.py rebuild_area_feeds` after bulk loads or turning them on
+AREA_FEEDS = {
+    'ENABLED': config('AREA_FEEDS_ENABLED', default=True, cast=bool),
+    'WINDOW': config('AREA_FEED_WINDOW', default=200, cast=int),
+}
+
+# Digests are sent by `manage.py notification_worker`
+NOTIFICATIONS = {
+    'CHANNELS': {
+        'email': 'notifications.backends.EmailBackend',
+        'sms': config('NOTIFICATIONS_SMS_BACKEND', default='notifications.backends.ConsoleSMSBackend'),
+    },
+    'DIGEST_SECONDS': config('NOTIFICATIONS_DIGEST_SECONDS', default=300, cast=int),
+    'BATCH_SIZE': config('NOTIFICATIONS_BATCH_SIZE', default=500, cast=int),
+    'MAX_ATTEMPTS': config('NOTIFICATIONS_MAX_ATTEMPTS', default=5, cast=int),
+}
+
+# issues.categorization.GeminiCategorizer needs google-generativeai and GOOGLE_API_KEY
+ISSUE_CATEGORIZER = {
+    'BACKEND': config('ISSUE_CATEGORIZER', default='issues.categorization.KeywordCategorizer'),
+    'TIMEOUT': config('ISSUE_CATEGORIZER_TIMEOUT', default=10, cast=float),
+}
+
+# gzip/brotli for API responses; nginx may do this instead (set COMPRESS_RESPONSES=False)
+COMPRESSION = {
+    'ENABLED': config('COMPRESS_RESPONSES', default=True, cast=bool),
+    'MIN_SIZE': config('COMPRESS_MIN_SIZE', default=1024, cast=int),
+}
+
+# Prometheus scrape endpoint; set METRICS_DIR when running several worker processes.
+# /metrics is closed unless METRICS_TOKEN is set (scrapers send it as a Bearer token) or DEBUG is on
+METRICS = {
+    'MULTIPROCESS_DIR': config('METRICS_DIR', default=None),
+    'TOKEN': config('METRICS_TOKEN', default=None),
+}
+
+# Server-Timing headers, slow-request capture and the runtime profiler
+REQUEST_INSTRUMENTATION = {
+    'SLOW_REQUEST_MS': config('SLOW_REQUEST_MS', default=1000, cast=int),
+    'PROFILE_DIR': config('PROFILE_DIR', default=None),
 }
\ No newline at end of file
@@ -7,6 +7,7 @@ from rest_framework_simplejwt.views import (
     TokenRefreshView,
 )
 from django.http import JsonResponse
+from .metrics import metrics_view
 
 # Uwazi254 Backend URL Configuration
 
@@ -18,6 +19,7 @@ urlpatterns = [
     path('api/analytics/', include('analytics.urls')),
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('metrics', metrics_view, name='metrics'),
     path('', lambda request: JsonResponse({"message": "Welcome to the Uwazi Backend!"})),
 ]
 